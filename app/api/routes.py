@@ -1,12 +1,15 @@
 from __future__ import annotations
 
+import csv
+import io
 import json
-import hashlib
+import tempfile
+import time
 from decimal import Decimal
-from datetime import datetime, timezone
-from typing import Dict, Any
+from typing import Any, Dict, Iterator, List, Literal, Optional, Tuple
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
 
 from app.engine.schemas import (
     CardIdentifyRequest,
@@ -15,109 +18,578 @@ from app.engine.schemas import (
     CompsResponse,
     DecisionRequest,
     DecisionResponse,
+    DecisionBatchRequest,
+    DecisionBatchResponse,
+    BuyThresholdOut,
+    GradingSubmissionRequest,
+    GradingSubmissionResponse,
+    JobStatus,
+    JobSubmitRequest,
+    MarketStats,
+    MarketTrend,
     MarketValueOut,
-    RoiOut,
+    RoiDistributionOut,
+    SweepRequest,
+    SweepResponse,
+    SweepThresholdsOut,
+    ScannerWatchRequest,
+    SubmissionCardOut,
 )
+from app.services.comps_provider_archive import ArchiveCompsProvider
+from app.services.comps_provider_base import CompsProvider
+from app.services.comps_provider_fake import FakeCompsProvider
 from app.services.comps_provider_stub import StubCompsProvider
-from app.engine.grading import grade_probabilities
-from app.engine.decision import decide
-from app.data.db import get_conn
+from app.services.comps_cache import CachedCompsProvider
+from app.services.comps_guard import BATCH, CircuitBreaker, GuardedCompsProvider, batch_priority, priority
+from app.services.catalog import get_catalog
+from app.services.decision_cache import DecisionCache
+from app.services.jobs import TERMINAL_STATUSES, JobManager
+from app.services.scanner import Scanner, Threshold, ThresholdTable
+from app.services.portfolio_import import PortfolioEvaluator, parse_csv, parse_ndjson, stored_items
+from app.services.evaluation import (
+    decision_response,
+    grade_probs_for,
+    log_summary,
+    recency_weighted_stats,
+    response_body,
+    roi_distributions,
+)
+from app.services.market_trends import TrendTracker
+from app.engine.identity import guess_category, stable_card_key
+from app.engine.fees import FeeSchedule, FeeScheduleLoader
+from app.engine.sweep import DECISIONS, sweep
+from app.engine.decision import decide, decide_fixed, decide_many, DecisionInput, DecisionResult
+from app.engine.roi import roi_summary
+from app.engine.serialize import dump, json_array
+from app.data import decision_log, sold_comps
+from app.data.db import ConnectionPool, get_pool
+from app.data.log_writer import DecisionLogWriter, LogRecord, get_log_writer, now_utc
+from app.services.metrics import REGISTRY, stage
 import os
 
 router = APIRouter(prefix="/api", tags=["api"])
 
 _FEES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "fees_default.json")
 
-def _load_fees() -> Dict[str, Any]:
-    with open(os.path.abspath(_FEES_PATH), "r", encoding="utf-8") as f:
-        return json.load(f)
+def _comps_provider() -> CompsProvider:
+    if os.environ.get("CARDKING_COMPS_PROVIDER") == "fake":
+        # load testing: stub comps behind injected upstream latency and errors
+        return FakeCompsProvider(
+            latency_seconds=float(os.environ.get("CARDKING_FAKE_LATENCY_MS", "50")) / 1000.0,
+            latency_sigma=float(os.environ.get("CARDKING_FAKE_LATENCY_SIGMA", "0.5")),
+            error_rate=float(os.environ.get("CARDKING_FAKE_ERROR_RATE", "0")),
+            seed=int(os.environ.get("CARDKING_FAKE_SEED", "0")),
+        )
+    archive = os.environ.get("CARDKING_COMPS_ARCHIVE")
+    if archive:
+        return ArchiveCompsProvider(archive, fallback=StubCompsProvider())
+    return StubCompsProvider()
+
+def _env_float(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+# upstream admission control: rate limit, bounded priority queue, deadline, circuit breaker
+_comps_upstream = GuardedCompsProvider(
+    _comps_provider(),
+    rate=_env_float("CARDKING_COMPS_RATE"),
+    burst=_env_float("CARDKING_COMPS_BURST"),
+    concurrency=int(os.environ.get("CARDKING_COMPS_CONCURRENCY", "8")),
+    max_queue=int(os.environ.get("CARDKING_COMPS_QUEUE", "64")),
+    deadline_seconds=float(os.environ.get("CARDKING_COMPS_DEADLINE_SECONDS", "2")),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get("CARDKING_COMPS_BREAKER_FAILURES", "5")),
+        reset_seconds=float(os.environ.get("CARDKING_COMPS_BREAKER_RESET_SECONDS", "30")),
+    ),
+)
+
+_comps_cache = CachedCompsProvider(
+    _comps_upstream,
+    max_entries=int(os.environ.get("CARDKING_COMPS_CACHE_SIZE", "2048")),
+    ttl_seconds=float(os.environ.get("CARDKING_COMPS_TTL_SECONDS", "3600")),
+    history_days=float(os.environ.get("CARDKING_COMPS_HISTORY_DAYS", "90")),
+)
+
+_decision_cache = DecisionCache(max_entries=int(os.environ.get("CARDKING_DECISION_CACHE_SIZE", "10000")))
+_comps_cache.subscribe(_decision_cache.invalidate_card)
+
+_trends = TrendTracker(
+    windows=[float(d) for d in os.environ.get("CARDKING_TREND_WINDOWS", "7,30,90").split(",")],
+    half_life_days=float(os.environ.get("CARDKING_TREND_HALF_LIFE_DAYS", "7")),
+    max_cards=int(os.environ.get("CARDKING_TREND_CARDS", "4096")),
+)
+_comps_cache.subscribe(_trends.notify)
+
+REGISTRY.gauges("cardking_decision_cache", "Decision cache", lambda: _decision_cache.stats(), DecisionCache.COUNTERS)
+REGISTRY.gauges("cardking_comps_cache", "Comps cache", lambda: _comps_cache.stats(), CachedCompsProvider.COUNTERS)
+REGISTRY.gauges(
+    "cardking_comps_upstream", "Comps provider admission", lambda: _comps_upstream.stats(), GuardedCompsProvider.COUNTERS
+)
+REGISTRY.gauges("cardking_db_pool", "Database pool", lambda: get_pool().stats(), ConnectionPool.COUNTERS)
+REGISTRY.gauges("cardking_decision_log", "Decision log writer", lambda: get_log_writer().stats(), DecisionLogWriter.COUNTERS)
+
+_fee_loader = FeeScheduleLoader(_FEES_PATH)
+
+# "decimal" (reference) or "fixed" (integer cents/bps); both give identical decisions.
+_ENGINE_MODE = os.environ.get("CARDKING_ENGINE_MODE", "decimal")
+_decide = decide_fixed if _ENGINE_MODE == "fixed" else decide
+
+def _load_fees() -> FeeSchedule:
+    return _fee_loader.get()
+
+def _resolve_market(query: str) -> Tuple[str, MarketStats, bool]:
+    identity = identify(CardIdentifyRequest(query=query))
+    entry = _comps_cache.lookup(identity)
+    return identity.card_key, entry.stats, entry.degraded
+
+def _recency_weighted(card_key: str, stats: MarketStats) -> MarketStats:
+    return recency_weighted_stats(stats, _trends.trend(card_key).ew_median)
+
+def _resolve_snapshot(query: str) -> Tuple[str, MarketStats, str]:
+    identity = identify(CardIdentifyRequest(query=query))
+    entry = _comps_cache.lookup(identity)
+    return identity.card_key, entry.stats, entry.content_id()
 
-def _stable_card_key(query: str) -> str:
-    return hashlib.sha256(query.strip().lower().encode("utf-8")).hexdigest()[:16]
+_portfolio = PortfolioEvaluator(batch_priority(_resolve_snapshot), _load_fees, mode=_ENGINE_MODE)
+
+buy_thresholds = ThresholdTable(batch_priority(_resolve_snapshot), _load_fees)
+_comps_cache.subscribe(buy_thresholds.mark_dirty)
+
+def _card_key_for(text: str) -> str:
+    return identify(CardIdentifyRequest(query=text[:200])).card_key
+
+def listing_scanner() -> Scanner:
+    return Scanner(buy_thresholds, _load_fees, key_for=_card_key_for, mode=_ENGINE_MODE)
+
+_workers = os.environ.get("CARDKING_JOB_WORKERS")
+job_manager = JobManager(
+    batch_priority(_resolve_market),
+    _load_fees,
+    mode=_ENGINE_MODE,
+    workers=int(_workers) if _workers else None,
+    chunk_size=int(os.environ.get("CARDKING_JOB_CHUNK_SIZE", "256")),
+    recency=_recency_weighted,
+)
 
 @router.post("/identify", response_model=CardIdentity)
 def identify(req: CardIdentifyRequest) -> CardIdentity:
     q = req.query.strip()
-    key = _stable_card_key(q)
+    catalog = get_catalog()
+    if catalog is not None:
+        found = catalog.identify(q)
+        if found is not None:
+            return found
+    key = stable_card_key(q)
     # DEFAULT: deterministic stub identity parsing
-    category = "tcg"
-    if any(tok in q.lower() for tok in ["psa", "topps", "panini", "rookie", "nba", "nfl", "mlb"]):
-        category = "sports"
+    category = guess_category(q)
 
     display = q if len(q) <= 80 else q[:77] + "..."
     return CardIdentity(card_key=key, display_name=display, category=category)
 
+@router.get("/identify/suggest", response_model=List[CardIdentity])
+def identify_suggest(q: str, limit: int = Query(10, ge=1, le=50)) -> List[CardIdentity]:
+    catalog = get_catalog()
+    if catalog is None:
+        return []
+    return [e.identity() for e in catalog.suggest(q, limit)]
+
 @router.post("/comps", response_model=CompsResponse)
-def comps(req: CompsRequest) -> CompsResponse:
-    provider = StubCompsProvider()
-    comps_list, stats = provider.get_recent_sold_comps(req.identity)
-
-    # cache (DEFAULT ttl handled by caller; cache writes always)
-    conn = get_conn()
-    conn.execute(
-        "INSERT OR REPLACE INTO comps_cache(card_key, fetched_at_utc, comps_json, stats_json) VALUES(?,?,?,?)",
-        (
-            req.identity.card_key,
-            datetime.now(timezone.utc).isoformat(),
-            json.dumps([c.model_dump() for c in comps_list], default=str),
-            json.dumps(stats.model_dump(), default=str),
-        ),
+def comps(req: CompsRequest) -> Response:
+    entry = _comps_cache.lookup(req.identity)
+    comps_json, stats_json = entry.json_parts()
+    body = b'{"identity":%s,"comps":%s,"stats":%s,"degraded":%s}' % (
+        dump(req.identity), comps_json, stats_json, b"true" if entry.degraded else b"false")
+    return Response(content=body, media_type="application/json")
+
+def _log_rows(rows: List[Tuple[str, DecisionRequest, bytes, DecisionResult]], fee_version: str) -> None:
+    """Log responses as the bytes already sent, with their typed columns taken from the results."""
+    created = now_utc()
+    get_log_writer().submit_many(
+        LogRecord(created, req, body, fee_version, card_key=card_key, summary=log_summary(res))
+        for card_key, req, body, res in rows
     )
-    conn.commit()
-    conn.close()
 
-    return CompsResponse(identity=req.identity, comps=comps_list, stats=stats)
+@router.get("/comps/{card_key}/windows")
+def comps_windows(card_key: str, days: List[float] = Query([7, 30, 90])) -> Dict[str, Optional[MarketStats]]:
+    """Market stats over trailing windows of the stored sales history (null when a window is empty).
+
+    The tracked windows (CARDKING_TREND_WINDOWS) are served from the rolling
+    trend tracker; other lengths are computed from the table.
+    """
+    return {
+        f"{d:g}": _trends.window_stats(card_key, d) if d in _trends.windows else sold_comps.window_stats(card_key, d)
+        for d in days
+    }
+
+@router.get("/comps/{card_key}/trend", response_model=MarketTrend)
+def comps_trend(card_key: str) -> MarketTrend:
+    """Rolling-window stats, exponentially weighted median and momentum for a card."""
+    return _trends.trend(card_key)
+
+@router.get("/comps/cache_stats")
+def comps_cache_stats() -> Dict[str, int]:
+    return _comps_cache.stats()
+
+@router.get("/decision/cache_stats")
+def decision_cache_stats() -> Dict[str, int]:
+    return _decision_cache.stats()
+
+@router.get("/db/pool_stats")
+def db_pool_stats() -> Dict[str, float]:
+    return get_pool().stats()
+
+@router.get("/decision/log_stats")
+def decision_log_stats() -> Dict[str, int]:
+    return get_log_writer().stats()
 
 @router.post("/decision", response_model=DecisionResponse)
-def decision(req: DecisionRequest) -> DecisionResponse:
+def decision(req: DecisionRequest) -> Response:
     fees = _load_fees()
 
-    identity = identify(CardIdentifyRequest(query=req.query))
-    provider = StubCompsProvider()
-    comps_list, stats = provider.get_recent_sold_comps(identity)
-
-    probs = grade_probabilities(
-        centering=float(req.metrics.centering),
-        corners=float(req.metrics.corners),
-        edges=float(req.metrics.edges),
-        surface=float(req.metrics.surface),
-        issue_flag=bool(req.metrics.issue_flag),
-    )
+    with stage("identify"):
+        identity = identify(CardIdentifyRequest(query=req.query))
+    with stage("comps"):
+        entry = _comps_cache.lookup(identity)
+    stats = entry.stats
+    snapshot = entry.fetched_at.isoformat()
+    if req.recency_weighted:
+        with stage("recency"):
+            stats = _recency_weighted(identity.card_key, stats)
+        # the weighted quartiles move as the windows roll, so they are part of the key
+        snapshot = f"{snapshot}|rw:{stats.p25}:{stats.median}:{stats.p75}"
+    if req.roi_samples is not None:
+        snapshot = f"{snapshot}|mc:{req.roi_samples}:{req.roi_seed}"
 
     listed_price = Decimal(str(req.listed_price)) if req.listed_price is not None else None
 
-    res = decide(
+    # degraded answers share the snapshot of the last good one, so they stay out of the cache
+    cache_key = None if entry.degraded else _decision_cache.key(identity.card_key, req.metrics, listed_price, snapshot, fees.version)
+    body = _decision_cache.get(cache_key) if cache_key is not None else None
+    if body is not None:
+        with stage("log_enqueue"):
+            get_log_writer().submit(LogRecord(now_utc(), req, body, fees.version, card_key=identity.card_key))
+        return Response(content=body, media_type="application/json")
+
+    with stage("grading"):
+        probs = grade_probs_for(req.metrics)
+
+    with stage("decide"):
+        res = _decide(
+            market_p25=Decimal(str(stats.p25)),
+            market_median=Decimal(str(stats.median)),
+            market_p75=Decimal(str(stats.p75)),
+            comps_count=int(stats.comps_count),
+            grade_probs=probs,
+            fees=fees,
+            listed_price=listed_price,
+            risk_tolerance="standard",
+        )
+
+    distribution = None
+    if req.roi_samples is not None:
+        with stage("simulate"):
+            distribution = roi_distributions([stats], [probs], fees, req.roi_samples, req.roi_seed)[0][0]
+
+    with stage("response_build"):
+        body = response_body(decision_response(res, stats, probs, degraded=entry.degraded, roi_distribution=distribution))
+    if cache_key is not None:
+        _decision_cache.put(cache_key, body)
+
+    # log decision
+    with stage("log_enqueue"):
+        _log_rows([(identity.card_key, req, body, res)], fees.version)
+
+    return Response(content=body, media_type="application/json")
+
+@router.post("/decision/batch", response_model=DecisionBatchResponse)
+def decision_batch(req: DecisionBatchRequest) -> Response:
+    fees = _load_fees()
+
+    # one comps lookup per distinct card_key, one grading run per distinct metrics
+    market: Dict[Tuple[str, bool], Tuple[MarketStats, bool]] = {}
+    probs_memo: Dict[Tuple, Dict[str, float]] = {}
+    stats_list: List[MarketStats] = []
+    degraded_list: List[bool] = []
+    probs_list: List[Dict[str, float]] = []
+    inputs: List[DecisionInput] = []
+    card_keys: List[str] = []
+    for item in req.items:
+        identity = identify(CardIdentifyRequest(query=item.query))
+        resolved = market.get((identity.card_key, item.recency_weighted))
+        if resolved is None:
+            with priority(BATCH):
+                entry = _comps_cache.lookup(identity)
+            stats = entry.stats
+            if item.recency_weighted:
+                stats = _recency_weighted(identity.card_key, stats)
+            resolved = market[(identity.card_key, item.recency_weighted)] = (stats, entry.degraded)
+        stats, degraded = resolved
+
+        m = item.metrics
+        mkey = (m.centering, m.corners, m.edges, m.surface, m.issue_flag)
+        probs = probs_memo.get(mkey)
+        if probs is None:
+            probs = grade_probs_for(item.metrics)
+            probs_memo[mkey] = probs
+
+        card_keys.append(identity.card_key)
+        stats_list.append(stats)
+        degraded_list.append(degraded)
+        probs_list.append(probs)
+        inputs.append(
+            DecisionInput(
+                market_p25=Decimal(str(stats.p25)),
+                market_median=Decimal(str(stats.median)),
+                market_p75=Decimal(str(stats.p75)),
+                comps_count=int(stats.comps_count),
+                grade_probs=probs,
+                listed_price=Decimal(str(item.listed_price)) if item.listed_price is not None else None,
+            )
+        )
+
+    with stage("batch_decide"):
+        results = decide_many(inputs, fees, mode=_ENGINE_MODE)
+
+    # items asking for the same draws are simulated together, each on stream 0 like /api/decision
+    distributions: List[Optional[RoiDistributionOut]] = [None] * len(req.items)
+    groups: Dict[Tuple[int, int], List[int]] = {}
+    for i, item in enumerate(req.items):
+        if item.roi_samples is not None:
+            groups.setdefault((item.roi_samples, item.roi_seed), []).append(i)
+    with stage("batch_simulate"):
+        for (samples, seed), idx in groups.items():
+            per_card, _ = roi_distributions(
+                [stats_list[i] for i in idx], [probs_list[i] for i in idx], fees, samples, seed, streams=[0] * len(idx)
+            )
+            for i, d in zip(idx, per_card):
+                distributions[i] = d
+
+    with stage("batch_response_build"):
+        bodies = [
+            response_body(decision_response(r, s, p, degraded=d, roi_distribution=mc))
+            for r, s, p, d, mc in zip(results, stats_list, probs_list, degraded_list, distributions)
+        ]
+
+    with stage("batch_log_enqueue"):
+        _log_rows(list(zip(card_keys, req.items, bodies, results)), fees.version)
+
+    return Response(content=b'{"results":%s}' % json_array(bodies), media_type="application/json")
+
+def _ndjson(rows: Iterator[Dict[str, Any]]) -> Iterator[bytes]:
+    for row in rows:
+        yield (json.dumps(row) + "\n").encode("utf-8")
+
+def _csv(rows: Iterator[Dict[str, Any]], columns: List[str]) -> Iterator[bytes]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columns)
+    for i, row in enumerate(rows, start=1):
+        writer.writerow([row[c] for c in columns])
+        if i % 500 == 0:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode("utf-8")
+
+@router.get("/decision_log/export")
+def decision_log_export(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    card_key: Optional[str] = None,
+    include_payloads: bool = False,
+    page_size: int = Query(1000, ge=1, le=10000),
+) -> StreamingResponse:
+    rows = decision_log.iter_log(since, until, card_key, include_payloads, page_size)
+    if format == "csv":
+        columns = list(decision_log.EXPORT_COLUMNS)
+        if include_payloads:
+            columns += ["request_json", "response_json"]
+        return StreamingResponse(_csv(rows, columns), media_type="text/csv")
+    return StreamingResponse(_ndjson(rows), media_type="application/x-ndjson")
+
+@router.get("/decision_log/rollups")
+def decision_log_rollups(
+    since_day: Optional[str] = None, until_day: Optional[str] = None, fee_version: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    return decision_log.rollups(since_day, until_day, fee_version)
+
+_MAX_SWEEP_POINTS = 200_000
+_MAX_SIMULATION_DRAWS = 100_000_000  # cards x samples per grading submission
+
+@router.post("/jobs", response_model=JobStatus, status_code=202)
+def jobs_submit(req: JobSubmitRequest) -> JobStatus:
+    """Queue a background re-evaluation of `items`; poll /jobs/{id} and stream /jobs/{id}/results."""
+    return job_manager.submit(req.items)
+
+def _job_or_404(status: Optional[JobStatus]) -> JobStatus:
+    if status is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return status
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+def jobs_status(job_id: str) -> JobStatus:
+    return _job_or_404(job_manager.status(job_id))
+
+@router.post("/jobs/{job_id}/cancel", response_model=JobStatus)
+def jobs_cancel(job_id: str) -> JobStatus:
+    return _job_or_404(job_manager.cancel(job_id))
+
+def _job_results(job_id: str, after: int, follow: bool, poll_seconds: float = 0.25) -> Iterator[bytes]:
+    while True:
+        # read the status first: results committed before a terminal status are then all visible
+        status = job_manager.status(job_id)
+        for idx, card_key, body in job_manager.iter_results(job_id, after):
+            after = idx
+            yield b'{"index":%d,"card_key":%s,"result":%s}\n' % (idx, json.dumps(card_key).encode("utf-8"), body.encode("utf-8"))
+        if not follow or status is None or status.status in TERMINAL_STATUSES:
+            return
+        time.sleep(poll_seconds)
+
+@router.get("/jobs/{job_id}/results")
+def jobs_results(job_id: str, after: int = -1, follow: bool = False) -> StreamingResponse:
+    """NDJSON of finished items in index order; `follow` keeps streaming until the job ends."""
+    _job_or_404(job_manager.status(job_id))
+    return StreamingResponse(_job_results(job_id, after, follow), media_type="application/x-ndjson")
+
+@router.post("/portfolio/{portfolio_id}/import")
+async def portfolio_import(
+    portfolio_id: str,
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = None,
+    replace: bool = False,
+) -> StreamingResponse:
+    """Upload a collection as CSV or NDJSON; streams one NDJSON result per row.
+
+    The body is spooled to a temporary file as it arrives and parsed lazily
+    while results stream back, so memory doesn't grow with the upload.
+    Rows whose inputs haven't changed since the last run reuse their stored
+    result. `replace` drops stored rows missing from this upload.
+    """
+    fmt = format or ("ndjson" if "json" in request.headers.get("content-type", "") else "csv")
+    spool = tempfile.TemporaryFile()
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+
+    def body() -> Iterator[bytes]:
+        try:
+            lines = io.TextIOWrapper(spool, encoding="utf-8-sig", newline="")
+            parse = parse_ndjson if fmt == "ndjson" else parse_csv
+            yield from _portfolio.run(portfolio_id, parse(lines), replace=replace)
+        finally:
+            spool.close()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@router.post("/portfolio/{portfolio_id}/evaluate")
+def portfolio_evaluate(portfolio_id: str) -> StreamingResponse:
+    """Re-run the stored portfolio; only rows whose comps, fees or metrics changed are re-decided."""
+    return StreamingResponse(_portfolio.run(portfolio_id, stored_items(portfolio_id)), media_type="application/x-ndjson")
+
+def _threshold_out(t: Threshold) -> BuyThresholdOut:
+    return BuyThresholdOut(
+        card_key=t.card_key,
+        query=t.query,
+        max_buy_price=None if t.max_buy_cents is None else Decimal(t.max_buy_cents).scaleb(-2),
+        comps_count=t.comps_count,
+        fee_version=t.fee_version,
+    )
+
+@router.post("/scanner/watch", response_model=List[BuyThresholdOut])
+def scanner_watch(req: ScannerWatchRequest) -> List[BuyThresholdOut]:
+    """Add cards to the listing scanner's watchlist; returns their BUY thresholds."""
+    return [_threshold_out(t) for t in buy_thresholds.watch(req.queries)]
+
+@router.get("/scanner/thresholds", response_model=List[BuyThresholdOut])
+def scanner_thresholds() -> List[BuyThresholdOut]:
+    buy_thresholds.refresh()
+    return [_threshold_out(t) for t in buy_thresholds.all()]
+
+@router.delete("/scanner/thresholds/{card_key}")
+def scanner_unwatch(card_key: str) -> Dict[str, bool]:
+    return {"removed": buy_thresholds.unwatch(card_key)}
+
+@router.post("/sweep", response_model=SweepResponse)
+def decision_sweep(req: SweepRequest) -> SweepResponse:
+    n_points = len(req.listed_prices) * len(req.grading_fees or [0]) * len(req.platform_fee_pcts or [0]) * len(req.multiplier_scales)
+    if n_points > _MAX_SWEEP_POINTS:
+        raise HTTPException(status_code=422, detail=f"grid has {n_points} points; max is {_MAX_SWEEP_POINTS}")
+
+    fees = _load_fees()
+    identity = identify(CardIdentifyRequest(query=req.query))
+    entry = _comps_cache.lookup(identity)
+    stats = entry.stats
+    probs = grade_probs_for(req.metrics)
+
+    res = sweep(
         market_p25=Decimal(str(stats.p25)),
         market_median=Decimal(str(stats.median)),
         market_p75=Decimal(str(stats.p75)),
         comps_count=int(stats.comps_count),
         grade_probs=probs,
         fees=fees,
-        listed_price=listed_price,
-        risk_tolerance="standard",
+        listed_prices=[Decimal(str(x)) if x is not None else None for x in req.listed_prices],
+        grading_fees=req.grading_fees,
+        platform_fee_pcts=req.platform_fee_pcts,
+        multiplier_scales=req.multiplier_scales,
     )
-
-    resp = DecisionResponse(
-        decision=res.decision,  # type: ignore
-        confidence=int(res.confidence),
-        risk=res.risk,  # type: ignore
+    labels = [[[[DECISIONS[c] for c in row] for row in plane] for plane in cube] for cube in res.decisions.tolist()]
+    t = res.thresholds
+    return SweepResponse(
         market_value=MarketValueOut(p25=stats.p25, median=stats.median, p75=stats.p75, currency=stats.currency),
-        grade_probabilities=probs,
-        roi=RoiOut(expected_net=res.expected_net, roi_pct=res.roi_pct, breakeven_grade=res.breakeven_grade),
-        explanation=res.explanation,
-    )
-
-    # log decision
-    conn = get_conn()
-    conn.execute(
-        "INSERT INTO decision_log(created_at_utc, request_json, response_json) VALUES(?,?,?)",
-        (
-            datetime.now(timezone.utc).isoformat(),
-            json.dumps(req.model_dump(), default=str),
-            json.dumps(resp.model_dump(), default=str),
+        listed_prices=res.listed_prices,
+        grading_fees=res.grading_fees,
+        platform_fee_pcts=res.platform_fee_pcts,
+        multiplier_scales=res.multiplier_scales,
+        expected_net=res.expected_net.tolist(),
+        decisions=labels,
+        thresholds=SweepThresholdsOut(
+            max_buy_price=t.max_buy_price,
+            min_median_for_grade=t.min_median_for_grade,
+            breakeven_grading_fee=t.breakeven_grading_fee,
+            max_grading_fee_for_grade=t.max_grading_fee_for_grade,
         ),
+        degraded=entry.degraded,
     )
-    conn.commit()
-    conn.close()
 
-    return resp
+@router.post("/grading/submission", response_model=GradingSubmissionResponse)
+def grading_submission(req: GradingSubmissionRequest) -> GradingSubmissionResponse:
+    draws = len(req.items) * req.samples
+    if draws > _MAX_SIMULATION_DRAWS:
+        raise HTTPException(status_code=422, detail=f"submission needs {draws} draws; max is {_MAX_SIMULATION_DRAWS}")
+
+    fees = _load_fees()
+    market: Dict[Tuple[str, bool], Tuple[MarketStats, bool]] = {}
+    card_keys: List[str] = []
+    stats_list: List[MarketStats] = []
+    probs_list: List[Dict[str, float]] = []
+    degraded_list: List[bool] = []
+    for item in req.items:
+        identity = identify(CardIdentifyRequest(query=item.query))
+        resolved = market.get((identity.card_key, item.recency_weighted))
+        if resolved is None:
+            with priority(BATCH):
+                entry = _comps_cache.lookup(identity)
+            stats = entry.stats
+            if item.recency_weighted:
+                stats = _recency_weighted(identity.card_key, stats)
+            resolved = market[(identity.card_key, item.recency_weighted)] = (stats, entry.degraded)
+        card_keys.append(identity.card_key)
+        stats_list.append(resolved[0])
+        degraded_list.append(resolved[1])
+        probs_list.append(grade_probs_for(item.metrics))
+
+    with stage("submission_simulate"):
+        per_card, total = roi_distributions(stats_list, probs_list, fees, req.samples, req.seed)
+
+    cards = []
+    for item, card_key, stats, probs, degraded, dist in zip(req.items, card_keys, stats_list, probs_list, degraded_list, per_card):
+        expected_net, _, _ = roi_summary(Decimal(str(stats.median)), probs, fees=fees)
+        cards.append(SubmissionCardOut(id=item.id, card_key=card_key, expected_net=expected_net, distribution=dist, degraded=degraded))
+    return GradingSubmissionResponse(
+        cards=cards,
+        expected_net=sum((c.expected_net for c in cards), Decimal("0")),
+        total=total,
+        degraded=any(degraded_list),
+    )
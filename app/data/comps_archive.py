@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+import argparse
+import mmap
+import struct
+import sys
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.engine.identity import guess_category, stable_card_key
+from app.services.comps_provider_stub import stub_sales
+
+# Layout (little-endian), every section follows the previous one:
+#   header   64 bytes: magic, version, n_cards, n_comps, anchor day
+#   keys     uint64[n_cards]    card_key as an integer, ascending
+#   starts   uint64[n_cards+1]  comp offsets; card i owns [starts[i], starts[i+1])
+#   prices   int32[n_comps]     sold price in cents, ascending within each card
+#   days     int32[n_comps]     sold date as days since 1970-01-01
+#   cards    uint32[n_comps]    owning card index (for whole-archive scans)
+MAGIC = b"CKCA"
+VERSION = 1
+_HEADER = struct.Struct("<4sIQQi36x")
+_EPOCH = date(1970, 1, 1)
+
+def key_to_int(card_key: str) -> Optional[int]:
+    """16-hex-char card_key as uint64, or None for keys this format can't hold."""
+    if len(card_key) != 16:
+        return None
+    try:
+        return int(card_key, 16)
+    except ValueError:
+        return None
+
+def day_number(d: date) -> int:
+    return (d - _EPOCH).days
+
+def day_to_iso(day: int) -> str:
+    return (datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(days=int(day))).isoformat()
+
+class CompsArchive:
+    """Read-only, memory-mapped view of a comps archive.
+
+    Opening maps the file and wraps each section in a numpy array without
+    copying; `find` is a binary search over the key column and `prices` /
+    `days` return slices of the mapped arrays.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, n_cards, n_comps, anchor_day = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a comps archive (version {VERSION})")
+        self.n_cards = n_cards
+        self.n_comps = n_comps
+        self.anchor_day = anchor_day
+        off = _HEADER.size
+        self.keys = np.frombuffer(self._mm, dtype="<u8", count=n_cards, offset=off)
+        off += 8 * n_cards
+        self.starts = np.frombuffer(self._mm, dtype="<u8", count=n_cards + 1, offset=off)
+        off += 8 * (n_cards + 1)
+        self.price_cents = np.frombuffer(self._mm, dtype="<i4", count=n_comps, offset=off)
+        off += 4 * n_comps
+        self.sold_days = np.frombuffer(self._mm, dtype="<i4", count=n_comps, offset=off)
+        off += 4 * n_comps
+        self.card_index = np.frombuffer(self._mm, dtype="<u4", count=n_comps, offset=off)
+
+    def find(self, card_key: str) -> Optional[int]:
+        k = key_to_int(card_key)
+        if k is None:
+            return None
+        k64 = np.uint64(k)
+        i = int(np.searchsorted(self.keys, k64))
+        if i < self.n_cards and self.keys[i] == k64:
+            return i
+        return None
+
+    def span(self, i: int) -> Tuple[int, int]:
+        return int(self.starts[i]), int(self.starts[i + 1])
+
+    def prices(self, i: int) -> np.ndarray:
+        lo, hi = self.span(i)
+        return self.price_cents[lo:hi]
+
+    def days(self, i: int) -> np.ndarray:
+        lo, hi = self.span(i)
+        return self.sold_days[lo:hi]
+
+    def close(self) -> None:
+        for name in ("keys", "starts", "price_cents", "sold_days", "card_index"):
+            self.__dict__.pop(name, None)
+        try:
+            self._mm.close()
+        except BufferError:
+            pass  # slices still referenced elsewhere; the map goes with them
+        self._file.close()
+
+def _write(path: str, keys: List[int], rows: Iterable[Tuple[List[int], List[int]]], n_comps: int, anchor_day: int) -> Tuple[int, int]:
+    """Stream per-card (price_cents, sold_days) rows, given in `keys` order, to disk."""
+    starts = np.zeros(len(keys) + 1, dtype="<u8")
+    prices_out = np.empty(n_comps, dtype="<i4")
+    days_out = np.empty(n_comps, dtype="<i4")
+    cards_out = np.empty(n_comps, dtype="<u4")
+    pos = 0
+    for i, (prices, days) in enumerate(rows):
+        order = sorted(range(len(prices)), key=prices.__getitem__)
+        n = len(order)
+        prices_out[pos:pos + n] = [prices[j] for j in order]
+        days_out[pos:pos + n] = [days[j] for j in order]
+        cards_out[pos:pos + n] = i
+        pos += n
+        starts[i + 1] = pos
+    if pos != n_comps:
+        raise ValueError(f"expected {n_comps} comps, got {pos}")
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(keys), n_comps, anchor_day))
+        f.write(np.asarray(keys, dtype="<u8").tobytes())
+        f.write(starts.tobytes())
+        f.write(prices_out.tobytes())
+        f.write(days_out.tobytes())
+        f.write(cards_out.tobytes())
+    return len(keys), n_comps
+
+def write_archive(path: str, cards: Iterable[Tuple[str, List[int], List[int]]], anchor_day: int) -> Tuple[int, int]:
+    """Write (card_key, price_cents, sold_days) rows; returns (n_cards, n_comps).
+
+    Cards are sorted by key and each card's sales by price; duplicate keys
+    keep their first occurrence.
+    """
+    by_key = {}
+    for card_key, prices, days in cards:
+        k = key_to_int(card_key)
+        if k is None:
+            raise ValueError(f"card_key {card_key!r} is not 16 hex chars")
+        by_key.setdefault(k, (prices, days))
+    keys = sorted(by_key)
+    n_comps = sum(len(by_key[k][0]) for k in keys)
+    return _write(path, keys, (by_key[k] for k in keys), n_comps, anchor_day)
+
+def generate(path: str, n_cards: int, comps_per_card: int = 10, prefix: str = "synthetic card",
+             anchor: Optional[date] = None, queries: Optional[Iterable[str]] = None) -> Tuple[int, int]:
+    """Archive of cards seeded exactly like StubCompsProvider, dated relative to `anchor`.
+
+    Only the key -> query map is held in memory; sales are generated in key
+    order straight into the output columns.
+    """
+    anchor_day = day_number(anchor or datetime.now(timezone.utc).date())
+    qs = queries if queries is not None else (f"{prefix} {i}" for i in range(n_cards))
+    by_key = {}
+    for q in qs:
+        by_key.setdefault(int(stable_card_key(q), 16), q)
+    keys = sorted(by_key)
+
+    def rows() -> Iterable[Tuple[List[int], List[int]]]:
+        for k in keys:
+            q = by_key[k]
+            sales = stub_sales(f"{k:016x}", guess_category(q), comps_per_card)
+            yield [round(p * 100) for p, _ in sales], [anchor_day - d for _, d in sales]
+
+    return _write(path, keys, rows(), len(keys) * comps_per_card, anchor_day)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Write a synthetic comps archive.")
+    ap.add_argument("--out", required=True, help="archive path")
+    ap.add_argument("--cards", type=int, default=100_000, help="cards to generate (ignored with --queries)")
+    ap.add_argument("--comps-per-card", type=int, default=10)
+    ap.add_argument("--prefix", default="synthetic card", help="queries are '<prefix> <i>'")
+    ap.add_argument("--queries", help="file with one card query per line instead of --prefix")
+    ap.add_argument("--anchor", type=date.fromisoformat, help="date sales are relative to (default: today UTC)")
+    args = ap.parse_args(argv)
+
+    queries = None
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    n_cards, n_comps = generate(args.out, args.cards, args.comps_per_card, args.prefix, args.anchor, queries)
+    print(f"wrote {n_cards} cards / {n_comps} comps to {args.out}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,8 +1,16 @@
 import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.services.metrics import DB_WAIT_SECONDS
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "cardking.sqlite3")
+DB_PATH = os.environ.get("CARDKING_DB_PATH", os.path.join(BASE_DIR, "cardking.sqlite3"))
+POOL_SIZE = int(os.environ.get("CARDKING_DB_POOL_SIZE", "4"))
 
 _SCHEMA = '''
 CREATE TABLE IF NOT EXISTS comps_cache (
@@ -15,13 +23,391 @@ CREATE TABLE IF NOT EXISTS decision_log (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   created_at_utc TEXT NOT NULL,
   request_json TEXT NOT NULL,
-  response_json TEXT NOT NULL
+  response_json TEXT NOT NULL,
+  fee_version TEXT
 );
 '''
 
-def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+# Hot statements. sqlite3 keeps a per-connection cache of prepared statements
+# keyed by SQL text, so pooled connections prepare each of these only once.
+SQL_INSERT_DECISION_LOG = (
+    "INSERT INTO decision_log(created_at_utc, card_key, decision, confidence, risk, expected_net_cents,"
+    " fee_version, request_json, response_json, payload_z) VALUES(?,?,?,?,?,?,?,?,?,?)"
+)
+SQL_UPSERT_DECISION_ROLLUP = (
+    "INSERT INTO decision_rollup_daily(day, decision, fee_version, n, sum_confidence, sum_expected_net_cents)"
+    " VALUES(?,?,?,?,?,?) ON CONFLICT(day, decision, fee_version) DO UPDATE SET"
+    " n = n + excluded.n,"
+    " sum_confidence = sum_confidence + excluded.sum_confidence,"
+    " sum_expected_net_cents = sum_expected_net_cents + excluded.sum_expected_net_cents"
+)
+SQL_UPSERT_COMPS_CACHE = (
+    "INSERT OR REPLACE INTO comps_cache(card_key, fetched_at_utc, comps_json, stats_json) VALUES(?,?,?,?)"
+)
+SQL_INSERT_SOLD_COMP = (
+    "INSERT OR IGNORE INTO sold_comps(card_key, listing_id, sold_date_utc, price_cents, title) VALUES(?,?,?,?,?)"
+)
+SQL_UPSERT_COMPS_SYNC = (
+    "INSERT INTO comps_sync(card_key, last_sync_utc, last_sold_date_utc) VALUES(?,?,?)"
+    " ON CONFLICT(card_key) DO UPDATE SET last_sync_utc = excluded.last_sync_utc,"
+    " last_sold_date_utc = NULLIF(MAX(COALESCE(last_sold_date_utc, ''), COALESCE(excluded.last_sold_date_utc, '')), '')"
+)
+SQL_SELECT_COMPS_CACHE = "SELECT fetched_at_utc, comps_json, stats_json FROM comps_cache WHERE card_key = ?"
+
+def _execute_script(conn: sqlite3.Connection, script: str) -> None:
+    # Statement by statement: executescript() commits first, which would break
+    # the surrounding migration transaction.
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+    if statement.strip():
+        raise ValueError(f"incomplete SQL statement: {statement.strip()[:60]}")
+
+def _m1_decision_log_fee_version(conn: sqlite3.Connection) -> None:
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(decision_log)")}
+    if "fee_version" not in cols:
+        conn.execute("ALTER TABLE decision_log ADD COLUMN fee_version TEXT")
+
+def _m2_decision_log_typed_columns(conn: sqlite3.Connection) -> None:
+    # Typed, indexed columns for the fields analysis needs; raw payloads become
+    # optional (plain text or zlib-compressed). SQLite can't relax NOT NULL in
+    # place, so the table is rebuilt and existing rows are backfilled.
+    _execute_script(conn, '''
+CREATE TABLE decision_log_v2 (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  created_at_utc TEXT NOT NULL,
+  card_key TEXT,
+  decision TEXT,
+  confidence INTEGER,
+  risk TEXT,
+  expected_net_cents INTEGER,
+  fee_version TEXT,
+  request_json TEXT,
+  response_json TEXT,
+  payload_z BLOB
+);
+INSERT INTO decision_log_v2(id, created_at_utc, decision, confidence, risk, expected_net_cents,
+                            fee_version, request_json, response_json)
+SELECT id, created_at_utc,
+       json_extract(response_json, '$.decision'),
+       json_extract(response_json, '$.confidence'),
+       json_extract(response_json, '$.risk'),
+       CAST(ROUND(CAST(json_extract(response_json, '$.roi.expected_net') AS REAL) * 100) AS INTEGER),
+       fee_version, request_json, response_json
+FROM decision_log;
+DROP TABLE decision_log;
+ALTER TABLE decision_log_v2 RENAME TO decision_log;
+CREATE INDEX IF NOT EXISTS ix_decision_log_created ON decision_log(created_at_utc);
+CREATE INDEX IF NOT EXISTS ix_decision_log_card ON decision_log(card_key, created_at_utc);
+
+CREATE TABLE IF NOT EXISTS decision_rollup_daily (
+  day TEXT NOT NULL,
+  decision TEXT NOT NULL,
+  fee_version TEXT NOT NULL,
+  n INTEGER NOT NULL,
+  sum_confidence INTEGER NOT NULL,
+  sum_expected_net_cents INTEGER NOT NULL,
+  PRIMARY KEY (day, decision, fee_version)
+);
+INSERT INTO decision_rollup_daily(day, decision, fee_version, n, sum_confidence, sum_expected_net_cents)
+SELECT substr(created_at_utc, 1, 10), COALESCE(decision, ''), COALESCE(fee_version, ''),
+       COUNT(*), COALESCE(SUM(confidence), 0), COALESCE(SUM(expected_net_cents), 0)
+FROM decision_log GROUP BY 1, 2, 3;
+''')
+
+def _m3_sold_comps(conn: sqlite3.Connection) -> None:
+    # One row per sale, deduplicated by listing identity. The index covers
+    # window scans (card_key + date range) without touching the table.
+    _execute_script(conn, '''
+CREATE TABLE IF NOT EXISTS sold_comps (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  card_key TEXT NOT NULL,
+  listing_id TEXT NOT NULL,
+  sold_date_utc TEXT NOT NULL,
+  price_cents INTEGER NOT NULL,
+  title TEXT NOT NULL,
+  UNIQUE (card_key, listing_id)
+);
+CREATE INDEX IF NOT EXISTS ix_sold_comps_card_date ON sold_comps(card_key, sold_date_utc, price_cents);
+
+CREATE TABLE IF NOT EXISTS comps_sync (
+  card_key TEXT PRIMARY KEY,
+  last_sync_utc TEXT NOT NULL,
+  last_sold_date_utc TEXT
+);
+''')
+
+def _m4_jobs(conn: sqlite3.Connection) -> None:
+    # Background re-evaluation jobs. The input is stored (zlib JSON) so a job
+    # interrupted by a restart can be resumed; job_results holds one row per
+    # finished item and doubles as the resume checkpoint.
+    _execute_script(conn, '''
+CREATE TABLE IF NOT EXISTS jobs (
+  id TEXT PRIMARY KEY,
+  kind TEXT NOT NULL,
+  status TEXT NOT NULL,
+  created_at_utc TEXT NOT NULL,
+  updated_at_utc TEXT NOT NULL,
+  fee_version TEXT,
+  total INTEGER NOT NULL,
+  done INTEGER NOT NULL DEFAULT 0,
+  error TEXT,
+  input_z BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status ON jobs(status, created_at_utc);
+
+CREATE TABLE IF NOT EXISTS job_results (
+  job_id TEXT NOT NULL,
+  idx INTEGER NOT NULL,
+  card_key TEXT,
+  response_json TEXT NOT NULL,
+  PRIMARY KEY (job_id, idx)
+) WITHOUT ROWID;
+''')
+
+def _m5_portfolio(conn: sqlite3.Connection) -> None:
+    # Imported collections. `fingerprint` hashes everything the stored
+    # response depends on, so re-imports only re-decide rows whose comps
+    # snapshot, fee version or metrics moved. `import_id` marks the upload
+    # that last touched a row (used to drop rows missing from a full re-upload).
+    _execute_script(conn, '''
+CREATE TABLE IF NOT EXISTS portfolio (
+  portfolio_id TEXT NOT NULL,
+  row_key TEXT NOT NULL,
+  query TEXT NOT NULL,
+  centering REAL NOT NULL,
+  corners REAL NOT NULL,
+  edges REAL NOT NULL,
+  surface REAL NOT NULL,
+  issue_flag INTEGER NOT NULL,
+  purchase_price_cents INTEGER,
+  card_key TEXT,
+  fingerprint TEXT,
+  response_json TEXT,
+  evaluated_at_utc TEXT,
+  import_id TEXT,
+  PRIMARY KEY (portfolio_id, row_key)
+) WITHOUT ROWID;
+''')
+
+def _m6_buy_thresholds(conn: sqlite3.Connection) -> None:
+    # Scanner watchlist: the highest listed price at which `decide` returns
+    # BUY for each watched card (NULL when it never can), plus the market
+    # snapshot it came from so candidates can be decided without a comps lookup.
+    _execute_script(conn, '''
+CREATE TABLE IF NOT EXISTS buy_thresholds (
+  card_key TEXT PRIMARY KEY,
+  query TEXT NOT NULL,
+  max_buy_cents INTEGER,
+  p25_cents INTEGER NOT NULL,
+  median_cents INTEGER NOT NULL,
+  p75_cents INTEGER NOT NULL,
+  comps_count INTEGER NOT NULL,
+  currency TEXT NOT NULL,
+  fee_version TEXT NOT NULL,
+  snapshot TEXT NOT NULL,
+  updated_at_utc TEXT NOT NULL
+) WITHOUT ROWID;
+''')
+
+# Applied in order; PRAGMA user_version records how many have run.
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _m1_decision_log_fee_version,
+    _m2_decision_log_typed_columns,
+    _m3_sold_comps,
+    _m4_jobs,
+    _m5_portfolio,
+    _m6_buy_thresholds,
+]
+
+_init_lock = threading.Lock()
+_initialized: set = set()
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, cached_statements=256)
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA synchronous=NORMAL;")
-    conn.executescript(_SCHEMA)
     return conn
+
+def _in_transaction(conn: sqlite3.Connection, work: Callable[[], bool]) -> bool:
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        result = work()
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return result
+
+def _migrate_next(conn: sqlite3.Connection) -> bool:
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= len(MIGRATIONS):
+        return False
+    MIGRATIONS[version](conn)
+    conn.execute(f"PRAGMA user_version = {version + 1}")
+    return True
+
+def init_db(path: Optional[str] = None) -> None:
+    """Create tables and apply pending migrations (once per database path)."""
+    path = path or DB_PATH
+    with _init_lock:
+        if path in _initialized:
+            return
+        conn = _connect(path)
+        conn.isolation_level = None  # transactions are explicit below
+        try:
+            # Each migration commits together with its user_version bump, so a
+            # crash leaves the schema at a known version. BEGIN IMMEDIATE takes
+            # the write lock up front; the version is re-read under it in case
+            # another process migrated meanwhile.
+            _in_transaction(conn, lambda: _execute_script(conn, _SCHEMA))
+            while _in_transaction(conn, lambda: _migrate_next(conn)):
+                pass
+        finally:
+            conn.close()
+        _initialized.add(path)
+
+def get_conn() -> sqlite3.Connection:
+    """Standalone connection for scripts; request paths should use `connection()`."""
+    init_db()
+    return _connect(DB_PATH)
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections checked out per unit of work.
+
+    Connections are opened lazily up to `size`. `connection()` commits on
+    success and rolls back on error before returning the connection.
+    """
+
+    # stats() keys that only grow
+    COUNTERS: Tuple[str, ...] = ("checkouts", "waits", "wait_time_total_ms", "timeouts")
+
+    def __init__(self, path: str, size: int = 4, timeout: float = 10.0) -> None:
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._timeouts = 0
+        self._closed = False
+        init_db(path)
+
+    def _acquire(self) -> sqlite3.Connection:
+        waited = 0.0
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+        if conn is None:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError("connection pool is closed")
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = _connect(self.path)
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                start = time.perf_counter()
+                try:
+                    conn = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise TimeoutError(f"no database connection available within {self.timeout}s")
+                waited = time.perf_counter() - start
+                with self._lock:
+                    self._waits += 1
+                    self._wait_total += waited
+                    self._wait_max = max(self._wait_max, waited)
+        DB_WAIT_SECONDS.observe(waited)
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+        return conn
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            self._in_use -= 1
+            closed = self._closed
+        if closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._created,
+                "in_use": self._in_use,
+                "utilization": self._in_use / self.size,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_total_ms": self._wait_total * 1000.0,
+                "wait_time_max_ms": self._wait_max * 1000.0,
+                "timeouts": self._timeouts,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    pool = _pool
+    if pool is not None and pool.path == DB_PATH:
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.path != DB_PATH:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_PATH, size=POOL_SIZE)
+        return _pool
+
+def connection():
+    """Check out a pooled connection: `with connection() as conn: ...`."""
+    return get_pool().connection()
+
+def close_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.data import db
+from app.data.log_writer import decompress_payload
+
+EXPORT_COLUMNS = (
+    "id", "created_at_utc", "card_key", "decision", "confidence", "risk", "expected_net", "fee_version",
+)
+
+def _cents(v: Optional[int]) -> Optional[str]:
+    return None if v is None else str(Decimal(v).scaleb(-2))
+
+def iter_log(
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    card_key: Optional[str] = None,
+    include_payloads: bool = False,
+    page_size: int = 1000,
+) -> Iterator[Dict[str, Any]]:
+    """Yield decision_log rows oldest first, one keyset page per pool checkout.
+
+    Pages are `WHERE id > last_id ORDER BY id LIMIT page_size`, so memory
+    stays constant and no connection is held while the caller consumes rows.
+    """
+    where: List[str] = ["id > ?"]
+    params: List[Any] = []
+    if since:
+        where.append("created_at_utc >= ?")
+        params.append(since)
+    if until:
+        where.append("created_at_utc < ?")
+        params.append(until)
+    if card_key:
+        where.append("card_key = ?")
+        params.append(card_key)
+    payload_cols = ", request_json, response_json, payload_z" if include_payloads else ""
+    sql = (
+        "SELECT id, created_at_utc, card_key, decision, confidence, risk, expected_net_cents, fee_version"
+        f"{payload_cols} FROM decision_log WHERE {' AND '.join(where)} ORDER BY id LIMIT ?"
+    )
+    last_id = 0
+    while True:
+        with db.connection() as conn:
+            page = conn.execute(sql, (last_id, *params, page_size)).fetchall()
+        for row in page:
+            out: Dict[str, Any] = dict(zip(EXPORT_COLUMNS, row[:8]))
+            out["expected_net"] = _cents(row[6])
+            if include_payloads:
+                req, resp, blob = row[8:11]
+                if blob is not None:
+                    req, resp = decompress_payload(blob)
+                out["request_json"], out["response_json"] = req, resp
+            yield out
+        if len(page) < page_size:
+            return
+        last_id = page[-1][0]
+
+def prune(older_than: str, batch_size: int = 5000) -> int:
+    """Delete log rows created before `older_than` (ISO UTC), in short transactions.
+
+    Daily rollups are kept, so aggregate history survives pruning.
+    """
+    deleted = 0
+    while True:
+        with db.connection() as conn:
+            n = conn.execute(
+                "DELETE FROM decision_log WHERE id IN ("
+                "SELECT id FROM decision_log WHERE created_at_utc < ? ORDER BY id LIMIT ?)",
+                (older_than, batch_size),
+            ).rowcount
+        deleted += n
+        if n < batch_size:
+            return deleted
+
+def cutoff(days: float, now: Optional[datetime] = None) -> str:
+    return ((now or datetime.now(timezone.utc)) - timedelta(days=days)).isoformat()
+
+def rollups(
+    since_day: Optional[str] = None,
+    until_day: Optional[str] = None,
+    fee_version: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    where: List[str] = []
+    params: List[Any] = []
+    if since_day:
+        where.append("day >= ?")
+        params.append(since_day)
+    if until_day:
+        where.append("day <= ?")
+        params.append(until_day)
+    if fee_version is not None:
+        where.append("fee_version = ?")
+        params.append(fee_version)
+    sql = "SELECT day, decision, fee_version, n, sum_confidence, sum_expected_net_cents FROM decision_rollup_daily"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY day, decision, fee_version"
+    with db.connection() as conn:
+        rows = conn.execute(sql, params).fetchall()
+    return [
+        {
+            "day": day,
+            "decision": decision,
+            "fee_version": fv,
+            "count": n,
+            "avg_confidence": sum_conf / n if n else 0.0,
+            "total_expected_net": _cents(sum_net),
+        }
+        for day, decision, fv, n, sum_conf, sum_net in rows
+    ]
+
+class RetentionJob:
+    """Background thread that prunes rows older than `days` every `interval_seconds`."""
+
+    def __init__(self, days: float, interval_seconds: float = 3600.0) -> None:
+        if days <= 0:
+            raise ValueError("days must be > 0")
+        self.days = days
+        self.interval = interval_seconds
+        self.last_deleted = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="decision-log-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_once(self) -> int:
+        self.last_deleted = prune(cutoff(self.days))
+        return self.last_deleted
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                pass  # retried next interval
+            if self._stop.wait(self.interval):
+                return
@@ -0,0 +1,354 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.data import db
+from app.engine.serialize import dump
+
+FULL_POLICIES = ("block", "drop", "spill")
+# columns in a decision_log row (and so values in a spill file line)
+_ROW_WIDTH = db.SQL_INSERT_DECISION_LOG.count("?")
+# How raw request/response JSON is kept next to the typed columns.
+PAYLOAD_MODES = ("full", "compressed", "none")
+
+@dataclass(frozen=True)
+class LogRecord:
+    created_at_utc: str
+    request: Any  # pydantic model (serialized on the writer thread) or JSON bytes/str
+    response: Any
+    fee_version: Optional[str] = None
+    card_key: Optional[str] = None
+    # (decision, confidence, risk, expected_net_cents) when the caller has it; else read from the response
+    summary: Optional[Tuple] = None
+
+    def to_row(self, payloads: str = "full") -> Tuple:
+        """Row for db.SQL_INSERT_DECISION_LOG; typed fields are read from the response."""
+        req_json = _as_json(self.request)
+        resp_json = _as_json(self.response)
+        summary = self.summary if self.summary is not None else _summary(self.response, resp_json)
+        if payloads == "full":
+            raw: Tuple = (req_json, resp_json, None)
+        elif payloads == "compressed":
+            raw = (None, None, compress_payload(req_json, resp_json))
+        else:
+            raw = (None, None, None)
+        return (self.created_at_utc, self.card_key, *summary, self.fee_version, *raw)
+
+def _as_json(obj: Any) -> str:
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8")
+    if isinstance(obj, str):
+        return obj
+    return dump(obj).decode("utf-8")
+
+def _summary(response: Any, response_json: str) -> Tuple:
+    """(decision, confidence, risk, expected_net_cents) of a DecisionResponse or its JSON."""
+    if isinstance(response, (bytes, str)):
+        try:
+            data = json.loads(response_json)
+        except ValueError:
+            return (None, None, None, None)
+        roi = data.get("roi") or {}
+        decision, confidence, risk, net = data.get("decision"), data.get("confidence"), data.get("risk"), roi.get("expected_net")
+    else:
+        roi = getattr(response, "roi", None)
+        decision, confidence, risk = (getattr(response, k, None) for k in ("decision", "confidence", "risk"))
+        net = getattr(roi, "expected_net", None)
+    return (decision, confidence, risk, to_cents(net))
+
+def to_cents(value: Any) -> Optional[int]:
+    if value is None:
+        return None
+    return int((Decimal(str(value)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+def compress_payload(request_json: str, response_json: str) -> bytes:
+    return zlib.compress(json.dumps([request_json, response_json]).encode("utf-8"))
+
+def decompress_payload(blob: bytes) -> Tuple[str, str]:
+    req, resp = json.loads(zlib.decompress(blob).decode("utf-8"))
+    return req, resp
+
+def rollup_rows(rows: Iterable[Tuple]) -> List[Tuple]:
+    """Aggregate decision_log rows into decision_rollup_daily increments."""
+    acc: Dict[Tuple[str, str, str], List[int]] = defaultdict(lambda: [0, 0, 0])
+    for row in rows:
+        created, _, decision, confidence, _, cents, fee_version = row[:7]
+        a = acc[(created[:10], decision or "", fee_version or "")]
+        a[0] += 1
+        a[1] += confidence or 0
+        a[2] += cents or 0
+    return [(*k, *v) for k, v in acc.items()]
+
+def now_utc() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class DecisionLogWriter:
+    """Background group-commit writer for decision_log.
+
+    Records are queued by request handlers and written by one thread, one
+    transaction per `batch_size` rows or `flush_interval_ms`, whichever comes
+    first. When the queue is full the `full_policy` applies:
+
+    - "block": the caller waits for room,
+    - "drop": the record is discarded and counted,
+    - "spill": the row is appended to `spill_path` as NDJSON and loaded into
+      the database the next time the writer starts (counted as dropped if
+      the file can't be written; submit never raises over logging).
+
+    A batch whose transaction fails is retried `write_retries` times with a
+    short backoff, then spilled the same way when `spill_path` is set (under
+    any policy); only without one are its rows lost, counted in
+    `write_errors`.
+
+    Each batch also bumps the matching decision_rollup_daily counters in the
+    same transaction. `payloads` picks how raw JSON is kept: "full" text,
+    "compressed" (zlib blob) or "none" (typed columns only). Spilled rows
+    always carry full text so the spill file stays plain NDJSON.
+    """
+
+    COUNTERS: Tuple[str, ...] = (
+        "enqueued",
+        "written",
+        "batches",
+        "dropped",
+        "spilled",
+        "write_retries",
+        "write_errors",
+        "spill_bad_lines",
+        "spill_replay_errors",
+    )
+
+    def __init__(
+        self,
+        batch_size: int = 500,
+        flush_interval_ms: float = 50.0,
+        max_queue: int = 10000,
+        full_policy: str = "block",
+        spill_path: Optional[str] = None,
+        payloads: str = "compressed",
+        write_retries: int = 2,
+        retry_backoff_ms: float = 50.0,
+    ) -> None:
+        if full_policy not in FULL_POLICIES:
+            raise ValueError(f"full_policy must be one of {FULL_POLICIES}")
+        if payloads not in PAYLOAD_MODES:
+            raise ValueError(f"payloads must be one of {PAYLOAD_MODES}")
+        if full_policy == "spill" and not spill_path:
+            raise ValueError("spill_path is required for the spill policy")
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.full_policy = full_policy
+        self.spill_path = spill_path
+        self.payloads = payloads
+        self.write_retries = max(0, write_retries)
+        self.retry_backoff = retry_backoff_ms / 1000.0
+        self._queue: "queue.Queue[Optional[LogRecord]]" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._close_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._counters: Dict[str, int] = dict.fromkeys(self.COUNTERS, 0)
+
+    # -- lifecycle ----------------------------------------------------------
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._replay_spill()
+            self._thread = threading.Thread(target=self._run, name="decision-log-writer", daemon=True)
+            self._thread.start()
+
+    def flush(self) -> None:
+        """Block until every record queued so far has been written."""
+        if self._thread is None:
+            return
+        self._queue.join()
+
+    def close(self) -> None:
+        with self._close_lock:
+            with self._lock:
+                thread = self._thread
+            if thread is None:
+                return
+            self._queue.put(None)
+            thread.join()
+            # cleared only now: while the thread drains, submit() must not start a second one
+            with self._lock:
+                if self._thread is thread:
+                    self._thread = None
+
+    # -- producers ----------------------------------------------------------
+
+    def submit(self, record: LogRecord) -> bool:
+        return self.submit_many([record]) == 1
+
+    def submit_many(self, records: Iterable[LogRecord]) -> int:
+        """Queue records; returns how many were queued (not dropped/spilled)."""
+        if self._thread is None:
+            self.start()
+        queued = 0
+        for rec in records:
+            if self.full_policy == "block":
+                self._queue.put(rec)
+            else:
+                try:
+                    self._queue.put_nowait(rec)
+                except queue.Full:
+                    self._overflow(rec)
+                    continue
+            queued += 1
+        self._count("enqueued", queued)
+        return queued
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._counters)
+        out["queue_depth"] = self._queue.qsize()
+        out["queue_capacity"] = self._queue.maxsize
+        return out
+
+    # -- internals ----------------------------------------------------------
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def _overflow(self, rec: LogRecord) -> None:
+        if self.full_policy == "drop":
+            self._count("dropped")
+            return
+        try:
+            self._spill([rec.to_row()])
+        except Exception:
+            # disk full, bad path...: the record is lost, but logging never fails the request
+            self._count("dropped")
+
+    def _spill(self, rows: List[Tuple]) -> None:
+        lines = "".join(json.dumps(list(row)) + "\n" for row in rows)
+        with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as f:  # type: ignore[arg-type]
+            f.write(lines)
+        self._count("spilled", len(rows))
+
+    def _replay_spill(self) -> None:
+        """Load spilled rows; never raises, so a bad spill file can't stop startup.
+
+        Lines that don't parse as a row (a torn last line after a crash
+        mid-append) are moved to `<spill_path>.bad`. If the rows can't be
+        written the file stays for the next start. Called by start() under
+        self._lock, so counters are bumped directly.
+        """
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        with self._spill_lock:
+            try:
+                rows, bad = [], []
+                with open(self.spill_path, "r", encoding="utf-8", errors="replace") as f:
+                    for line in f:
+                        if not line.strip():
+                            continue
+                        try:
+                            row = json.loads(line)
+                        except ValueError:
+                            row = None
+                        if isinstance(row, list) and len(row) == _ROW_WIDTH:
+                            rows.append(tuple(row))
+                        else:
+                            bad.append(line if line.endswith("\n") else line + "\n")
+                if rows:
+                    self._write(rows)
+                if bad:
+                    with open(self.spill_path + ".bad", "a", encoding="utf-8") as f:
+                        f.writelines(bad)
+                    self._counters["spill_bad_lines"] += len(bad)
+                os.remove(self.spill_path)
+            except Exception:
+                self._counters["spill_replay_errors"] += 1
+
+    def _write(self, rows: List[Tuple]) -> None:
+        with db.connection() as conn:
+            conn.executemany(db.SQL_INSERT_DECISION_LOG, rows)
+            conn.executemany(db.SQL_UPSERT_DECISION_ROLLUP, rollup_rows(rows))
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is None:
+                self._queue.task_done()
+                break
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    rec = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if rec is None:
+                    stop = True
+                    self._queue.task_done()
+                    break
+                batch.append(rec)
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: List[LogRecord]) -> None:
+        try:
+            rows = [r.to_row(self.payloads) for r in batch]
+        except Exception:
+            self._count("write_errors", len(batch))
+            return
+        for attempt in range(self.write_retries + 1):
+            if attempt:
+                self._count("write_retries")
+                time.sleep(self.retry_backoff * attempt)
+            try:
+                self._write(rows)
+            except Exception:
+                continue
+            with self._lock:
+                self._counters["written"] += len(batch)
+                self._counters["batches"] += 1
+            return
+        if self.spill_path:
+            try:
+                # full-text rows, as for overflow, so the spill file stays plain NDJSON
+                self._spill(rows if self.payloads == "full" else [r.to_row() for r in batch])
+                return
+            except Exception:
+                pass
+        self._count("write_errors", len(batch))
+
+_writer: Optional[DecisionLogWriter] = None
+_writer_lock = threading.Lock()
+
+def get_log_writer() -> DecisionLogWriter:
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = DecisionLogWriter(
+                    batch_size=int(os.environ.get("CARDKING_LOG_BATCH_SIZE", "500")),
+                    flush_interval_ms=float(os.environ.get("CARDKING_LOG_FLUSH_MS", "50")),
+                    max_queue=int(os.environ.get("CARDKING_LOG_QUEUE_SIZE", "10000")),
+                    full_policy=os.environ.get("CARDKING_LOG_FULL_POLICY", "block"),
+                    spill_path=os.environ.get("CARDKING_LOG_SPILL_PATH"),
+                    payloads=os.environ.get("CARDKING_LOG_PAYLOADS", "compressed"),
+                )
+    return _writer
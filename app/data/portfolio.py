@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.data import db
+
+COLUMNS = (
+    "row_key", "query", "centering", "corners", "edges", "surface", "issue_flag",
+    "purchase_price_cents", "card_key", "fingerprint", "response_json",
+)
+
+SQL_UPSERT_PORTFOLIO = (
+    "INSERT INTO portfolio(portfolio_id, row_key, query, centering, corners, edges, surface, issue_flag,"
+    " purchase_price_cents, card_key, fingerprint, response_json, evaluated_at_utc, import_id)"
+    " VALUES(?,?,?,?,?,?,?,?,?,?,?,?,?,?)"
+    " ON CONFLICT(portfolio_id, row_key) DO UPDATE SET query = excluded.query, centering = excluded.centering,"
+    " corners = excluded.corners, edges = excluded.edges, surface = excluded.surface,"
+    " issue_flag = excluded.issue_flag, purchase_price_cents = excluded.purchase_price_cents,"
+    " card_key = excluded.card_key, fingerprint = excluded.fingerprint, response_json = excluded.response_json,"
+    " evaluated_at_utc = excluded.evaluated_at_utc, import_id = excluded.import_id"
+)
+
+def stored(portfolio_id: str, row_keys: Sequence[str]) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """row_key -> (fingerprint, response_json) for the rows that exist; one query per call."""
+    if not row_keys:
+        return {}
+    marks = ",".join("?" * len(row_keys))
+    with db.connection() as conn:
+        rows = conn.execute(
+            f"SELECT row_key, fingerprint, response_json FROM portfolio WHERE portfolio_id = ? AND row_key IN ({marks})",
+            (portfolio_id, *row_keys),
+        ).fetchall()
+    return {k: (fp, body) for k, fp, body in rows}
+
+def upsert(rows: List[Tuple]) -> None:
+    """Rows shaped like SQL_UPSERT_PORTFOLIO's parameters, in one transaction."""
+    with db.connection() as conn:
+        conn.executemany(SQL_UPSERT_PORTFOLIO, rows)
+
+def touch(portfolio_id: str, row_keys: Sequence[str], import_id: str) -> None:
+    """Mark stored rows as seen by `import_id` without changing them (rows an upload mentioned but couldn't evaluate)."""
+    if not row_keys:
+        return
+    marks = ",".join("?" * len(row_keys))
+    with db.connection() as conn:
+        conn.execute(
+            f"UPDATE portfolio SET import_id = ? WHERE portfolio_id = ? AND row_key IN ({marks})",
+            (import_id, portfolio_id, *row_keys),
+        )
+
+def delete_except(portfolio_id: str, import_id: str) -> int:
+    """Drop rows the upload `import_id` did not touch; returns how many."""
+    with db.connection() as conn:
+        cur = conn.execute("DELETE FROM portfolio WHERE portfolio_id = ? AND import_id IS NOT ?", (portfolio_id, import_id))
+        return cur.rowcount
+
+def iter_rows(portfolio_id: str, page_size: int = 1000) -> Iterator[Dict[str, object]]:
+    """Stored rows in row_key order, one keyset page per pool checkout."""
+    last = ""
+    while True:
+        with db.connection() as conn:
+            page = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM portfolio WHERE portfolio_id = ? AND row_key > ? ORDER BY row_key LIMIT ?",
+                (portfolio_id, last, page_size),
+            ).fetchall()
+        for row in page:
+            yield dict(zip(COLUMNS, row))
+        if len(page) < page_size:
+            return
+        last = page[-1][0]
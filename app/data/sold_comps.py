@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Iterable, List, Optional, Tuple
+
+from app.data import db
+from app.engine.market import order_stat_positions, summarize_order_stats
+from app.engine.schemas import MarketStats, SoldComp
+
+def listing_identity(comp: SoldComp) -> str:
+    """Provider listing id, or a content hash for providers that don't expose one."""
+    if comp.listing_id:
+        return comp.listing_id
+    raw = f"{normalize_date(comp.sold_date_utc)}|{comp.sold_price}|{comp.title}"
+    return "h:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+def normalize_date(value: str) -> str:
+    """ISO-8601 in UTC, so stored dates compare correctly as text."""
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat()
+
+def append(card_key: str, comps: Iterable[SoldComp], synced_at: datetime) -> int:
+    """Insert sales not already stored for `card_key`; returns how many were new."""
+    rows = [
+        (card_key, listing_identity(c), normalize_date(c.sold_date_utc), int(c.sold_price * 100), c.title)
+        for c in comps
+    ]
+    last_sold = max((r[2] for r in rows), default=None)
+    with db.connection() as conn:
+        before = conn.total_changes
+        conn.executemany(db.SQL_INSERT_SOLD_COMP, rows)
+        inserted = conn.total_changes - before
+        conn.execute(db.SQL_UPSERT_COMPS_SYNC, (card_key, synced_at.isoformat(), last_sold))
+    return inserted
+
+def last_sync(card_key: str) -> Optional[Tuple[str, Optional[str]]]:
+    """(last_sync_utc, last_sold_date_utc) for a card, or None if never synced."""
+    with db.connection() as conn:
+        row = conn.execute(
+            "SELECT last_sync_utc, last_sold_date_utc FROM comps_sync WHERE card_key = ?", (card_key,)
+        ).fetchone()
+    return None if row is None else (row[0], row[1])
+
+def _bounds(days: Optional[float], now: Optional[datetime]) -> Tuple[str, str]:
+    now = now or datetime.now(timezone.utc)
+    since = "" if days is None else (now - timedelta(days=days)).isoformat()
+    return since, now.isoformat()
+
+def recent(card_key: str, days: Optional[float] = None, now: Optional[datetime] = None, limit: int = 1000) -> List[SoldComp]:
+    """Stored sales in the window, newest first."""
+    since, until = _bounds(days, now)
+    with db.connection() as conn:
+        rows = conn.execute(
+            "SELECT listing_id, sold_date_utc, price_cents, title FROM sold_comps"
+            " WHERE card_key = ? AND sold_date_utc >= ? AND sold_date_utc <= ?"
+            " ORDER BY sold_date_utc DESC LIMIT ?",
+            (card_key, since, until, limit),
+        ).fetchall()
+    return [
+        SoldComp.model_construct(listing_id=lid, sold_date_utc=d, sold_price=Decimal(cents).scaleb(-2), title=t)
+        for lid, d, cents, t in rows
+    ]
+
+def rows_after(card_key: str, after_id: int = 0, since: str = "") -> List[Tuple[int, str, int]]:
+    """(id, sold_date_utc, price_cents) of sales stored after row `after_id` and sold on or after `since`.
+
+    Row ids only grow, so a reader that remembers the last id it saw picks
+    up exactly the sales appended since, whatever their sale dates.
+    """
+    with db.connection() as conn:
+        return conn.execute(
+            "SELECT id, sold_date_utc, price_cents FROM sold_comps"
+            " WHERE card_key = ? AND id > ? AND sold_date_utc >= ? ORDER BY id",
+            (card_key, after_id, since),
+        ).fetchall()
+
+_WINDOW = "FROM sold_comps WHERE card_key = ? AND sold_date_utc >= ? AND sold_date_utc <= ?"
+
+def window_stats(
+    card_key: str,
+    days: Optional[float] = None,
+    now: Optional[datetime] = None,
+    currency: str = "USD",
+) -> Optional[MarketStats]:
+    """MarketStats over sales in the last `days` (all history if None), or None if empty.
+
+    Only the count, the handful of order statistics the quartiles need and
+    the trimmed sum leave SQLite; all three are range scans on
+    ix_sold_comps_card_date. Results equal build_market_stats on the same sales.
+    """
+    since, until = _bounds(days, now)
+    window = (card_key, since, until)
+    with db.connection() as conn:
+        n = conn.execute(f"SELECT COUNT(*) {_WINDOW}", window).fetchone()[0]
+        if n == 0:
+            return None
+        positions, lo, hi = order_stat_positions(n)
+        ranked = f"SELECT price_cents, ROW_NUMBER() OVER (ORDER BY price_cents) - 1 AS rn {_WINDOW}"
+        marks = ",".join("?" * len(positions))
+        picked = conn.execute(
+            f"SELECT rn, price_cents FROM ({ranked}) WHERE rn IN ({marks})", (*window, *positions)
+        ).fetchall()
+        trimmed = conn.execute(
+            f"SELECT SUM(price_cents) FROM ({ranked}) WHERE rn >= ? AND rn < ?", (*window, lo, hi)
+        ).fetchone()[0]
+    summary = summarize_order_stats(
+        n,
+        {rn: Decimal(cents).scaleb(-2) for rn, cents in picked},
+        Decimal(trimmed).scaleb(-2),
+        hi - lo,
+    )
+    return MarketStats.model_construct(
+        p25=summary.p25,
+        median=summary.median,
+        p75=summary.p75,
+        comps_count=summary.count,
+        spread_ratio=float(summary.spread_ratio),
+        confidence=summary.confidence,
+        currency=currency,
+    )
@@ -2,10 +2,15 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from decimal import Decimal
-from typing import Dict, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Union
 
 from app.engine.market import spread_ratio as calc_spread_ratio, comps_confidence
 from app.engine.roi import roi_summary
+from app.engine.fees import FeeSchedule, as_fee_schedule
+from app.engine.fastmoney import FixedFees, cents_to_decimal, fixed_fees, roi_summary_cents, to_cents
+
+# "decimal" is the reference path; "fixed" does the same math in integer cents/bps.
+ENGINE_MODES = ("decimal", "fixed")
 
 Decision = str
 
@@ -22,37 +27,98 @@ class DecisionResult:
 def _clamp_int(x: float, lo: int, hi: int) -> int:
     return max(lo, min(hi, int(round(x))))
 
+@dataclass(frozen=True)
+class DecisionInput:
+    market_p25: Decimal
+    market_median: Decimal
+    market_p75: Decimal
+    comps_count: int
+    grade_probs: Dict[str, float]
+    listed_price: Optional[Decimal] = None
+    risk_tolerance: str = "standard"
+
 def decide(
     market_p25: Decimal,
     market_median: Decimal,
     market_p75: Decimal,
     comps_count: int,
     grade_probs: Dict[str, float],
-    fees: Dict,
+    fees: Union[FeeSchedule, Dict[str, Any]],
     listed_price: Optional[Decimal] = None,
     risk_tolerance: str = "standard",
 ) -> DecisionResult:
-    thresholds = fees["decision_thresholds"]
-    grading_fee = Decimal(str(fees["grading"]["grading_fee"]))
-    shipping_ins = Decimal(str(fees["grading"]["shipping_insurance"]))
-    platform_fee_pct = Decimal(str(fees["platform"]["platform_fee_pct"]))
-    risk_discount_pct = Decimal(str(fees["risk"]["risk_discount_pct"]))
-    grade_multipliers = fees["grade_multipliers"]
+    return _decide_compiled(
+        market_p25, market_median, market_p75, comps_count, grade_probs, as_fee_schedule(fees), listed_price
+    )
+
+def decide_fixed(
+    market_p25: Decimal,
+    market_median: Decimal,
+    market_p75: Decimal,
+    comps_count: int,
+    grade_probs: Dict[str, float],
+    fees: Union[FeeSchedule, Dict[str, Any]],
+    listed_price: Optional[Decimal] = None,
+    risk_tolerance: str = "standard",
+) -> DecisionResult:
+    """`decide` on the integer cents/basis-point path (see app.engine.fastmoney).
+
+    Falls back to the Decimal path for fee schedules that aren't exact in cents/bps.
+    """
+    schedule = as_fee_schedule(fees)
+    try:
+        ff = fixed_fees(schedule)
+    except ValueError:
+        return _decide_compiled(market_p25, market_median, market_p75, comps_count, grade_probs, schedule, listed_price)
+    return _decide_fixed(market_p25, market_median, market_p75, comps_count, grade_probs, ff, listed_price)
+
+def decide_many(
+    inputs: Iterable[DecisionInput], fees: Union[FeeSchedule, Dict[str, Any]], mode: str = "decimal"
+) -> List[DecisionResult]:
+    """Evaluate many cards against one fee schedule.
+
+    Fees are compiled once for the whole batch; each result is identical to
+    calling `decide` with the same arguments. mode="fixed" uses the integer
+    path, falling back to Decimal if the schedule isn't exact in cents/bps.
+    """
+    if mode not in ENGINE_MODES:
+        raise ValueError(f"mode must be one of {ENGINE_MODES}")
+    schedule = as_fee_schedule(fees)
+    if mode == "fixed":
+        try:
+            ff = fixed_fees(schedule)
+        except ValueError:
+            ff = None
+        if ff is not None:
+            return [
+                _decide_fixed(
+                    i.market_p25, i.market_median, i.market_p75, i.comps_count, i.grade_probs, ff, i.listed_price
+                )
+                for i in inputs
+            ]
+    return [
+        _decide_compiled(
+            i.market_p25, i.market_median, i.market_p75, i.comps_count, i.grade_probs, schedule, i.listed_price
+        )
+        for i in inputs
+    ]
+
+def _decide_compiled(
+    market_p25: Decimal,
+    market_median: Decimal,
+    market_p75: Decimal,
+    comps_count: int,
+    grade_probs: Dict[str, float],
+    fees: FeeSchedule,
+    listed_price: Optional[Decimal],
+) -> DecisionResult:
 
     spread = calc_spread_ratio(market_p25, market_p75, market_median)
     market_conf = comps_confidence(comps_count, spread)
 
     psa9_plus = float(grade_probs.get("PSA10", 0.0) + grade_probs.get("PSA9", 0.0))
 
-    expected_net, roi_pct, breakeven = roi_summary(
-        market_median=market_median,
-        probs=grade_probs,
-        grade_multipliers=grade_multipliers,
-        grading_fee=grading_fee,
-        shipping_insurance=shipping_ins,
-        platform_fee_pct=platform_fee_pct,
-        risk_discount_pct=risk_discount_pct,
-    )
+    expected_net, roi_pct, breakeven = roi_summary(market_median=market_median, probs=grade_probs, fees=fees)
 
     explanation: List[str] = []
     explanation.append(f"Comps: {comps_count} recent sales; market confidence {market_conf}/100.")
@@ -61,29 +127,25 @@ def decide(
     explanation.append(f"Expected net after fees: ${expected_net}.")
 
     risk = "High"
-    if comps_count >= thresholds["min_comps_count"] and spread <= thresholds["max_price_spread_ratio_for_low_risk"]:
+    if comps_count >= fees.min_comps_count and spread <= fees.max_price_spread_ratio_for_low_risk:
         risk = "Low"
-    elif comps_count >= max(3, thresholds["min_comps_count"] // 2):
+    elif comps_count >= max(3, fees.min_comps_count // 2):
         risk = "Medium"
 
-    if comps_count < max(3, thresholds["min_comps_count"] // 2):
+    if comps_count < max(3, fees.min_comps_count // 2):
         decision = "PASS"
         explanation.insert(0, "Not enough reliable comps to make a confident call.")
         conf = _clamp_int(market_conf * 0.6, 0, 100)
         return DecisionResult(decision, conf, "High", explanation[:4], expected_net, roi_pct, breakeven)
 
     if listed_price is not None:
-        undervalue_margin = Decimal(str(thresholds["buy_undervalue_margin"]))
-        if listed_price <= (market_p25 * (Decimal("1") - undervalue_margin)) and risk != "High":
+        if listed_price <= (market_p25 * fees.buy_price_factor) and risk != "High":
             decision = "BUY"
             conf = _clamp_int(0.5 * market_conf + 40, 0, 100)
             explanation.insert(0, "Listed price is significantly below low-end comps.")
             return DecisionResult(decision, conf, risk, explanation[:4], expected_net, roi_pct, breakeven)
 
-    min_profit = Decimal(str(thresholds["min_expected_net_profit"]))
-    min_psa9p = float(thresholds["min_psa9_plus_prob"])
-
-    if expected_net >= min_profit and psa9_plus >= min_psa9p and risk != "High":
+    if expected_net >= fees.min_expected_net_profit and psa9_plus >= fees.min_psa9_plus_prob and risk != "High":
         decision = "GRADE"
         conf = _clamp_int(0.6 * market_conf + 40 * psa9_plus, 0, 100)
         explanation.insert(0, "High upside after grading fees with strong PSA 9+ odds.")
@@ -99,3 +161,57 @@ def decide(
     conf = _clamp_int(0.65 * market_conf + 10, 0, 100)
     explanation.insert(0, "Signals are mixed; avoid forcing a risky move.")
     return DecisionResult(decision, conf, risk, explanation[:4], expected_net, roi_pct, breakeven)
+
+def _decide_fixed(
+    market_p25: Decimal,
+    market_median: Decimal,
+    market_p75: Decimal,
+    comps_count: int,
+    grade_probs: Dict[str, float],
+    ff: FixedFees,
+    listed_price: Optional[Decimal],
+) -> DecisionResult:
+    # Same branches and messages as _decide_compiled; money compares in cents.
+    # The lead reason always pushes "Expected net ..." out of the first four
+    # explanation lines, so it is never formatted here.
+    p25_c, med_c, p75_c = to_cents(market_p25), to_cents(market_median), to_cents(market_p75)
+    spread = (p75_c - p25_c) / med_c if med_c > 0 else 0.0
+    market_conf = comps_confidence(comps_count, spread)
+
+    psa9_plus = float(grade_probs.get("PSA10", 0.0) + grade_probs.get("PSA9", 0.0))
+
+    net_c, negative, roi_pct, breakeven = roi_summary_cents(med_c, grade_probs, ff)
+    expected_net = cents_to_decimal(net_c, negative)
+
+    facts = [
+        f"Comps: {comps_count} recent sales; market confidence {market_conf}/100.",
+        f"Market range: ${market_p25}–${market_p75} (median ${market_median}).",
+        f"PSA 9+ probability: {psa9_plus:.0%}.",
+    ]
+
+    risk = "High"
+    if comps_count >= ff.min_comps_count and spread <= ff.max_price_spread_ratio_for_low_risk:
+        risk = "Low"
+    elif comps_count >= max(3, ff.min_comps_count // 2):
+        risk = "Medium"
+
+    if comps_count < max(3, ff.min_comps_count // 2):
+        conf = _clamp_int(market_conf * 0.6, 0, 100)
+        return DecisionResult("PASS", conf, "High", ["Not enough reliable comps to make a confident call.", *facts], expected_net, roi_pct, breakeven)
+
+    if listed_price is not None:
+        if to_cents(listed_price) * 10_000 <= p25_c * ff.buy_factor_bps and risk != "High":
+            conf = _clamp_int(0.5 * market_conf + 40, 0, 100)
+            return DecisionResult("BUY", conf, risk, ["Listed price is significantly below low-end comps.", *facts], expected_net, roi_pct, breakeven)
+
+    if net_c >= ff.min_expected_net and psa9_plus >= ff.min_psa9_plus_prob and risk != "High":
+        conf = _clamp_int(0.6 * market_conf + 40 * psa9_plus, 0, 100)
+        return DecisionResult("GRADE", conf, risk, ["High upside after grading fees with strong PSA 9+ odds.", *facts], expected_net, roi_pct, breakeven)
+
+    if net_c < 0 and market_conf >= 55:
+        conf = _clamp_int(0.7 * market_conf + 20, 0, 100)
+        return DecisionResult("SELL", conf, risk, ["Grading math is unfavorable; selling raw is safer.", *facts], expected_net, roi_pct, breakeven)
+
+    decision = "HOLD" if market_conf < 75 else "SELL"
+    conf = _clamp_int(0.65 * market_conf + 10, 0, 100)
+    return DecisionResult(decision, conf, risk, ["Signals are mixed; avoid forcing a risky move.", *facts], expected_net, roi_pct, breakeven)
@@ -0,0 +1,128 @@
+"""Fixed-point engine path: money in integer cents, rates in basis points.
+
+Mirrors roi.roi_summary and decision._decide_compiled without per-call
+Decimal construction. Fee schedules compile once into integers; probabilities
+are scaled by PROB_SCALE. Rounding is ROUND_HALF_UP (half away from zero) as
+in q2/quantize_money. Probabilities are scaled by PROB_SCALE, which is the
+one approximation: when the error bound of that scaling straddles a
+half-cent tie (or zero), the value is recomputed on the Decimal path, so
+money results always match it exactly. roi_pct agrees to float noise.
+"""
+
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, Tuple
+
+from app.engine.fees import GRADE_ORDER, FeeSchedule
+from app.engine.roi import roi_summary
+
+BPS = 10_000
+PROB_SCALE = 10 ** 15
+# expected_net is computed at this scale: cents * bps * bps * prob
+_NET_SCALE = PROB_SCALE * BPS * BPS
+_NEG_ZERO = Decimal("-0.00")
+
+def div_half_up(n: int, d: int) -> int:
+    """n / d rounded half away from zero (Decimal ROUND_HALF_UP), d > 0."""
+    q, r = divmod(abs(n), d)
+    if 2 * r >= d:
+        q += 1
+    return q if n >= 0 else -q
+
+def to_cents(x: Decimal) -> int:
+    c = x.scaleb(2)
+    if c != c.to_integral_value():
+        raise ValueError(f"{x} has sub-cent precision")
+    return int(c)
+
+def to_bps(x: Decimal) -> int:
+    b = x.scaleb(4)
+    if b != b.to_integral_value():
+        raise ValueError(f"{x} is finer than a basis point")
+    return int(b)
+
+def cents_to_decimal(cents: int, negative: bool = False) -> Decimal:
+    """Cents as a 2dp Decimal; `negative` keeps q2's "-0.00" for tiny losses."""
+    if cents == 0 and negative:
+        return _NEG_ZERO
+    return Decimal(cents).scaleb(-2)
+
+@dataclass(frozen=True)
+class FixedFees:
+    grading_fee: int  # cents
+    shipping_insurance: int
+    cost: int  # grading_fee + shipping_insurance
+    keep_bps: int  # 10000 - platform_fee - risk_discount
+    mult_bps: Dict[str, int]
+    mult_vector: Tuple[int, ...]  # aligned with GRADE_ORDER
+    min_expected_net: int  # cents
+    buy_factor_bps: int
+    min_psa9_plus_prob: float
+    min_comps_count: int
+    max_price_spread_ratio_for_low_risk: float
+    max_mult_bps: int
+    schedule: FeeSchedule  # for the exact fallback near rounding ties
+
+    @classmethod
+    def from_schedule(cls, fees: FeeSchedule) -> "FixedFees":
+        """Raises ValueError when a fee can't be held exactly in cents/bps."""
+        gf, si = to_cents(fees.grading_fee), to_cents(fees.shipping_insurance)
+        mults = {g: to_bps(m) for g, m in fees.grade_multipliers.items()}
+        return cls(
+            grading_fee=gf,
+            shipping_insurance=si,
+            cost=gf + si,
+            keep_bps=BPS - to_bps(fees.platform_fee_pct) - to_bps(fees.risk_discount_pct),
+            mult_bps=mults,
+            mult_vector=tuple(to_bps(m) for m in fees.multiplier_vector),
+            min_expected_net=to_cents(fees.min_expected_net_profit),
+            buy_factor_bps=to_bps(fees.buy_price_factor),
+            min_psa9_plus_prob=fees.min_psa9_plus_prob,
+            min_comps_count=fees.min_comps_count,
+            max_price_spread_ratio_for_low_risk=fees.max_price_spread_ratio_for_low_risk,
+            max_mult_bps=max([BPS, *mults.values()]),
+            schedule=fees,
+        )
+
+_compiled: Dict[str, FixedFees] = {}
+_compiled_lock = threading.Lock()
+
+def fixed_fees(fees: FeeSchedule) -> FixedFees:
+    """FixedFees for a schedule, compiled once per fee version."""
+    ff = _compiled.get(fees.version)
+    if ff is None:
+        ff = FixedFees.from_schedule(fees)
+        with _compiled_lock:
+            if len(_compiled) > 64:
+                _compiled.clear()
+            _compiled[fees.version] = ff
+    return ff
+
+def roi_summary_cents(median_cents: int, probs: Dict[str, float], ff: FixedFees) -> Tuple[int, bool, float, str]:
+    """(expected_net cents, net < 0, roi_pct, breakeven grade); see roi.roi_summary."""
+    mults = ff.mult_bps
+    weighted = 0
+    for grade, p in probs.items():
+        weighted += round(p * PROB_SCALE) * mults.get(grade, BPS)
+    net = median_cents * weighted * ff.keep_bps - ff.cost * _NET_SCALE
+
+    # Each scaled probability is within 1 unit of the exact value, which bounds
+    # how far `net` can be from what the Decimal path computes.
+    err = len(probs) * median_cents * ff.max_mult_bps * abs(ff.keep_bps)
+    r = abs(net) % _NET_SCALE
+    if abs(2 * r - _NET_SCALE) <= 2 * err or abs(net) <= err:
+        exact, roi_pct, breakeven = roi_summary(Decimal(median_cents).scaleb(-2), probs, fees=ff.schedule)
+        return to_cents(exact), exact.is_signed(), roi_pct, breakeven
+
+    roi_pct = net / (ff.cost * _NET_SCALE) * 100.0 if ff.cost > 0 else 0.0
+    breakeven = "LT7"
+    cost = ff.cost * BPS * BPS
+    for g, m in zip(GRADE_ORDER, ff.mult_vector):
+        if median_cents * m * ff.keep_bps >= cost:
+            breakeven = g
+            break
+
+    return div_half_up(net, _NET_SCALE), net < 0, roi_pct, breakeven
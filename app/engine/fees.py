@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import cached_property
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+GRADE_ORDER: Tuple[str, ...] = ("PSA10", "PSA9", "PSA8", "PSA7", "LT7")
+
+@dataclass(frozen=True)
+class FeeSchedule:
+    """Fee configuration compiled once into Decimals and per-grade vectors.
+
+    Values are converted with Decimal(str(x)), exactly as the engine did per
+    call, so results computed from a schedule match the raw-dict path. The
+    version is hashed from `raw` on first use only, so callers passing plain
+    dicts to the engine don't pay for it.
+    """
+
+    currency: str
+    grading_fee: Decimal
+    shipping_insurance: Decimal
+    platform_fee_pct: Decimal
+    risk_discount_pct: Decimal
+    grade_multipliers: Dict[str, Decimal]
+    multiplier_vector: Tuple[Decimal, ...]  # aligned with GRADE_ORDER, missing grades -> 1.0
+    min_expected_net_profit: Decimal
+    min_psa9_plus_prob: float
+    min_comps_count: int
+    max_price_spread_ratio_for_low_risk: float
+    buy_undervalue_margin: Decimal
+    buy_price_factor: Decimal  # 1 - buy_undervalue_margin
+    raw: Dict[str, Any]
+    known_version: Optional[str] = field(default=None, repr=False, compare=False)
+
+    @cached_property
+    def version(self) -> str:
+        if self.known_version is not None:
+            return self.known_version
+        canonical = json.dumps(self.raw, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        return hashlib.sha256(canonical).hexdigest()[:12]
+
+    @classmethod
+    def from_dict(cls, fees: Dict[str, Any], version: Optional[str] = None) -> "FeeSchedule":
+        thresholds = fees["decision_thresholds"]
+        mults = {g: Decimal(str(m)) for g, m in fees["grade_multipliers"].items()}
+        margin = Decimal(str(thresholds["buy_undervalue_margin"]))
+        return cls(
+            currency=fees.get("currency", "USD"),
+            grading_fee=Decimal(str(fees["grading"]["grading_fee"])),
+            shipping_insurance=Decimal(str(fees["grading"]["shipping_insurance"])),
+            platform_fee_pct=Decimal(str(fees["platform"]["platform_fee_pct"])),
+            risk_discount_pct=Decimal(str(fees["risk"]["risk_discount_pct"])),
+            grade_multipliers=mults,
+            multiplier_vector=tuple(mults.get(g, Decimal(str(1.0))) for g in GRADE_ORDER),
+            min_expected_net_profit=Decimal(str(thresholds["min_expected_net_profit"])),
+            min_psa9_plus_prob=float(thresholds["min_psa9_plus_prob"]),
+            min_comps_count=thresholds["min_comps_count"],
+            max_price_spread_ratio_for_low_risk=thresholds["max_price_spread_ratio_for_low_risk"],
+            buy_undervalue_margin=margin,
+            buy_price_factor=Decimal("1") - margin,
+            raw=fees,
+            known_version=version,
+        )
+
+def as_fee_schedule(fees: Any) -> FeeSchedule:
+    return fees if isinstance(fees, FeeSchedule) else FeeSchedule.from_dict(fees)
+
+class FeeScheduleLoader:
+    """Loads a fee JSON file once and reloads it only when it changes.
+
+    The file is stat()ed at most every `check_interval_seconds`; a new mtime
+    or size triggers a re-read, and the schedule is only recompiled when the
+    content hash differs. The schedule version is the content hash. A file
+    that can't be read or parsed keeps the last good schedule in service.
+    """
+
+    def __init__(self, path: str, check_interval_seconds: float = 1.0) -> None:
+        self.path = os.path.abspath(path)
+        self.check_interval = check_interval_seconds
+        self._lock = threading.Lock()
+        self._schedule: Optional[FeeSchedule] = None
+        self._stat_key: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self.reload_errors = 0
+
+    def get(self) -> FeeSchedule:
+        now = time.monotonic()
+        schedule = self._schedule
+        if schedule is not None and now - self._checked_at < self.check_interval:
+            return schedule
+        with self._lock:
+            self._checked_at = now
+            try:
+                self._reload()
+            except Exception:
+                # missing mid-replace, half-written or invalid: keep the last good
+                # schedule and retry on the next check
+                if self._schedule is None:
+                    raise
+                self.reload_errors += 1
+            return self._schedule
+
+    def _reload(self) -> None:
+        st = os.stat(self.path)
+        stat_key = (st.st_mtime_ns, st.st_size)
+        if self._schedule is not None and stat_key == self._stat_key:
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        version = hashlib.sha256(data).hexdigest()[:12]
+        if self._schedule is None or self._schedule.version != version:
+            self._schedule = FeeSchedule.from_dict(json.loads(data.decode("utf-8")), version=version)
+        self._stat_key = stat_key
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+from typing import Dict, Optional
+
+import numpy as np
+
+from app.engine.fees import GRADE_ORDER
+
+# Batch and table paths agree with grading.grade_probabilities to within
+# this absolute tolerance per probability (differences come from np.exp vs
+# math.exp rounding and from summing tenths instead of floats).
+TOLERANCE = 1e-9
+
+_MU = np.array([9.85, 9.25, 8.55, 7.75, 6.80])
+_SIGMA = np.array([0.25, 0.35, 0.40, 0.45, 0.80])
+
+def _probs_from_avg_weakest(avg: np.ndarray, weakest: np.ndarray, issue: np.ndarray) -> np.ndarray:
+    # Same model as grading.grade_probabilities, one row per card, columns in GRADE_ORDER.
+    raw = np.exp(-((avg[:, None] - _MU) ** 2) / (2 * _SIGMA ** 2))
+
+    cap10 = np.clip((weakest - 8.5) / 1.5, 0.0, 1.0)
+    cap9 = np.clip((weakest - 7.8) / 2.0, 0.0, 1.0)
+    raw[:, 0] *= cap10
+    raw[:, 1] *= cap9
+
+    issue_penalty = np.where(issue, 0.6, 1.0)
+    raw[:, 0] *= issue_penalty
+    raw[:, 1] *= issue_penalty
+    raw[:, 2] *= (0.9 + 0.1 * issue_penalty)
+
+    probs = _normalize_rows(raw)
+    probs = np.clip(probs, 0.0, 1.0)
+    return _normalize_rows(probs)
+
+def _normalize_rows(m: np.ndarray) -> np.ndarray:
+    s = m.sum(axis=1, keepdims=True)
+    bad = (s <= 0)[:, 0]
+    out = m / np.where(s > 0, s, 1.0)
+    if bad.any():
+        out[bad] = 1.0 / m.shape[1]
+    return out
+
+def grade_probabilities_batch(
+    centering: np.ndarray,
+    corners: np.ndarray,
+    edges: np.ndarray,
+    surface: np.ndarray,
+    issue_flag: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """N×5 grade probability matrix (columns in GRADE_ORDER) for N cards."""
+    c = np.asarray(centering, dtype=np.float64)
+    co = np.asarray(corners, dtype=np.float64)
+    e = np.asarray(edges, dtype=np.float64)
+    s = np.asarray(surface, dtype=np.float64)
+    issue = np.zeros(c.shape, dtype=bool) if issue_flag is None else np.asarray(issue_flag, dtype=bool)
+
+    avg = (c + co + e + s) / 4.0
+    weakest = np.minimum(np.minimum(c, co), np.minimum(e, s))
+    return _probs_from_avg_weakest(avg, weakest, issue)
+
+def probs_row_to_dict(row: np.ndarray) -> Dict[str, float]:
+    return {g: float(p) for g, p in zip(GRADE_ORDER, row)}
+
+class GradeTable:
+    """Precomputed probabilities for subscores on the UI's 0.1 grid.
+
+    The model only depends on (average, weakest, issue_flag). On the 0.1 grid
+    the sum of four subscores takes 401 values and the weakest 101, so the
+    whole model fits in a 2×401×101×5 float table (~3 MB). Rows that are not
+    on the grid fall back to the exact batch computation.
+    """
+
+    STEPS = 10  # subscore steps per point
+
+    def __init__(self) -> None:
+        sums = np.arange(4 * 10 * self.STEPS + 1)
+        weakest = np.arange(10 * self.STEPS + 1)
+        ss, ww = np.meshgrid(sums, weakest, indexing="ij")
+        avg = (ss / (4.0 * self.STEPS)).ravel()
+        wk = (ww / float(self.STEPS)).ravel()
+        table = np.empty((2, sums.size, weakest.size, len(GRADE_ORDER)))
+        for flag in (0, 1):
+            issue = np.full(avg.shape, bool(flag))
+            table[flag] = _probs_from_avg_weakest(avg, wk, issue).reshape(sums.size, weakest.size, -1)
+        self.table = table
+        self._flat = np.ascontiguousarray(table.reshape(-1, len(GRADE_ORDER)))
+        self._strides = (sums.size * weakest.size, weakest.size)
+
+    def lookup(
+        self,
+        centering: np.ndarray,
+        corners: np.ndarray,
+        edges: np.ndarray,
+        surface: np.ndarray,
+        issue_flag: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        cols = [np.asarray(x, dtype=np.float64) for x in (centering, corners, edges, surface)]
+        issue = np.zeros(cols[0].shape, dtype=bool) if issue_flag is None else np.asarray(issue_flag, dtype=bool)
+
+        ticks = [np.rint(x * self.STEPS) for x in cols]
+        on_grid = np.ones(cols[0].shape, dtype=bool)
+        for x, t in zip(cols, ticks):
+            on_grid &= (np.abs(x * self.STEPS - t) < 1e-9) & (t >= 0) & (t <= 10 * self.STEPS)
+        t = [x.astype(np.int64) for x in ticks]
+        total = t[0] + t[1] + t[2] + t[3]
+        weakest = np.minimum(np.minimum(t[0], t[1]), np.minimum(t[2], t[3]))
+        flat_idx = issue.astype(np.int64) * self._strides[0] + total * self._strides[1] + weakest
+
+        if on_grid.all():
+            return self._flat.take(flat_idx, axis=0)
+        out = np.empty((cols[0].shape[0], len(GRADE_ORDER)))
+        idx = np.nonzero(on_grid)[0]
+        out[idx] = self._flat.take(flat_idx[idx], axis=0)
+        off = np.nonzero(~on_grid)[0]
+        out[off] = grade_probabilities_batch(*(x[off] for x in cols), issue[off])
+        return out
+
+_table: Optional[GradeTable] = None
+
+def grade_table() -> GradeTable:
+    """Shared table, built on first use."""
+    global _table
+    if _table is None:
+        _table = GradeTable()
+    return _table
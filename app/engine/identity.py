@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+import hashlib
+
+_SPORTS_TOKENS = ("psa", "topps", "panini", "rookie", "nba", "nfl", "mlb")
+
+def stable_card_key(query: str) -> str:
+    return hashlib.sha256(query.strip().lower().encode("utf-8")).hexdigest()[:16]
+
+def guess_category(query: str) -> str:
+    q = query.lower()
+    return "sports" if any(tok in q for tok in _SPORTS_TOKENS) else "tcg"
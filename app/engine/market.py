@@ -1,17 +1,13 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from decimal import Decimal, ROUND_HALF_UP
-from typing import List
+from typing import Dict, Iterable, List, Tuple
 
 def quantize_money(x: Decimal) -> Decimal:
     return x.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-def percentile(values: List[Decimal], p: float) -> Decimal:
-    if not values:
-        raise ValueError("values empty")
-    if p < 0 or p > 100:
-        raise ValueError("p must be 0..100")
-    vals = sorted(values)
+def _percentile_sorted(vals: List[Decimal], p: float) -> Decimal:
     if len(vals) == 1:
         return vals[0]
     k = (len(vals) - 1) * (p / 100.0)
@@ -23,25 +19,36 @@ def percentile(values: List[Decimal], p: float) -> Decimal:
     d1 = vals[c] * (Decimal(str(k)) - Decimal(str(f)))
     return (d0 + d1)
 
-def median(values: List[Decimal]) -> Decimal:
-    if not values:
-        raise ValueError("values empty")
-    vals = sorted(values)
+def _median_sorted(vals: List[Decimal]) -> Decimal:
     n = len(vals)
     mid = n // 2
     if n % 2 == 1:
         return vals[mid]
     return (vals[mid - 1] + vals[mid]) / Decimal("2")
 
-def trimmed_mean(values: List[Decimal], trim_ratio: float = 0.1) -> Decimal:
-    if not values:
-        raise ValueError("values empty")
-    vals = sorted(values)
+def _trimmed_mean_sorted(vals: List[Decimal], trim_ratio: float) -> Decimal:
     n = len(vals)
     k = int(n * trim_ratio)
     core = vals[k:n-k] if n - 2 * k > 0 else vals
     return sum(core) / Decimal(str(len(core)))
 
+def percentile(values: List[Decimal], p: float) -> Decimal:
+    if not values:
+        raise ValueError("values empty")
+    if p < 0 or p > 100:
+        raise ValueError("p must be 0..100")
+    return _percentile_sorted(sorted(values), p)
+
+def median(values: List[Decimal]) -> Decimal:
+    if not values:
+        raise ValueError("values empty")
+    return _median_sorted(sorted(values))
+
+def trimmed_mean(values: List[Decimal], trim_ratio: float = 0.1) -> Decimal:
+    if not values:
+        raise ValueError("values empty")
+    return _trimmed_mean_sorted(sorted(values), trim_ratio)
+
 def spread_ratio(p25: Decimal, p75: Decimal, med: Decimal) -> float:
     if med <= 0:
         return 0.0
@@ -53,3 +60,102 @@ def comps_confidence(count: int, spread_ratio_value: float) -> int:
     spread_penalty = int(min(50, max(0.0, spread_ratio_value) * 100))  # 0..50
     conf = max(0, min(100, base + 40 - spread_penalty))
     return int(conf)
+
+@dataclass(frozen=True)
+class MarketSummary:
+    count: int
+    p25: Decimal
+    median: Decimal
+    p75: Decimal
+    trimmed_mean: Decimal
+    spread_ratio: float
+    confidence: int
+
+def summarize(values: Iterable[Decimal], trim_ratio: float = 0.1) -> MarketSummary:
+    """All market stats from a single sort.
+
+    p25/median/p75/trimmed_mean are money-quantized; spread and confidence
+    are computed from the quantized quartiles, matching what
+    quantize_money(percentile(...)) etc. produce one at a time.
+    """
+    vals = sorted(values)
+    if not vals:
+        raise ValueError("values empty")
+    p25 = quantize_money(_percentile_sorted(vals, 25))
+    med = quantize_money(_median_sorted(vals))
+    p75 = quantize_money(_percentile_sorted(vals, 75))
+    spr = spread_ratio(p25, p75, med)
+    return MarketSummary(
+        count=len(vals),
+        p25=p25,
+        median=med,
+        p75=p75,
+        trimmed_mean=quantize_money(_trimmed_mean_sorted(vals, trim_ratio)),
+        spread_ratio=spr,
+        confidence=comps_confidence(len(vals), spr),
+    )
+
+class _OrderStats:
+    """Just enough of a sorted list for _percentile_sorted/_median_sorted."""
+
+    def __init__(self, n: int, values: Dict[int, Decimal]) -> None:
+        self._n = n
+        self._values = values
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __getitem__(self, i: int) -> Decimal:
+        return self._values[i]
+
+def order_stat_positions(n: int, trim_ratio: float = 0.1) -> Tuple[List[int], int, int]:
+    """Sorted-order positions `summarize_order_stats` needs, plus the trimmed range [lo, hi)."""
+    if n < 1:
+        raise ValueError("n must be >= 1")
+    pos = {n // 2, (n - 1) // 2}
+    for p in (25, 75):
+        k = (n - 1) * (p / 100.0)
+        pos.update((int(k), min(int(k) + 1, n - 1)))
+    k = int(n * trim_ratio)
+    lo, hi = (k, n - k) if n - 2 * k > 0 else (0, n)
+    return sorted(pos), lo, hi
+
+def summarize_order_stats(n: int, values: Dict[int, Decimal], trimmed_total: Decimal, trimmed_count: int) -> MarketSummary:
+    """`summarize` from selected order statistics (e.g. fetched by SQL) instead of all values.
+
+    `values` maps the positions from `order_stat_positions` to their values;
+    `trimmed_total` is the sum over the trimmed range. Results are identical
+    to `summarize` on the full list.
+    """
+    vals = _OrderStats(n, values)
+    p25 = quantize_money(_percentile_sorted(vals, 25))  # type: ignore[arg-type]
+    med = quantize_money(_median_sorted(vals))  # type: ignore[arg-type]
+    p75 = quantize_money(_percentile_sorted(vals, 75))  # type: ignore[arg-type]
+    spr = spread_ratio(p25, p75, med)
+    return MarketSummary(
+        count=n,
+        p25=p25,
+        median=med,
+        p75=p75,
+        trimmed_mean=quantize_money(trimmed_total / Decimal(str(trimmed_count))),
+        spread_ratio=spr,
+        confidence=comps_confidence(n, spr),
+    )
+
+def summarize_sorted_cents(cents, trim_ratio: float = 0.1) -> MarketSummary:
+    """`summarize` over prices already sorted ascending, in integer cents.
+
+    Accepts any indexable sequence, including numpy array slices; only the
+    quartile order statistics are converted to Decimal.
+    """
+    n = len(cents)
+    if n == 0:
+        raise ValueError("values empty")
+    positions, lo, hi = order_stat_positions(n, trim_ratio)
+    total = cents[lo:hi].sum() if hasattr(cents, "sum") else sum(cents[lo:hi])
+    return summarize_order_stats(
+        n,
+        {i: Decimal(int(cents[i])).scaleb(-2) for i in positions},
+        Decimal(int(total)).scaleb(-2),
+        hi - lo,
+    )
@@ -1,28 +1,55 @@
 from __future__ import annotations
 
 from decimal import Decimal, ROUND_HALF_UP
-from typing import Dict, Tuple
+from typing import Dict, Optional, Sequence, Tuple, Union
+
+from app.engine.fees import GRADE_ORDER, FeeSchedule
+
+_ONE = Decimal(str(1.0))
 
 def q2(x: Decimal) -> Decimal:
     return x.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
 
-def expected_value_from_probs(base_market_median: Decimal, probs: Dict[str, float], grade_multipliers: Dict[str, float]) -> Decimal:
+def expected_value_from_probs(
+    base_market_median: Decimal, probs: Dict[str, float], grade_multipliers: Dict[str, Union[float, Decimal]]
+) -> Decimal:
     ev = Decimal("0")
     for grade, p in probs.items():
-        mult = Decimal(str(grade_multipliers.get(grade, 1.0)))
+        mult = grade_multipliers.get(grade, _ONE)
+        if not isinstance(mult, Decimal):
+            mult = Decimal(str(mult))
         ev += Decimal(str(p)) * (base_market_median * mult)
     return ev
 
 def roi_summary(
     market_median: Decimal,
     probs: Dict[str, float],
-    grade_multipliers: Dict[str, float],
-    grading_fee: Decimal,
-    shipping_insurance: Decimal,
-    platform_fee_pct: Decimal,
-    risk_discount_pct: Decimal,
+    grade_multipliers: Optional[Dict[str, float]] = None,
+    grading_fee: Optional[Decimal] = None,
+    shipping_insurance: Optional[Decimal] = None,
+    platform_fee_pct: Optional[Decimal] = None,
+    risk_discount_pct: Optional[Decimal] = None,
+    fees: Optional[FeeSchedule] = None,
 ) -> Tuple[Decimal, float, str]:
-    expected_sale = expected_value_from_probs(market_median, probs, grade_multipliers)
+    """Expected net after fees, ROI % on grading cost, and breakeven grade.
+
+    Pass either a compiled `fees` schedule or the individual fee arguments.
+    """
+    if fees is not None:
+        mults = fees.grade_multipliers
+        vector: Sequence[Decimal] = fees.multiplier_vector
+        grading_fee = fees.grading_fee
+        shipping_insurance = fees.shipping_insurance
+        platform_fee_pct = fees.platform_fee_pct
+        risk_discount_pct = fees.risk_discount_pct
+    else:
+        if grade_multipliers is None or grading_fee is None or shipping_insurance is None \
+                or platform_fee_pct is None or risk_discount_pct is None:
+            raise ValueError("either fees or all individual fee arguments are required")
+        mults = {g: Decimal(str(m)) for g, m in grade_multipliers.items()}
+        vector = [mults.get(g, _ONE) for g in GRADE_ORDER]
+
+    expected_sale = expected_value_from_probs(market_median, probs, mults)
 
     platform_fee = expected_sale * platform_fee_pct
     risk_discount = expected_sale * risk_discount_pct
@@ -32,10 +59,8 @@ def roi_summary(
     denom = grading_fee + shipping_insurance
     roi_pct = float(expected_net / denom) * 100.0 if denom > 0 else 0.0
 
-    ordered = ["PSA10", "PSA9", "PSA8", "PSA7", "LT7"]
     breakeven = "LT7"
-    for g in ordered:
-        mult = Decimal(str(grade_multipliers.get(g, 1.0)))
+    for g, mult in zip(GRADE_ORDER, vector):
         sale = market_median * mult
         net = sale - (sale * platform_fee_pct) - grading_fee - shipping_insurance - (sale * risk_discount_pct)
         if net >= 0:
@@ -25,6 +25,7 @@ class SoldComp(BaseModel):
     sold_price: condecimal(gt=0, max_digits=10, decimal_places=2)
     sold_date_utc: str
     title: str
+    listing_id: Optional[str] = None
 
 class MarketStats(BaseModel):
     p25: condecimal(gt=0, max_digits=10, decimal_places=2)
@@ -39,6 +40,14 @@ class CompsResponse(BaseModel):
     identity: CardIdentity
     comps: List[SoldComp]
     stats: MarketStats
+    degraded: bool = False  # cached comps served because the provider was unavailable
+
+class MarketTrend(BaseModel):
+    card_key: str
+    windows: Dict[str, Optional[MarketStats]]  # trailing days -> stats (null when no sales)
+    half_life_days: float
+    ew_median: Optional[condecimal(gt=0, max_digits=10, decimal_places=2)] = None
+    momentum: Optional[float] = None  # ew_median / median - 1 over the longest window
 
 class ConditionMetrics(BaseModel):
     centering: confloat(ge=0, le=10)
@@ -51,6 +60,10 @@ class DecisionRequest(BaseModel):
     query: str = Field(min_length=1, max_length=200)
     listed_price: Optional[condecimal(gt=0, max_digits=10, decimal_places=2)] = None
     metrics: ConditionMetrics
+    # decide on quartiles re-centred on the exponentially weighted median of recent sales
+    recency_weighted: bool = False
+    roi_samples: Optional[conint(ge=100, le=100_000)] = None  # Monte Carlo draws for roi_distribution; off by default
+    roi_seed: conint(ge=0) = 0
 
 class MarketValueOut(BaseModel):
     p25: condecimal(gt=0, max_digits=10, decimal_places=2)
@@ -63,6 +76,15 @@ class RoiOut(BaseModel):
     roi_pct: confloat()
     breakeven_grade: str
 
+class RoiDistributionOut(BaseModel):
+    samples: int
+    seed: int
+    mean_net: float
+    p_loss: confloat(ge=0, le=1)
+    p10_net: float
+    p90_net: float
+    value_at_risk_95: confloat(ge=0)  # loss exceeded in only 5% of simulated outcomes
+
 class DecisionResponse(BaseModel):
     decision: DecisionLiteral
     confidence: conint(ge=0, le=100)
@@ -71,3 +93,92 @@ class DecisionResponse(BaseModel):
     grade_probabilities: Dict[str, confloat(ge=0, le=1)]
     roi: RoiOut
     explanation: List[str]
+    degraded: bool = False  # decided on cached comps because the provider was unavailable
+    roi_distribution: Optional[RoiDistributionOut] = None  # only when roi_samples was requested
+
+class DecisionBatchRequest(BaseModel):
+    items: List[DecisionRequest] = Field(min_length=1, max_length=50000)
+
+class DecisionBatchResponse(BaseModel):
+    results: List[DecisionResponse]
+
+class SubmissionItem(BaseModel):
+    id: Optional[str] = Field(default=None, max_length=200)
+    query: str = Field(min_length=1, max_length=200)
+    metrics: ConditionMetrics
+    recency_weighted: bool = False
+
+class GradingSubmissionRequest(BaseModel):
+    items: List[SubmissionItem] = Field(min_length=1, max_length=5000)
+    samples: conint(ge=100, le=100_000) = 10_000
+    seed: conint(ge=0) = 0
+
+class SubmissionCardOut(BaseModel):
+    id: Optional[str] = None
+    card_key: str
+    expected_net: condecimal(max_digits=10, decimal_places=2)
+    distribution: RoiDistributionOut
+    degraded: bool = False
+
+class GradingSubmissionResponse(BaseModel):
+    cards: List[SubmissionCardOut]
+    expected_net: condecimal(max_digits=12, decimal_places=2)
+    total: RoiDistributionOut  # distribution of the summed net of every card in the submission
+    degraded: bool = False
+
+class PortfolioItem(BaseModel):
+    id: Optional[str] = Field(default=None, max_length=200)
+    query: str = Field(min_length=1, max_length=200)
+    metrics: ConditionMetrics
+    purchase_price: Optional[condecimal(ge=0, max_digits=10, decimal_places=2)] = None
+
+class ScannerWatchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1, max_length=10000)
+
+class BuyThresholdOut(BaseModel):
+    card_key: str
+    query: str
+    max_buy_price: Optional[condecimal(max_digits=12, decimal_places=2)] = None
+    comps_count: int
+    fee_version: str
+
+JobStatusLiteral = Literal["queued", "running", "done", "failed", "cancelled"]
+
+class JobSubmitRequest(BaseModel):
+    items: List[DecisionRequest] = Field(min_length=1, max_length=1_000_000)
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    status: JobStatusLiteral
+    total: int
+    done: int
+    created_at_utc: str
+    updated_at_utc: str
+    fee_version: Optional[str] = None
+    error: Optional[str] = None
+
+class SweepRequest(BaseModel):
+    query: str = Field(min_length=1, max_length=200)
+    metrics: ConditionMetrics
+    listed_prices: List[Optional[condecimal(gt=0, max_digits=10, decimal_places=2)]] = Field(default_factory=lambda: [None], min_length=1, max_length=1000)
+    grading_fees: Optional[List[condecimal(ge=0, max_digits=10, decimal_places=2)]] = Field(default=None, min_length=1, max_length=200)
+    platform_fee_pcts: Optional[List[condecimal(ge=0, lt=1)]] = Field(default=None, min_length=1, max_length=200)
+    multiplier_scales: List[confloat(gt=0)] = Field(default_factory=lambda: [1.0], min_length=1, max_length=200)
+
+class SweepThresholdsOut(BaseModel):
+    max_buy_price: Optional[condecimal(max_digits=12, decimal_places=2)] = None
+    min_median_for_grade: Optional[condecimal(max_digits=12, decimal_places=2)] = None
+    breakeven_grading_fee: condecimal(max_digits=12, decimal_places=2)
+    max_grading_fee_for_grade: Optional[condecimal(max_digits=12, decimal_places=2)] = None
+
+class SweepResponse(BaseModel):
+    market_value: MarketValueOut
+    listed_prices: List[Optional[float]]
+    grading_fees: List[float]
+    platform_fee_pcts: List[float]
+    multiplier_scales: List[float]
+    expected_net: List[List[List[float]]]        # [grading_fee][platform_fee_pct][multiplier_scale]
+    decisions: List[List[List[List[DecisionLiteral]]]]  # [listed_price][grading_fee][platform_fee_pct][multiplier_scale]
+    thresholds: SweepThresholdsOut
+    degraded: bool = False  # swept on cached comps because the provider was unavailable
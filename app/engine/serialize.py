@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from typing import Iterable, List, Sequence
+
+from pydantic import BaseModel, TypeAdapter
+
+from app.engine.schemas import SoldComp
+
+_SOLD_COMPS = TypeAdapter(List[SoldComp])
+
+def dump(model: BaseModel) -> bytes:
+    """Compact JSON of a schema model through pydantic-core's compiled serializer.
+
+    Decimal fields are written as strings, as the API has always served
+    them. Works on models built with `model_construct` from data that was
+    validated once already (engine output, rows from our own tables).
+    """
+    return model.__pydantic_serializer__.to_json(model)
+
+def dump_comps(comps: Sequence[SoldComp]) -> bytes:
+    """JSON array of comps; lazy sequences such as ArchiveComps may supply their own `to_json`."""
+    to_json = getattr(comps, "to_json", None)
+    if to_json is not None:
+        return to_json()
+    return _SOLD_COMPS.dump_json(comps if isinstance(comps, list) else list(comps))
+
+def json_array(parts: Iterable[bytes]) -> bytes:
+    """A JSON array from already-serialized elements."""
+    return b"[" + b",".join(parts) + b"]"
@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+from decimal import Decimal
+from math import ceil
+from random import Random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.engine.market import MarketSummary, comps_confidence, quantize_money, spread_ratio
+
+class KllSketch:
+    """Mergeable streaming quantile sketch (KLL, Karnin–Lang–Liberty 2016).
+
+    Keeps O(k log(n/k)) floats instead of every sale. Level h holds items of
+    weight 2**h; a full level is sorted and every other item (random offset)
+    is promoted to the level above.
+
+    Error bounds: the normalized rank error |rank_est(x) - rank(x)| / n is
+    O(1/k) with high probability, independent of n. With the default k=200
+    it is within about 1.65% at 99% confidence (tests assert < 2% over 50k
+    values); halve it by doubling k. Merged sketches carry the same bound
+    relative to the combined count. Compaction offsets come from a seeded
+    RNG, so the same inputs in the same order give the same sketch.
+    """
+
+    def __init__(self, k: int = 200, c: float = 2.0 / 3.0, seed: int = 0) -> None:
+        if k < 8:
+            raise ValueError("k must be >= 8")
+        self.k = k
+        self.c = c
+        self.n = 0
+        self._rng = Random(seed)
+        self._levels: List[List[float]] = []
+        self._size = 0
+        self._max_size = 0
+        self._min: Optional[float] = None
+        self._max: Optional[float] = None
+        self._grow()
+
+    # -- capacity bookkeeping ------------------------------------------------
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self._levels) - h - 1
+        return int(ceil((self.c ** depth) * self.k)) + 1
+
+    def _grow(self) -> None:
+        self._levels.append([])
+        self._max_size = sum(self._capacity(h) for h in range(len(self._levels)))
+
+    def _compress(self) -> None:
+        for h in range(len(self._levels)):
+            level = self._levels[h]
+            if len(level) >= self._capacity(h):
+                if h + 1 >= len(self._levels):
+                    self._grow()
+                level.sort()
+                keep_last = [level.pop()] if len(level) % 2 else []
+                offset = self._rng.getrandbits(1)
+                self._levels[h + 1].extend(level[offset::2])
+                self._levels[h] = keep_last
+                self._size = sum(len(lv) for lv in self._levels)
+                if self._size < self._max_size:
+                    break
+
+    # -- updates -------------------------------------------------------------
+
+    def update(self, value: float) -> None:
+        v = float(value)
+        self._levels[0].append(v)
+        self.n += 1
+        self._size += 1
+        if self._min is None or v < self._min:
+            self._min = v
+        if self._max is None or v > self._max:
+            self._max = v
+        if self._size >= self._max_size:
+            self._compress()
+
+    def update_many(self, values: Sequence[float]) -> None:
+        for v in values:
+            self.update(v)
+
+    def merge(self, other: "KllSketch") -> None:
+        if other.n == 0:
+            return
+        while len(self._levels) < len(other._levels):
+            self._grow()
+        for h, level in enumerate(other._levels):
+            self._levels[h].extend(level)
+        self.n += other.n
+        self._size = sum(len(lv) for lv in self._levels)
+        self._min = other._min if self._min is None else min(self._min, other._min)  # type: ignore[type-var]
+        self._max = other._max if self._max is None else max(self._max, other._max)  # type: ignore[type-var]
+        while self._size >= self._max_size:
+            before = self._size
+            self._compress()
+            if self._size == before:
+                break
+
+    # -- queries -------------------------------------------------------------
+
+    def _weighted(self) -> List[Tuple[float, int]]:
+        items = [(v, 1 << h) for h, level in enumerate(self._levels) for v in level]
+        items.sort()
+        return items
+
+    def quantile(self, q: float) -> float:
+        return self.quantiles([q])[0]
+
+    def quantiles(self, qs: Sequence[float]) -> List[float]:
+        if self.n == 0:
+            raise ValueError("sketch empty")
+        items = self._weighted()
+        total = sum(w for _, w in items)
+        out: List[float] = []
+        for q in qs:
+            if q < 0 or q > 1:
+                raise ValueError("q must be 0..1")
+            if q == 0:
+                out.append(self._min)  # type: ignore[arg-type]
+                continue
+            if q == 1:
+                out.append(self._max)  # type: ignore[arg-type]
+                continue
+            target = q * total
+            acc = 0
+            value = items[-1][0]
+            for v, w in items:
+                acc += w
+                if acc >= target:
+                    value = v
+                    break
+            out.append(value)
+        return out
+
+    def rank(self, value: float) -> float:
+        """Estimated fraction of inserted values <= value."""
+        if self.n == 0:
+            raise ValueError("sketch empty")
+        items = self._weighted()
+        total = sum(w for _, w in items)
+        return sum(w for v, w in items if v <= value) / total
+
+    def retained(self) -> int:
+        return self._size
+
+    # -- transport between shards -------------------------------------------
+
+    def to_dict(self) -> Dict:
+        return {"k": self.k, "c": self.c, "n": self.n, "min": self._min, "max": self._max, "levels": self._levels}
+
+    @classmethod
+    def from_dict(cls, d: Dict, seed: int = 0) -> "KllSketch":
+        sk = cls(k=d["k"], c=d["c"], seed=seed)
+        sk._levels = [list(lv) for lv in d["levels"]] or [[]]
+        sk._max_size = sum(sk._capacity(h) for h in range(len(sk._levels)))
+        sk._size = sum(len(lv) for lv in sk._levels)
+        sk.n = d["n"]
+        sk._min = d["min"]
+        sk._max = d["max"]
+        return sk
+
+def summarize_sketch(sketch: KllSketch, trim_ratio: float = 0.1) -> MarketSummary:
+    """Approximate MarketSummary from a sketch (see KllSketch error bounds)."""
+    p25, med, p75 = (quantize_money(Decimal(repr(v))) for v in sketch.quantiles([0.25, 0.5, 0.75]))
+    items = sketch._weighted()
+    total = sum(w for _, w in items)
+    lo, hi = total * trim_ratio, total * (1 - trim_ratio)
+    acc = 0
+    num = 0.0
+    den = 0
+    for v, w in items:
+        if lo <= acc + w / 2 <= hi:
+            num += v * w
+            den += w
+        acc += w
+    tmean = quantize_money(Decimal(repr(num / den))) if den else med
+    spr = spread_ratio(p25, p75, med)
+    return MarketSummary(
+        count=sketch.n,
+        p25=p25,
+        median=med,
+        p75=p75,
+        trimmed_mean=tmean,
+        spread_ratio=spr,
+        confidence=comps_confidence(sketch.n, spr),
+    )
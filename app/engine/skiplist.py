@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+from random import Random
+from typing import List, Optional
+
+class _Node:
+    __slots__ = ("key", "value", "weight", "next", "width", "total", "wtotal")
+
+    def __init__(self, key: int, value: int, weight: float, levels: int) -> None:
+        self.key = key
+        self.value = value
+        self.weight = weight
+        self.next: List[Optional[_Node]] = [None] * levels
+        # per level, over the nodes after this one up to and including next[level]
+        self.width = [1] * levels
+        self.total = [0] * levels
+        self.wtotal = [0.0] * levels
+
+class IndexableSkiplist:
+    """Sorted multiset of integer values with O(log n) insert, remove and rank queries.
+
+    Each link records how many nodes it skips and the sum of their values
+    and weights, so the k-th smallest value, the sum of the k smallest
+    values and the weighted median all come from one walk down the levels
+    (Pugh's skiplist with Hettinger's indexable widths). Equal values are
+    told apart by `key`, which must be unique; `remove` takes the same
+    (value, key) that was inserted. Levels are drawn from a seeded RNG so
+    the structure is reproducible.
+    """
+
+    def __init__(self, max_levels: int = 24, seed: int = 0) -> None:
+        self.max_levels = max_levels
+        self._head = _Node(-1, 0, 0.0, max_levels)
+        self._top = 1  # levels in use; the head's links above it aren't maintained
+        self._rng = Random(seed)
+        self._size = 0
+        self._sum = 0
+        self._wsum = 0.0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def total(self) -> int:
+        return self._sum
+
+    @property
+    def weight(self) -> float:
+        return self._wsum
+
+    def _level(self) -> int:
+        level = 1
+        while level < self.max_levels and self._rng.getrandbits(1):
+            level += 1
+        return level
+
+    def insert(self, value: int, key: int, weight: float = 0.0) -> None:
+        levels = self._level()
+        head = self._head
+        for level in range(self._top, levels):
+            head.width[level] = self._size + 1
+            head.total[level] = self._sum
+            head.wtotal[level] = self._wsum
+        top = self._top = max(self._top, levels)
+        chain: List[_Node] = [head] * top
+        steps = [0] * top
+        sums = [0] * top
+        wsums = [0.0] * top
+        node = head
+        for level in range(top - 1, -1, -1):
+            nxt = node.next[level]
+            while nxt is not None and (nxt.value < value or (nxt.value == value and nxt.key <= key)):
+                steps[level] += node.width[level]
+                sums[level] += node.total[level]
+                wsums[level] += node.wtotal[level]
+                node = nxt
+                nxt = node.next[level]
+            chain[level] = node
+
+        new = _Node(key, value, weight, levels)
+        step, acc, wacc = 0, 0, 0.0  # distance and sums from chain[level] to chain[0]
+        for level in range(levels):
+            prev = chain[level]
+            new.next[level] = prev.next[level]
+            prev.next[level] = new
+            new.width[level] = prev.width[level] - step
+            new.total[level] = prev.total[level] - acc
+            new.wtotal[level] = prev.wtotal[level] - wacc
+            prev.width[level] = step + 1
+            prev.total[level] = acc + value
+            prev.wtotal[level] = wacc + weight
+            step += steps[level]
+            acc += sums[level]
+            wacc += wsums[level]
+        for level in range(levels, top):
+            prev = chain[level]
+            prev.width[level] += 1
+            prev.total[level] += value
+            prev.wtotal[level] += weight
+        self._size += 1
+        self._sum += value
+        self._wsum += weight
+
+    def remove(self, value: int, key: int) -> None:
+        top = self._top
+        chain: List[_Node] = [self._head] * top
+        node = self._head
+        for level in range(top - 1, -1, -1):
+            nxt = node.next[level]
+            while nxt is not None and (nxt.value < value or (nxt.value == value and nxt.key < key)):
+                node = nxt
+                nxt = node.next[level]
+            chain[level] = node
+        target = chain[0].next[0]
+        if target is None or target.value != value or target.key != key:
+            raise KeyError((value, key))
+        for level in range(top):
+            prev = chain[level]
+            if level < len(target.next):
+                prev.width[level] += target.width[level] - 1
+                prev.total[level] += target.total[level] - value
+                prev.wtotal[level] += target.wtotal[level] - target.weight
+                prev.next[level] = target.next[level]
+            else:
+                prev.width[level] -= 1
+                prev.total[level] -= value
+                prev.wtotal[level] -= target.weight
+        self._size -= 1
+        self._sum -= value
+        self._wsum -= target.weight
+
+    def __getitem__(self, i: int) -> int:
+        """The i-th smallest value (0-based)."""
+        if not 0 <= i < self._size:
+            raise IndexError(i)
+        node, pos = self._head, -1
+        for level in range(self._top - 1, -1, -1):
+            while node.next[level] is not None and pos + node.width[level] <= i:
+                pos += node.width[level]
+                node = node.next[level]  # type: ignore[assignment]
+        return node.value
+
+    def sum_smallest(self, k: int) -> int:
+        """Sum of the k smallest values."""
+        k = max(0, min(k, self._size))
+        node, pos, acc = self._head, 0, 0
+        for level in range(self._top - 1, -1, -1):
+            while node.next[level] is not None and pos + node.width[level] <= k:
+                pos += node.width[level]
+                acc += node.total[level]
+                node = node.next[level]  # type: ignore[assignment]
+        return acc
+
+    def weighted_median(self) -> Optional[int]:
+        """Smallest value whose cumulative weight reaches half the total weight."""
+        if self._size == 0:
+            return None
+        half = self._wsum / 2.0
+        node, acc = self._head, 0.0
+        for level in range(self._top - 1, -1, -1):
+            while node.next[level] is not None and acc + node.wtotal[level] < half:
+                acc += node.wtotal[level]
+                node = node.next[level]  # type: ignore[assignment]
+        nxt = node.next[0]
+        return nxt.value if nxt is not None else node.value
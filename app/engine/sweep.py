@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.engine.fees import GRADE_ORDER, FeeSchedule
+from app.engine.market import comps_confidence, spread_ratio as calc_spread_ratio
+
+_CENT = Decimal("0.01")
+_HALF_CENT = Decimal("0.005")
+
+# Decision codes used in the grid; index into DECISIONS.
+DECISIONS = ("PASS", "BUY", "GRADE", "SELL", "HOLD")
+
+@dataclass(frozen=True)
+class SweepThresholds:
+    max_buy_price: Optional[Decimal]            # highest listed price that still returns BUY
+    min_median_for_grade: Optional[Decimal]     # lowest market median that returns GRADE (p25/p75 held)
+    breakeven_grading_fee: Decimal              # grading fee at which expected net is exactly 0
+    max_grading_fee_for_grade: Optional[Decimal]  # highest grading fee that still clears min profit
+
+@dataclass(frozen=True)
+class SweepResult:
+    listed_prices: List[Optional[float]]
+    grading_fees: List[float]
+    platform_fee_pcts: List[float]
+    multiplier_scales: List[float]
+    expected_net: np.ndarray   # shape (fees, platform pcts, scales)
+    decisions: np.ndarray      # shape (listed prices, fees, platform pcts, scales), codes into DECISIONS
+    thresholds: SweepThresholds
+
+def _expected_multiplier(grade_probs: Dict[str, float], fees: FeeSchedule) -> Decimal:
+    return sum(
+        (Decimal(str(grade_probs.get(g, 0.0))) * m for g, m in zip(GRADE_ORDER, fees.multiplier_vector)),
+        Decimal("0"),
+    )
+
+def sweep(
+    market_p25: Decimal,
+    market_median: Decimal,
+    market_p75: Decimal,
+    comps_count: int,
+    grade_probs: Dict[str, float],
+    fees: FeeSchedule,
+    listed_prices: Sequence[Optional[Decimal]] = (None,),
+    grading_fees: Optional[Sequence[Decimal]] = None,
+    platform_fee_pcts: Optional[Sequence[Decimal]] = None,
+    multiplier_scales: Sequence[float] = (1.0,),
+) -> SweepResult:
+    """Evaluate `decide`'s rules over a grid of prices and fee settings at once.
+
+    The grid is evaluated in float64 with NumPy, so points within a fraction
+    of a cent of a rule boundary can differ from `decide`. The thresholds are
+    solved in closed form with Decimal against the base fee schedule:
+
+    - BUY needs listed <= p25 * (1 - margin) and enough comps, so the maximum
+      BUY price is that product rounded down to the cent.
+    - Expected net is linear in the median: median * E[mult] * (1 - platform
+      - risk) - grading - shipping, so the GRADE median and both fee
+      thresholds are single divisions/subtractions.
+    """
+    gf = np.array([float(x) for x in (grading_fees or [fees.grading_fee])])
+    pf = np.array([float(x) for x in (platform_fee_pcts or [fees.platform_fee_pct])])
+    ms = np.array([float(x) for x in multiplier_scales])
+    lp = np.array([np.nan if x is None else float(x) for x in listed_prices])
+
+    e_mult = _expected_multiplier(grade_probs, fees)
+    psa9_plus = float(grade_probs.get("PSA10", 0.0) + grade_probs.get("PSA9", 0.0))
+    median_f = float(market_median)
+    shipping = float(fees.shipping_insurance)
+    risk_pct = float(fees.risk_discount_pct)
+
+    # expected_net[f, p, s]
+    sale = median_f * float(e_mult) * ms[None, None, :]
+    net = sale * (1.0 - pf[None, :, None] - risk_pct) - gf[:, None, None] - shipping
+    net = np.round(net, 2)
+
+    spread = calc_spread_ratio(market_p25, market_p75, market_median)
+    market_conf = comps_confidence(comps_count, spread)
+    enough_comps = comps_count >= max(3, fees.min_comps_count // 2)
+
+    shape = (lp.size,) + net.shape
+    if not enough_comps:
+        codes = np.zeros(shape, dtype=np.int8)  # PASS, and risk is High so nothing else applies
+    else:
+        fallback = DECISIONS.index("HOLD") if market_conf < 75 else DECISIONS.index("SELL")
+        per_fee = np.full(net.shape, fallback, dtype=np.int8)
+        per_fee[(net < 0) & (market_conf >= 55)] = DECISIONS.index("SELL")
+        if psa9_plus >= fees.min_psa9_plus_prob:
+            per_fee[net >= float(fees.min_expected_net_profit)] = DECISIONS.index("GRADE")
+        codes = np.broadcast_to(per_fee, shape).copy()
+        buy_limit = float(market_p25 * fees.buy_price_factor)
+        buy = ~np.isnan(lp) & (lp <= buy_limit)
+        codes[buy] = DECISIONS.index("BUY")
+
+    return SweepResult(
+        listed_prices=[None if np.isnan(x) else float(x) for x in lp],
+        grading_fees=gf.tolist(),
+        platform_fee_pcts=pf.tolist(),
+        multiplier_scales=ms.tolist(),
+        expected_net=net,
+        decisions=codes,
+        thresholds=solve_thresholds(market_p25, market_median, comps_count, grade_probs, fees),
+    )
+
+def solve_thresholds(
+    market_p25: Decimal,
+    market_median: Decimal,
+    comps_count: int,
+    grade_probs: Dict[str, float],
+    fees: FeeSchedule,
+) -> SweepThresholds:
+    enough_comps = comps_count >= max(3, fees.min_comps_count // 2)
+    psa9_plus = float(grade_probs.get("PSA10", 0.0) + grade_probs.get("PSA9", 0.0))
+
+    keep = Decimal("1") - fees.platform_fee_pct - fees.risk_discount_pct
+    per_median = _expected_multiplier(grade_probs, fees) * keep  # expected net per $1 of median, before fixed costs
+    fixed = fees.grading_fee + fees.shipping_insurance
+    gross = market_median * per_median
+
+    max_buy = (market_p25 * fees.buy_price_factor).quantize(_CENT, rounding=ROUND_FLOOR) if enough_comps else None
+
+    can_grade = enough_comps and psa9_plus >= fees.min_psa9_plus_prob and per_median > 0
+    min_median = None
+    max_fee_for_grade = None
+    if can_grade:
+        # decide compares expected_net rounded half-up to the cent, which clears the minimum from min - 0.005
+        target = fees.min_expected_net_profit - _HALF_CENT
+        min_median = ((target + fixed) / per_median).quantize(_CENT, rounding=ROUND_CEILING)
+        max_fee_for_grade = (gross - fees.shipping_insurance - target).quantize(_CENT, rounding=ROUND_FLOOR)
+
+    return SweepThresholds(
+        max_buy_price=max_buy,
+        min_median_for_grade=min_median,
+        breakeven_grading_fee=(gross - fees.shipping_insurance).quantize(_CENT, rounding=ROUND_FLOOR),
+        max_grading_fee_for_grade=max_fee_for_grade,
+    )
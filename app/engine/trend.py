@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+from bisect import insort
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import List, Optional, Sequence, Tuple
+
+from app.engine.market import MarketSummary, order_stat_positions, quantize_money, summarize_order_stats
+from app.engine.skiplist import IndexableSkiplist
+
+# Past this many half-lives from the anchor, weights are rebased so 2**x stays well inside float range.
+_REBASE_HALF_LIVES = 60.0
+
+class _Window:
+    __slots__ = ("days", "lo", "hi", "since", "prices", "summary")
+
+    def __init__(self, days: float, seed: int) -> None:
+        self.days = days
+        self.lo = 0  # sales[lo:hi] are the sales in the window
+        self.hi = 0
+        self.since = ""
+        self.prices = IndexableSkiplist(seed=seed)
+        self.summary: Optional[MarketSummary] = None
+
+class RollingWindows:
+    """One card's sales in trailing windows (e.g. 7/30/90 days), maintained incrementally.
+
+    Each window is a range of the date-ordered sales list mirrored in an
+    IndexableSkiplist of prices in cents, so adding a sale or letting one
+    expire costs O(log n) and the window's MarketSummary is read from a
+    handful of order statistics and two prefix sums instead of a sort.
+    Window bounds compare ISO dates as text, like sold_comps.window_stats,
+    and summaries are identical to it.
+
+    Every sale also carries the weight 2 ** (age / half_life) relative to a
+    fixed anchor. All weights decay at the same rate, so their ratios never
+    change and the exponentially weighted median of a window only moves
+    when sales enter or leave it.
+    """
+
+    def __init__(self, windows: Sequence[float] = (7, 30, 90), half_life_days: float = 7.0) -> None:
+        if not windows or min(windows) <= 0:
+            raise ValueError("windows must be positive")
+        if half_life_days <= 0:
+            raise ValueError("half_life_days must be > 0")
+        self.half_life = half_life_days * 86400.0
+        self._windows = [_Window(d, seed=i) for i, d in enumerate(sorted(set(windows)))]
+        # (sold_date_utc, seq, cents, timestamp), sorted; seq keeps equal dates and prices distinct
+        self._sales: List[Tuple[str, int, int, float]] = []
+        self._seq = 0
+        self._anchor: Optional[float] = None
+        self._now = ""
+
+    @property
+    def windows(self) -> List[float]:
+        return [w.days for w in self._windows]
+
+    @property
+    def now(self) -> str:
+        return self._now
+
+    def _weight(self, ts: float) -> float:
+        return 2.0 ** ((ts - self._anchor) / self.half_life)  # type: ignore[operator]
+
+    def add(self, sold_date_utc: str, cents: int) -> None:
+        """Add a sale (date as normalized UTC ISO text); it enters windows that cover its date."""
+        ts = datetime.fromisoformat(sold_date_utc).timestamp()
+        if self._anchor is None:
+            self._anchor = ts
+        elif (ts - self._anchor) / self.half_life > _REBASE_HALF_LIVES:
+            self._rebase(ts)
+        self._seq += 1
+        sale = (sold_date_utc, self._seq, cents, ts)
+        insort(self._sales, sale)
+        for w in self._windows:
+            if sold_date_utc < w.since:
+                w.lo += 1
+                w.hi += 1
+            elif sold_date_utc <= self._now:
+                w.prices.insert(cents, self._seq, self._weight(ts))
+                w.hi += 1
+                w.summary = None
+
+    def advance(self, now: datetime) -> None:
+        """Move every window to end at `now`; time must not go backwards."""
+        now_iso = now.isoformat()
+        if now_iso < self._now:
+            raise ValueError("windows cannot move back in time")
+        self._now = now_iso
+        sales = self._sales
+        for w in self._windows:
+            w.since = (now - timedelta(days=w.days)).isoformat()
+            changed = False
+            while w.hi < len(sales) and sales[w.hi][0] <= now_iso:
+                _, seq, cents, ts = sales[w.hi]
+                w.prices.insert(cents, seq, self._weight(ts))
+                w.hi += 1
+                changed = True
+            while w.lo < w.hi and sales[w.lo][0] < w.since:
+                w.prices.remove(sales[w.lo][2], sales[w.lo][1])
+                w.lo += 1
+                changed = True
+            if changed:
+                w.summary = None
+        # the longest window starts earliest; nothing before it is needed again
+        drop = self._windows[-1].lo
+        if drop > 256 and drop * 2 > len(sales):
+            del sales[:drop]
+            for w in self._windows:
+                w.lo -= drop
+                w.hi -= drop
+
+    def _rebase(self, ts: float) -> None:
+        self._anchor = ts
+        for w in self._windows:
+            for _, seq, cents, _ in self._sales[w.lo:w.hi]:
+                w.prices.remove(cents, seq)
+            for _, seq, cents, sold_ts in self._sales[w.lo:w.hi]:
+                w.prices.insert(cents, seq, self._weight(sold_ts))
+
+    def _window(self, days: float) -> _Window:
+        for w in self._windows:
+            if w.days == days:
+                return w
+        raise KeyError(days)
+
+    def count(self, days: float) -> int:
+        return len(self._window(days).prices)
+
+    def summary(self, days: float) -> Optional[MarketSummary]:
+        """Market summary of the window, or None if it holds no sales."""
+        w = self._window(days)
+        n = len(w.prices)
+        if n == 0:
+            return None
+        if w.summary is None:
+            positions, lo, hi = order_stat_positions(n)
+            prices = w.prices
+            w.summary = summarize_order_stats(
+                n,
+                {i: Decimal(prices[i]).scaleb(-2) for i in positions},
+                Decimal(prices.sum_smallest(hi) - prices.sum_smallest(lo)).scaleb(-2),
+                hi - lo,
+            )
+        return w.summary
+
+    def ew_median(self, days: Optional[float] = None) -> Optional[Decimal]:
+        """Exponentially weighted median price of a window (the longest by default)."""
+        w = self._windows[-1] if days is None else self._window(days)
+        cents = w.prices.weighted_median()
+        return None if cents is None else Decimal(cents).scaleb(-2)
+
+def momentum(ew_median: Decimal, median: Decimal) -> float:
+    """Relative gap of the recency-weighted median over the plain one; > 0 when recent sales run higher."""
+    if median <= 0:
+        return 0.0
+    return round(float(ew_median / median - 1), 4)
+
+def recency_weighted_quartiles(p25: Decimal, median: Decimal, p75: Decimal, ew_median: Decimal) -> Tuple[Decimal, Decimal, Decimal]:
+    """Quartiles moved so the median is the recency-weighted one, keeping their ratios to it."""
+    if median <= 0:
+        return p25, median, p75
+    f = ew_median / median
+    return quantize_money(p25 * f), quantize_money(ew_median), quantize_money(p75 * f)
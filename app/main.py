@@ -1,10 +1,52 @@
-from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+from typing import Optional
 import os
+import time
+
+from app.api.routes import job_manager, router
+from app.data import db
+from app.data.decision_log import RetentionJob
+from app.data.log_writer import get_log_writer
+from app.services.catalog import get_catalog
+from app.services.comps_guard import ProviderUnavailable
+from app.services.metrics import (
+    PROFILER,
+    PROFILER_MIN_INTERVAL_MS,
+    PROFILER_MIN_SLOW_MS,
+    REGISTRY,
+    REQUEST_SECONDS,
+    REQUESTS_TOTAL,
+)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    # schema + migrations once, before the first request
+    db.get_pool()
+    # card catalog (CARDKING_CATALOG_PATH) is indexed up front, not on first identify
+    get_catalog()
+    writer = get_log_writer()
+    writer.start()
+    retention_days = os.environ.get("CARDKING_LOG_RETENTION_DAYS")
+    retention = RetentionJob(float(retention_days)) if retention_days else None
+    if retention is not None:
+        retention.start()
+    # resumes jobs a previous process left queued or running
+    job_manager.start()
+    yield
+    job_manager.close()
+    if retention is not None:
+        retention.stop()
+    # drain queued decision_log rows before the pool goes away
+    writer.close()
+    db.close_pool()
 
-app = FastAPI(title="Card King")
+
+app = FastAPI(title="Card King", lifespan=lifespan)
 
 # CORS (DEFAULT: minimal)
 app.add_middleware(
@@ -14,6 +56,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(router)
+
+
+@app.exception_handler(ProviderUnavailable)
+async def provider_unavailable(_: Request, exc: ProviderUnavailable):
+    # only reached when there were no cached comps to fall back on
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+
+class RequestMetricsMiddleware:
+    """Times each HTTP request until its last body chunk is sent.
+
+    A plain ASGI wrapper around `send` rather than @app.middleware("http"):
+    no per-request task and response re-streaming, and streaming responses
+    are timed to the end of the stream, not just until the headers go out.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = "500"
+        recorded = False
+
+        def record() -> None:
+            nonlocal recorded
+            recorded = True
+            elapsed = time.perf_counter() - started
+            # the router stores the matched route in the shared scope; label by its
+            # template so unknown paths can't blow up cardinality
+            path = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(elapsed, path)
+            REQUESTS_TOTAL.inc(path, scope["method"], status)
+            PROFILER.request_finished(path, started, elapsed)
+
+        async def send_timed(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            if not recorded:
+                record()
+
+
+app.add_middleware(RequestMetricsMiddleware)
+
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 
@@ -26,6 +129,37 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+# The profiler endpoints expose stack captures and let callers start sampling, so
+# they only exist where an operator turned them on.
+PROFILER_ENDPOINTS = os.environ.get("CARDKING_PROFILER_ENDPOINTS", "") == "1"
+
+
+def _require_profiler_endpoints() -> None:
+    if not PROFILER_ENDPOINTS:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@app.post("/metrics/profiler")
+def configure_profiler(
+    enabled: bool,
+    interval_ms: Optional[float] = Query(None, ge=PROFILER_MIN_INTERVAL_MS),
+    slow_ms: Optional[float] = Query(None, ge=PROFILER_MIN_SLOW_MS),
+):
+    _require_profiler_endpoints()
+    return PROFILER.configure(enabled, interval_ms=interval_ms, slow_ms=slow_ms)
+
+
+@app.get("/metrics/profiler/captures")
+def profiler_captures():
+    _require_profiler_endpoints()
+    return {"status": PROFILER.status(), "captures": PROFILER.captures()}
+
+
 @app.get("/")
 def root():
     return FileResponse(os.path.join(STATIC_DIR, "index.html"))
@@ -0,0 +1,343 @@
+from __future__ import annotations
+
+import csv
+import os
+import re
+import sqlite3
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.engine.identity import guess_category, stable_card_key
+from app.engine.schemas import CardIdentity
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_MIN_FUZZY_SIMILARITY = 0.5
+_SUGGEST_SCAN_LIMIT = 5000
+
+def tokens(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens: "Base Set #4/102" -> ["base", "set", "4", "102"]."""
+    return _TOKEN.findall(text.lower())
+
+def _trigrams(token: str) -> set:
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class CatalogEntry(NamedTuple):
+    """One catalog card; a tuple rather than a dataclass so large catalogs stay compact."""
+
+    card_key: str
+    name: str
+    category: str
+    year: Optional[int]
+    set_name: Optional[str]
+    card_number: Optional[str]
+    variant: Optional[str]
+
+    @property
+    def display_name(self) -> str:
+        parts = [str(self.year) if self.year else "", self.set_name or "", self.name]
+        if self.card_number:
+            parts.append(f"#{self.card_number}")
+        if self.variant:
+            parts.append(self.variant)
+        return " ".join(p for p in parts if p)
+
+    def search_text(self) -> str:
+        return " ".join(filter(None, (self.name, str(self.year or ""), self.set_name, self.card_number, self.variant)))
+
+    def identity(self) -> CardIdentity:
+        return CardIdentity(
+            card_key=self.card_key,
+            display_name=self.display_name,
+            category=self.category,  # type: ignore[arg-type]
+            year=self.year,
+            set_name=self.set_name,
+            card_number=self.card_number,
+            variant=self.variant,
+        )
+
+class CardCatalog:
+    """In-memory card catalog with a token index and trigram typo correction.
+
+    Entries are numbered by ascending token count, so every posting list
+    (sorted entry ids per token) lists the most specific cards first and
+    "best match" is simply the smallest id in an intersection. Tokens are
+    numbered in sorted order, which turns a prefix into a contiguous id
+    range. Postings and the per-entry token lists are flat uint32 arrays
+    with offsets (8 bytes per entry token in total); intersections run in
+    numpy over chunks of the rarest list and stop once enough ids are found.
+    Typos are corrected against the vocabulary through a trigram index, so
+    that index grows with the vocabulary rather than the catalog.
+    """
+
+    def __init__(self, entries: Iterable[CatalogEntry]) -> None:
+        kept: List[CatalogEntry] = []
+        counts = array("I")
+        pair_tok = array("I")
+        tok_ids: Dict[str, int] = {}
+        for e in entries:
+            toks = set(tokens(e.search_text()))
+            if not toks:
+                continue
+            kept.append(e)
+            counts.append(len(toks))
+            for t in toks:
+                tid = tok_ids.get(t)
+                if tid is None:
+                    tid = tok_ids[sys.intern(t)] = len(tok_ids)
+                pair_tok.append(tid)
+
+        n_tok = np.frombuffer(counts, dtype=np.uint32) if counts else np.zeros(0, np.uint32)
+        order = np.argsort(n_tok, kind="stable")
+        rank = np.empty(len(order), dtype=np.uint32)
+        rank[order] = np.arange(len(order), dtype=np.uint32)
+        self.entries: List[CatalogEntry] = [kept[i] for i in order]
+
+        self._vocab: List[str] = sorted(tok_ids)
+        remap = np.empty(len(tok_ids), dtype=np.uint32)
+        for vid, t in enumerate(self._vocab):
+            remap[tok_ids[t]] = vid
+        self._tok_ids = {t: vid for vid, t in enumerate(self._vocab)}
+
+        toks_arr = remap[np.frombuffer(pair_tok, dtype=np.uint32)] if pair_tok else np.zeros(0, np.uint32)
+        eids = np.repeat(rank, n_tok)
+        by_tok = np.lexsort((eids, toks_arr))
+        self._post = eids[by_tok]
+        self._post_off = np.zeros(len(self._vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(toks_arr, minlength=len(self._vocab)), out=self._post_off[1:])
+        by_entry = np.lexsort((toks_arr, eids))
+        self._fwd = toks_arr[by_entry]
+        self._fwd_off = np.zeros(len(self.entries) + 1, dtype=np.int64)
+        np.cumsum(n_tok[order], out=self._fwd_off[1:])
+
+        self._by_key: Dict[str, int] = {}
+        for eid, e in enumerate(self.entries):
+            self._by_key.setdefault(e.card_key, eid)
+
+        grams: Dict[str, array] = {}
+        self._gram_counts = np.zeros(len(self._vocab), dtype=np.int64)
+        for vid, t in enumerate(self._vocab):
+            if not t.isdigit():
+                token_grams = _trigrams(t)
+                self._gram_counts[vid] = len(token_grams)
+                for g in token_grams:
+                    ids = grams.get(g)
+                    if ids is None:
+                        ids = grams[g] = array("I")
+                    ids.append(vid)
+        self._grams = {g: np.frombuffer(ids, dtype=np.uint32) for g, ids in grams.items()}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, card_key: str) -> Optional[CatalogEntry]:
+        eid = self._by_key.get(card_key)
+        return None if eid is None else self.entries[eid]
+
+    def _postings(self, vid: int) -> np.ndarray:
+        return self._post[self._post_off[vid]:self._post_off[vid + 1]]
+
+    # -- lookup -------------------------------------------------------------
+
+    def correct(self, token: str) -> Optional[int]:
+        """Vocabulary id for `token`: exact, else the closest token by trigram Jaccard similarity."""
+        vid = self._tok_ids.get(token)
+        if vid is not None:
+            return vid
+        if token.isdigit() or len(token) < 3:
+            return None
+        q = _trigrams(token)
+        # Jaccard >= 0.5 needs at least half the query's trigrams in common (and
+        # between half and twice as many trigrams), so every match shares one
+        # of the query's len(q) - ceil(len(q)/2) + 1 rarest trigrams.
+        known = sorted((self._grams[g] for g in q if g in self._grams), key=len)
+        n_probe = len(q) - (len(q) + 1) // 2 + 1 - (len(q) - len(known))
+        if n_probe <= 0:
+            return None
+        cands = np.unique(np.concatenate(known[:n_probe]))
+        sizes = self._gram_counts[cands]
+        keep = (2 * sizes >= len(q)) & (sizes <= 2 * len(q))
+        cands, sizes = cands[keep], sizes[keep]
+        shared = np.zeros(len(cands), dtype=np.int64)
+        for ids in known:
+            idx = np.minimum(np.searchsorted(ids, cands), len(ids) - 1)
+            shared += ids[idx] == cands
+        sim = shared / (len(q) + sizes - shared)
+        ok = sim >= _MIN_FUZZY_SIMILARITY
+        if not ok.any():
+            return None
+        cands, sim = cands[ok], sim[ok]
+        postings = self._post_off[cands + 1] - self._post_off[cands]
+        # most similar, then most common, then first in vocabulary order
+        return int(cands[np.lexsort((cands, -postings, -sim))[0]])
+
+    def _matches(self, toks: Sequence[str]) -> Optional[Iterator[np.ndarray]]:
+        """Chunks of ascending entry ids containing every token; None if a token is unknown."""
+        lists = []
+        for t in toks:
+            vid = self.correct(t)
+            if vid is None:
+                return None
+            lists.append(self._postings(vid))
+        if not lists:
+            return None
+        lists.sort(key=len)
+        return _intersect(lists[0], lists[1:])
+
+    def resolve(self, query: str) -> Optional[CatalogEntry]:
+        """The most specific entry containing every (typo-corrected) query token.
+
+        Needs at least two tokens, one of them non-numeric, so a bare name
+        or number never pins down a single card.
+        """
+        toks = list(dict.fromkeys(tokens(query)))
+        if len(toks) < 2 or all(t.isdigit() for t in toks):
+            return None
+        found = self._matches(toks)
+        if found is None:
+            return None
+        for chunk in found:
+            if len(chunk):
+                return self.entries[int(chunk[0])]
+        return None
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[CatalogEntry]:
+        """Autocomplete: entries matching all complete tokens and the last, partial one as a prefix."""
+        toks = tokens(prefix)
+        if limit < 1 or not toks:
+            return []
+        partial = None if prefix[-1:].isspace() else toks[-1]
+        complete = list(dict.fromkeys(toks[:-1] if partial is not None else toks))
+
+        lo = hi = 0
+        if partial is not None:
+            lo = bisect_left(self._vocab, partial)
+            hi = bisect_left(self._vocab, partial + "\x7f")
+            if lo == hi:
+                return []
+            if not complete:
+                return [self.entries[i] for i in self._prefix_only(lo, hi, limit)]
+
+        found = self._matches(complete)
+        if found is None:
+            return []
+        out: List[int] = []
+        scanned = 0
+        for chunk in found:
+            if partial is not None:
+                chunk = chunk[self._has_token_in(chunk, lo, hi)]
+            out.extend(int(i) for i in chunk[:limit - len(out)])
+            scanned += len(chunk)
+            if len(out) >= limit or scanned >= _SUGGEST_SCAN_LIMIT:
+                break
+        return [self.entries[i] for i in out]
+
+    def _has_token_in(self, eids: np.ndarray, lo: int, hi: int) -> np.ndarray:
+        """Mask of entries owning any token id in [lo, hi), via the forward index."""
+        starts = self._fwd_off[eids]
+        lens = self._fwd_off[eids + 1] - starts
+        owner = np.repeat(np.arange(len(eids)), lens)
+        flat = self._fwd[np.repeat(starts - np.cumsum(lens) + lens, lens) + np.arange(int(lens.sum()))]
+        hits = (flat >= lo) & (flat < hi)
+        return np.bincount(owner[hits], minlength=len(eids)) > 0
+
+    def _prefix_only(self, lo: int, hi: int, limit: int) -> List[int]:
+        """Smallest `limit` entry ids having any token in [lo, hi)."""
+        starts = self._post_off[lo:hi]
+        firsts = self._post[starts]
+        distinct = np.unique(firsts)
+        # with `limit` distinct first ids at or below `bound`, the answer can't go
+        # past it: only tokens starting at or below it contribute, and only up to it
+        bound = distinct[limit - 1] if len(distinct) >= limit else len(self.entries)
+        take = np.nonzero(firsts <= bound)[0]
+        lens = np.minimum(self._post_off[lo + take + 1] - starts[take], limit)
+        flat = self._post[np.repeat(starts[take] - np.cumsum(lens) + lens, lens) + np.arange(int(lens.sum()))]
+        return [int(i) for i in np.unique(flat[flat <= bound])[:limit]]
+
+    def identify(self, query: str) -> Optional[CardIdentity]:
+        entry = self.resolve(query)
+        return None if entry is None else entry.identity()
+
+_CHUNK = 4096
+
+def _intersect(driver: np.ndarray, others: List[np.ndarray]) -> Iterator[np.ndarray]:
+    """Ids of `driver` present in every array of `others` (all ascending), in chunks."""
+    for start in range(0, len(driver), _CHUNK):
+        cur = driver[start:start + _CHUNK]
+        for other in others:
+            idx = np.searchsorted(other, cur)
+            ok = idx < len(other)
+            cur = cur[ok]
+            cur = cur[other[idx[ok]] == cur]
+            if not len(cur):
+                break
+        yield cur
+
+# -- loading -------------------------------------------------------------------
+
+_FIELDS = ("card_key", "name", "category", "year", "set_name", "card_number", "variant")
+
+def entry_from_row(row: Dict[str, Optional[str]]) -> CatalogEntry:
+    """CatalogEntry from a CSV/SQLite row; card_key and category are derived when blank."""
+    def clean(k: str) -> Optional[str]:
+        v = (row.get(k) or "").strip()
+        return sys.intern(v) if v else None
+
+    name = clean("name")
+    if not name:
+        raise ValueError("catalog row without a name")
+    year_s = clean("year")
+    year = int(year_s) if year_s else None
+    set_name, number, variant = clean("set_name"), clean("card_number"), clean("variant")
+    canonical = " ".join(filter(None, (str(year or ""), set_name, name, number, variant)))
+    category = clean("category") or guess_category(canonical)
+    return CatalogEntry(
+        card_key=clean("card_key") or stable_card_key(canonical),
+        name=name,
+        category=category,
+        year=year,
+        set_name=set_name,
+        card_number=number,
+        variant=variant,
+    )
+
+def load_catalog(path: str) -> CardCatalog:
+    """Load a catalog from CSV (header row with _FIELDS columns) or a SQLite `cards` table."""
+    if path.endswith((".sqlite", ".sqlite3", ".db")):
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        try:
+            cols = {r[1] for r in conn.execute("PRAGMA table_info(cards)")}
+            select = ", ".join(f if f in cols else f"NULL AS {f}" for f in _FIELDS)
+            rows = conn.execute(f"SELECT {select} FROM cards")
+            return CardCatalog(entry_from_row({k: (None if r[k] is None else str(r[k])) for k in _FIELDS}) for r in rows)
+        finally:
+            conn.close()
+    with open(path, newline="", encoding="utf-8") as f:
+        return CardCatalog(entry_from_row(row) for row in csv.DictReader(f))
+
+_catalog: Optional[CardCatalog] = None
+_catalog_loaded = False
+_catalog_lock = threading.Lock()
+
+def get_catalog() -> Optional[CardCatalog]:
+    """Catalog from CARDKING_CATALOG_PATH, loaded once; None when not configured."""
+    global _catalog, _catalog_loaded
+    if not _catalog_loaded:
+        with _catalog_lock:
+            if not _catalog_loaded:
+                path = os.environ.get("CARDKING_CATALOG_PATH")
+                _catalog = load_catalog(path) if path else None
+                _catalog_loaded = True
+    return _catalog
+
+def set_catalog(catalog: Optional[CardCatalog]) -> None:
+    global _catalog, _catalog_loaded
+    with _catalog_lock:
+        _catalog = catalog
+        _catalog_loaded = True
@@ -0,0 +1,306 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.data import db, sold_comps
+from app.engine.schemas import CardIdentity, SoldComp, MarketStats
+from app.engine.serialize import dump, dump_comps
+from app.services.comps_guard import BATCH, ProviderUnavailable, priority
+from app.services.comps_provider_base import CompsProvider
+from app.services.metrics import stage
+
+@dataclass(frozen=True)
+class CacheEntry:
+    comps: List[SoldComp]
+    stats: MarketStats
+    fetched_at: datetime
+    # the serialized comps and stats, kept from the comps_cache row or the write that created it
+    comps_json: Optional[bytes] = None
+    stats_json: Optional[bytes] = None
+    # served past its freshness policy because the provider was unavailable
+    degraded: bool = False
+
+    def json_parts(self) -> Tuple[bytes, bytes]:
+        return (
+            self.comps_json if self.comps_json is not None else dump_comps(self.comps),
+            self.stats_json if self.stats_json is not None else dump(self.stats),
+        )
+
+    def content_id(self) -> str:
+        """Hash of the market stats; unlike fetched_at it survives a refetch that found the same market."""
+        return hashlib.blake2b(self.json_parts()[1], digest_size=8).hexdigest()
+
+def _comp(d: Dict[str, Any]) -> SoldComp:
+    return SoldComp.model_construct(
+        sold_price=Decimal(d["sold_price"]), sold_date_utc=d["sold_date_utc"], title=d["title"], listing_id=d.get("listing_id")
+    )
+
+def _stats(d: Dict[str, Any]) -> MarketStats:
+    return MarketStats.model_construct(
+        p25=Decimal(d["p25"]),
+        median=Decimal(d["median"]),
+        p75=Decimal(d["p75"]),
+        comps_count=int(d["comps_count"]),
+        spread_ratio=float(d["spread_ratio"]),
+        confidence=int(d["confidence"]),
+        currency=d.get("currency", "USD"),
+    )
+
+class _Flight:
+    """One upstream fetch that concurrent misses for the same card wait on."""
+
+    __slots__ = ("done", "entry", "error")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.entry: Optional[CacheEntry] = None
+        self.error: Optional[BaseException] = None
+
+class CachedCompsProvider(CompsProvider):
+    """Read-through comps cache: in-process LRU -> SQLite comps_cache -> provider.
+
+    Entries older than `ttl_seconds` are stale. A stale entry is still served
+    while one background refresh per card_key fetches a new one, unless it is
+    older than `ttl_seconds + max_stale_seconds`, in which case the caller
+    waits for the provider. If the provider then raises ProviderUnavailable
+    (shed, rate limited, circuit open, failed), the newest entry we have, of
+    any age, is served with `degraded` set; with no entry at all it raises.
+
+    Fetches are single-flight per card_key: concurrent misses (and a
+    background refresh) for a hot card share one upstream call and its
+    result or exception.
+
+    Every fetch appends its sales to the sold_comps history (duplicates are
+    ignored) and stores the entry in SQLite, except for lazy comps views
+    (anything that isn't a list, e.g. ArchiveComps): their provider is
+    already a local store, so they stay in memory and are never walked
+    or serialized unless a response asks for them. Incremental providers
+    (see CompsProvider.get_sold_comps_since) are only asked for sales after
+    the last synced one; their entries are then read back from the history
+    over the last `history_days`.
+    """
+
+    COUNTERS: Tuple[str, ...] = (
+        "memory_hits",
+        "db_hits",
+        "misses",
+        "stale_served",
+        "evictions",
+        "refreshes",
+        "refresh_errors",
+        "degraded_served",
+        "coalesced",
+    )
+
+    def __init__(
+        self,
+        provider: CompsProvider,
+        max_entries: int = 2048,
+        ttl_seconds: float = 3600.0,
+        max_stale_seconds: float = 86400.0,
+        history_days: float = 90.0,
+        clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self.provider = provider
+        self.max_entries = max_entries
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_stale = timedelta(seconds=ttl_seconds + max_stale_seconds)
+        self.history_days = history_days
+        self._clock = clock
+        self._lru: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing: set = set()
+        self._inflight: Dict[str, _Flight] = {}
+        self._listeners: List[Callable[[str], None]] = []
+        self._counters: Dict[str, int] = dict.fromkeys(self.COUNTERS, 0)
+
+    # -- public API ---------------------------------------------------------
+
+    def get_recent_sold_comps(self, identity: CardIdentity) -> Tuple[List[SoldComp], MarketStats]:
+        entry = self.lookup(identity)
+        return entry.comps, entry.stats
+
+    def lookup(self, identity: CardIdentity) -> CacheEntry:
+        key = identity.card_key
+        now = self._clock()
+
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                self._lru.move_to_end(key)
+        if entry is not None:
+            served = self._serve(identity, entry, now, "memory_hits")
+            if served is not None:
+                return served
+
+        with stage("comps_cache_read"):
+            stored = self._read_db(key)
+        if stored is not None:
+            entry = stored
+            self._remember(key, entry)
+            served = self._serve(identity, entry, now, "db_hits")
+            if served is not None:
+                return served
+
+        self._count("misses")
+        try:
+            return self._fetch_once(identity)
+        except ProviderUnavailable:
+            if entry is None:
+                raise
+            self._count("degraded_served")
+            return replace(entry, degraded=True)
+
+    def subscribe(self, listener: Callable[[str], None]) -> None:
+        """Call `listener(card_key)` whenever new comps are fetched for a card."""
+        self._listeners.append(listener)
+
+    def invalidate(self, card_key: Optional[str] = None) -> None:
+        """Drop one card (or everything) from the in-process tier."""
+        with self._lock:
+            if card_key is None:
+                self._lru.clear()
+            else:
+                self._lru.pop(card_key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._counters)
+            out["size"] = len(self._lru)
+            out["max_entries"] = self.max_entries
+        return out
+
+    # -- internals ----------------------------------------------------------
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += n
+
+    def _serve(self, identity: CardIdentity, entry: CacheEntry, now: datetime, counter: str) -> Optional[CacheEntry]:
+        age = now - entry.fetched_at
+        if age <= self.ttl:
+            self._count(counter)
+            return entry
+        if age <= self.max_stale:
+            self._count("stale_served")
+            self._refresh_async(identity)
+            return entry
+        return None
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._lru[key] = entry
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def _fetch_once(self, identity: CardIdentity) -> CacheEntry:
+        key = identity.card_key
+        with self._lock:
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                # a fetch may have landed between our cache check and here
+                recent = self._lru.get(key)
+                if recent is not None and self._clock() - recent.fetched_at <= self.ttl:
+                    return recent
+                flight = self._inflight[key] = _Flight()
+            else:
+                self._counters["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry  # type: ignore[return-value]
+        try:
+            flight.entry = self._fetch(identity)
+            return flight.entry
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+
+    def _fetch(self, identity: CardIdentity) -> CacheEntry:
+        key = identity.card_key
+        synced = sold_comps.last_sync(key) if self.provider.incremental else None
+        entry = None
+        if synced is not None and synced[1] is not None:
+            with stage("comps_provider"):
+                new = self.provider.get_sold_comps_since(identity, synced[1])
+            now = self._clock()
+            with stage("comps_history_append"):
+                sold_comps.append(key, new, now)
+            with stage("comps_history_read"):
+                stats = sold_comps.window_stats(key, self.history_days, now)
+                if stats is not None:
+                    entry = CacheEntry(comps=sold_comps.recent(key, self.history_days, now), stats=stats, fetched_at=now)
+        if entry is None:
+            with stage("comps_provider"):
+                comps_list, stats = self.provider.get_recent_sold_comps(identity)
+            entry = CacheEntry(comps=comps_list, stats=stats, fetched_at=self._clock())
+            if isinstance(comps_list, list):
+                with stage("comps_history_append"):
+                    sold_comps.append(key, comps_list, entry.fetched_at)
+        if isinstance(entry.comps, list):
+            with stage("comps_cache_write"):
+                entry = self._write_db(identity.card_key, entry)
+        self._remember(identity.card_key, entry)
+        for listener in self._listeners:
+            listener(identity.card_key)
+        return entry
+
+    def _refresh_async(self, identity: CardIdentity) -> None:
+        key = identity.card_key
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run() -> None:
+            try:
+                with priority(BATCH):  # nobody is waiting on it
+                    self._fetch_once(identity)
+                self._count("refreshes")
+            except Exception:
+                self._count("refresh_errors")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=run, name=f"comps-refresh-{key}", daemon=True).start()
+
+    def _read_db(self, key: str) -> Optional[CacheEntry]:
+        with db.connection() as conn:
+            row = conn.execute(db.SQL_SELECT_COMPS_CACHE, (key,)).fetchone()
+        if row is None:
+            return None
+        # our own rows, validated when they were first fetched
+        fetched_at, comps_json, stats_json = row
+        return CacheEntry(
+            comps=[_comp(c) for c in json.loads(comps_json)],
+            stats=_stats(json.loads(stats_json)),
+            fetched_at=datetime.fromisoformat(fetched_at),
+            comps_json=comps_json.encode("utf-8"),
+            stats_json=stats_json.encode("utf-8"),
+        )
+
+    def _write_db(self, key: str, entry: CacheEntry) -> CacheEntry:
+        """Store the entry; returns it carrying the JSON it was stored as."""
+        comps_json, stats_json = entry.json_parts()
+        row = (key, entry.fetched_at.isoformat(), comps_json.decode("utf-8"), stats_json.decode("utf-8"))
+        with db.connection() as conn:
+            conn.execute(db.SQL_UPSERT_COMPS_CACHE, row)
+        return CacheEntry(entry.comps, entry.stats, entry.fetched_at, comps_json, stats_json)
@@ -0,0 +1,273 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set, Tuple, TypeVar
+
+from app.engine.schemas import CardIdentity, MarketStats, SoldComp
+from app.services.comps_provider_base import CompsProvider
+
+# Lower runs first: someone is waiting on interactive requests, nobody is on batch work.
+INTERACTIVE = 0
+BATCH = 1
+
+T = TypeVar("T")
+
+_PRIORITY: ContextVar[int] = ContextVar("cardking_comps_priority", default=INTERACTIVE)
+
+@contextmanager
+def priority(level: int) -> Iterator[None]:
+    """Run upstream comps fetches made inside the block at `level`."""
+    token = _PRIORITY.set(level)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+def batch_priority(fn: Callable) -> Callable:
+    """`fn` with its comps fetches queued behind interactive ones."""
+    def run(*args, **kwargs):
+        with priority(BATCH):
+            return fn(*args, **kwargs)
+    return run
+
+class ProviderUnavailable(RuntimeError):
+    """An upstream comps fetch was shed, timed out, failed or hit an open circuit."""
+
+    def __init__(self, provider: str, reason: str, retry_after: float = 1.0) -> None:
+        super().__init__(f"comps provider {provider} unavailable: {reason}")
+        self.provider = provider
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucket:
+    """`rate` tokens per second, up to `burst` banked."""
+
+    def __init__(self, rate: float, burst: float, clock: Callable[[], float] = time.monotonic) -> None:
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be > 0 and burst >= 1")
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = burst
+        self._at = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, max_wait: float) -> Optional[float]:
+        """Take a token; returns the seconds to wait before using it, or None (nothing taken) if over `max_wait`."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._at) * self.rate)
+            self._at = now
+            wait = max(0.0, (1.0 - self._tokens) / self.rate)
+            if wait > max_wait:
+                return None
+            self._tokens -= 1.0
+            return wait
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures; one probe call is let through after `reset_seconds`."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0, clock: Callable[[], float] = time.monotonic) -> None:
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be >= 1")
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+                return self.HALF_OPEN
+            return self._state
+
+    def retry_after(self) -> float:
+        with self._lock:
+            return max(0.0, self.reset_seconds - (self._clock() - self._opened_at))
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; in half-open state only the first caller gets through."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+    def record(self, ok: bool) -> None:
+        with self._lock:
+            if ok:
+                self._state = self.CLOSED
+                self._failures = 0
+                return
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+
+class GuardedCompsProvider(CompsProvider):
+    """Admission control in front of one upstream CompsProvider.
+
+    At most `concurrency` fetches run at once; further callers wait in a
+    priority queue (interactive before batch, FIFO within a priority) of at
+    most `max_queue` entries. A full queue sheds its newest lowest-priority
+    waiter, or the arrival itself if nothing queued ranks below it. Every
+    call has a `deadline_seconds` budget for queueing plus the rate-limit
+    wait; callers that can't start within it are shed instead of piling up
+    threads. Fetches that fail, or finish past their deadline, count towards
+    the circuit breaker; while it is open, calls fail fast. All of these
+    raise ProviderUnavailable, which the comps cache answers with its last
+    known comps marked degraded.
+    """
+
+    COUNTERS: Tuple[str, ...] = (
+        "calls",
+        "errors",
+        "slow",
+        "shed_queue_full",
+        "shed_deadline",
+        "shed_rate_limited",
+        "shed_circuit_open",
+    )
+
+    def __init__(
+        self,
+        provider: CompsProvider,
+        name: Optional[str] = None,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        concurrency: int = 8,
+        max_queue: int = 64,
+        deadline_seconds: float = 2.0,
+        breaker: Optional[CircuitBreaker] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if concurrency < 1 or max_queue < 0:
+            raise ValueError("concurrency must be >= 1 and max_queue >= 0")
+        self.provider = provider
+        self.name = name or type(provider).__name__
+        self.bucket = TokenBucket(rate, burst or max(1.0, rate), clock) if rate else None
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.deadline_seconds = deadline_seconds
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._queue: List[Tuple[int, int]] = []  # heap of (priority, seq)
+        self._shed: Set[int] = set()
+        self._seq = itertools.count()
+        self._counters: Dict[str, int] = dict.fromkeys(self.COUNTERS, 0)
+    def get_recent_sold_comps(self, identity: CardIdentity) -> Tuple[List[SoldComp], MarketStats]:
+        return self._call(self.provider.get_recent_sold_comps, identity)
+
+    def get_sold_comps_since(self, identity: CardIdentity, since: str) -> List[SoldComp]:
+        return self._call(self.provider.get_sold_comps_since, identity, since)
+
+    @property
+    def incremental(self) -> bool:
+        # incremental providers stay incremental behind the guard
+        return self.provider.incremental
+
+    def _call(self, fetch: Callable[..., T], *args: Any) -> T:
+        if self.breaker.state == CircuitBreaker.OPEN:
+            self._reject("circuit_open", self.breaker.retry_after())
+        deadline = self._clock() + self.deadline_seconds
+        self._admit(_PRIORITY.get(), deadline)
+        try:
+            if self.bucket is not None:
+                wait = self.bucket.reserve(deadline - self._clock())
+                if wait is None:
+                    self._reject("rate_limited", 1.0 / self.bucket.rate)
+                if wait:
+                    time.sleep(wait)
+            if not self.breaker.allow():
+                self._reject("circuit_open", self.breaker.retry_after())
+            self._count("calls")
+            try:
+                result = fetch(*args)
+            except Exception as exc:
+                self._count("errors")
+                self.breaker.record(False)
+                raise ProviderUnavailable(self.name, f"error: {exc}") from exc
+            slow = self._clock() > deadline
+            if slow:
+                self._count("slow")
+            self.breaker.record(not slow)
+            return result
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            out: Dict[str, float] = dict(self._counters)
+            out["queue_depth"] = len(self._queue)
+            out["in_flight"] = self._in_flight
+        out["circuit_open"] = 0 if self.breaker.state == CircuitBreaker.CLOSED else 1
+        return out
+
+    # -- internals ----------------------------------------------------------
+
+    def _count(self, name: str) -> None:
+        with self._cond:
+            self._counters[name] += 1
+
+    def _reject(self, reason: str, retry_after: float = 1.0) -> None:
+        self._count("shed_" + reason)
+        raise ProviderUnavailable(self.name, reason, retry_after)
+
+    def _admit(self, prio: int, deadline: float) -> None:
+        with self._cond:
+            if self._in_flight < self.concurrency and not self._queue:
+                self._in_flight += 1
+                return
+            me = (prio, next(self._seq))
+            if len(self._queue) >= self.max_queue:
+                victim = max(self._queue, default=None)
+                if victim is None or victim[0] <= prio:
+                    self._counters["shed_queue_full"] += 1
+                    raise ProviderUnavailable(self.name, "queue_full")
+                self._queue.remove(victim)
+                heapq.heapify(self._queue)
+                self._shed.add(victim[1])  # its thread wakes up and raises
+                self._cond.notify_all()
+            heapq.heappush(self._queue, me)
+            try:
+                while True:
+                    if me[1] in self._shed:
+                        self._shed.discard(me[1])
+                        self._counters["shed_queue_full"] += 1
+                        raise ProviderUnavailable(self.name, "queue_full")
+                    if self._queue[0] == me and self._in_flight < self.concurrency:
+                        heapq.heappop(self._queue)
+                        self._in_flight += 1
+                        self._cond.notify_all()  # the next waiter may also fit
+                        return
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        self._counters["shed_deadline"] += 1
+                        raise ProviderUnavailable(self.name, "deadline")
+                    self._cond.wait(remaining)
+            except ProviderUnavailable:
+                if me in self._queue:
+                    self._queue.remove(me)
+                    heapq.heapify(self._queue)
+                self._cond.notify_all()
+                raise
+
+    def _release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify_all()
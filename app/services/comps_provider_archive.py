@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+from collections.abc import Sequence
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.data.comps_archive import CompsArchive, day_to_iso
+from app.engine.market import summarize_sorted_cents
+from app.engine.schemas import CardIdentity, MarketStats, SoldComp
+from app.services.comps_provider_base import CompsProvider
+
+class ArchiveComps(Sequence):
+    """Lazy list of SoldComp over archive slices; items are built on access."""
+
+    def __init__(self, prices: np.ndarray, days: np.ndarray, display_name: str) -> None:
+        self.prices = prices
+        self.days = days
+        self.display_name = display_name
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def __getitem__(self, i):  # type: ignore[override]
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return SoldComp(
+            sold_price=Decimal(int(self.prices[i])).scaleb(-2),
+            sold_date_utc=day_to_iso(self.days[i]),
+            title=f"{self.display_name} — Sold comp {i+1}",
+            listing_id=f"archive-{i+1}",
+        )
+
+    def to_json(self) -> bytes:
+        """The JSON array pydantic would write for these comps, built from the columns without SoldComp objects."""
+        title = json.dumps(f"{self.display_name} — Sold comp ", ensure_ascii=False)[:-1]
+        parts = [
+            '{"sold_price":"%s","sold_date_utc":"%s","title":%s%d","listing_id":"archive-%d"}'
+            % (Decimal(int(cents)).scaleb(-2), day_to_iso(day), title, i, i)
+            for i, (cents, day) in enumerate(zip(self.prices.tolist(), self.days.tolist()), start=1)
+        ]
+        return ("[" + ",".join(parts) + "]").encode("utf-8")
+
+class ArchiveCompsProvider(CompsProvider):
+    """Comps from a memory-mapped archive (see app.data.comps_archive).
+
+    A lookup is a binary search plus two array slices; stats come straight
+    from the sorted price slice. SoldComp objects are only created when the
+    returned comps are iterated, e.g. while a response is serialized.
+    Unknown cards go to `fallback`, or raise LookupError without one.
+    """
+
+    def __init__(self, path: str, fallback: Optional[CompsProvider] = None, currency: str = "USD") -> None:
+        self.archive = CompsArchive(path)
+        self.fallback = fallback
+        self.currency = currency
+
+    def slices(self, card_key: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Zero-copy (price_cents sorted ascending, sold_days) for a card, or None."""
+        i = self.archive.find(card_key)
+        if i is None:
+            return None
+        return self.archive.prices(i), self.archive.days(i)
+
+    def get_recent_sold_comps(self, identity: CardIdentity) -> Tuple[List[SoldComp], MarketStats]:
+        found = self.slices(identity.card_key)
+        if found is None:
+            if self.fallback is None:
+                raise LookupError(f"no comps for {identity.card_key}")
+            return self.fallback.get_recent_sold_comps(identity)
+        prices, days = found
+        s = summarize_sorted_cents(prices)
+        stats = MarketStats(
+            p25=s.p25,
+            median=s.median,
+            p75=s.p75,
+            comps_count=s.count,
+            spread_ratio=float(s.spread_ratio),
+            confidence=s.confidence,
+            currency=self.currency,
+        )
+        return ArchiveComps(prices, days, identity.display_name), stats  # type: ignore[return-value]
+
+    def stats(self) -> Dict[str, int]:
+        return {"cards": self.archive.n_cards, "comps": self.archive.n_comps}
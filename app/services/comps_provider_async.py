@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.engine.schemas import CardIdentity, SoldComp, MarketStats
+from app.services.comps_provider_base import AsyncCompsProvider, CompsProvider, build_market_stats
+
+class SyncProviderAdapter(AsyncCompsProvider):
+    """Expose a synchronous CompsProvider (e.g. StubCompsProvider) as async.
+
+    Blocking providers run in the default thread pool; pass `inline=True` for
+    cheap in-memory providers where a thread hop costs more than the call.
+    """
+
+    def __init__(self, provider: CompsProvider, inline: bool = False) -> None:
+        self.provider = provider
+        self.inline = inline
+
+    async def get_recent_sold_comps(self, identity: CardIdentity) -> Tuple[List[SoldComp], MarketStats]:
+        if self.inline:
+            return self.provider.get_recent_sold_comps(identity)
+        return await asyncio.to_thread(self.provider.get_recent_sold_comps, identity)
+
+class SingleFlightProvider(AsyncCompsProvider):
+    """Coalesce concurrent fetches for the same card_key into one upstream call.
+
+    Callers arriving while a fetch is in flight await the same task and get
+    the same result (or exception). Nothing is cached once the fetch ends.
+    """
+
+    def __init__(self, provider: AsyncCompsProvider) -> None:
+        self.provider = provider
+        self._inflight: Dict[str, "asyncio.Task[Tuple[List[SoldComp], MarketStats]]"] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def get_recent_sold_comps(self, identity: CardIdentity) -> Tuple[List[SoldComp], MarketStats]:
+        key = identity.card_key
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            task = asyncio.ensure_future(self.provider.get_recent_sold_comps(identity))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _t, k=key: self._inflight.pop(k, None))
+        # shield: one cancelled waiter must not cancel the fetch for everyone else
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {"calls": self.calls, "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+class FanOutProvider(AsyncCompsProvider):
+    """Query several providers concurrently and merge their comps.
+
+    Each provider gets its own timeout; providers that time out or fail are
+    skipped. Comps are de-duplicated on (sold_date_utc, sold_price, title),
+    ordered newest first, and stats are recomputed over the merged set.
+    """
+
+    def __init__(
+        self,
+        providers: Sequence[AsyncCompsProvider],
+        timeouts: Optional[Sequence[float]] = None,
+        default_timeout: float = 2.0,
+        currency: str = "USD",
+    ) -> None:
+        if not providers:
+            raise ValueError("at least one provider is required")
+        if timeouts is not None and len(timeouts) != len(providers):
+            raise ValueError("timeouts must match providers")
+        self.providers = list(providers)
+        self.timeouts = list(timeouts) if timeouts is not None else [default_timeout] * len(providers)
+        self.currency = currency
+        self.failures = [0] * len(self.providers)
+        self.timeouts_hit = [0] * len(self.providers)
+
+    async def _one(self, i: int, identity: CardIdentity) -> Optional[List[SoldComp]]:
+        try:
+            comps_list, _ = await asyncio.wait_for(
+                self.providers[i].get_recent_sold_comps(identity), timeout=self.timeouts[i]
+            )
+            return comps_list
+        except asyncio.TimeoutError:
+            self.timeouts_hit[i] += 1
+        except Exception:
+            self.failures[i] += 1
+        return None
+
+    async def get_recent_sold_comps(self, identity: CardIdentity) -> Tuple[List[SoldComp], MarketStats]:
+        results = await asyncio.gather(*(self._one(i, identity) for i in range(len(self.providers))))
+
+        merged: List[SoldComp] = []
+        seen = set()
+        for comps_list in results:
+            for c in comps_list or []:
+                ident = (c.sold_date_utc, c.sold_price, c.title)
+                if ident in seen:
+                    continue
+                seen.add(ident)
+                merged.append(c)
+        if not merged:
+            raise LookupError(f"no provider returned comps for {identity.card_key}")
+        merged.sort(key=lambda c: c.sold_date_utc, reverse=True)
+        return merged, build_market_stats(merged, currency=self.currency)
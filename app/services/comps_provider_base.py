@@ -3,8 +3,37 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from typing import List, Tuple
 from app.engine.schemas import CardIdentity, SoldComp, MarketStats
+from app.engine.market import summarize
 
 class CompsProvider(ABC):
     @abstractmethod
     def get_recent_sold_comps(self, identity: CardIdentity) -> Tuple[List[SoldComp], MarketStats]:
         raise NotImplementedError
+
+    def get_sold_comps_since(self, identity: CardIdentity, since: str) -> List[SoldComp]:
+        """Optional: only the sales after `since` (a sold_date_utc), for incremental refreshes."""
+        raise NotImplementedError
+
+    @property
+    def incremental(self) -> bool:
+        """Whether get_sold_comps_since is implemented."""
+        return type(self).get_sold_comps_since is not CompsProvider.get_sold_comps_since
+
+class AsyncCompsProvider(ABC):
+    @abstractmethod
+    async def get_recent_sold_comps(self, identity: CardIdentity) -> Tuple[List[SoldComp], MarketStats]:
+        raise NotImplementedError
+
+def build_market_stats(comps: List[SoldComp], currency: str = "USD") -> MarketStats:
+    if not comps:
+        raise ValueError("comps empty")
+    summary = summarize(c.sold_price for c in comps)
+    return MarketStats.model_construct(
+        p25=summary.p25,
+        median=summary.median,
+        p75=summary.p75,
+        comps_count=summary.count,
+        spread_ratio=float(summary.spread_ratio),
+        confidence=summary.confidence,
+        currency=currency,
+    )
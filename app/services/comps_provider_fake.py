@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from random import Random
+from typing import List, Tuple
+
+from app.engine.schemas import CardIdentity, SoldComp, MarketStats
+from app.services.comps_provider_base import AsyncCompsProvider, CompsProvider
+from app.services.comps_provider_stub import StubCompsProvider
+
+class FakeAsyncCompsProvider(AsyncCompsProvider):
+    """Local async provider for tests: stub data after a configurable delay.
+
+    `title_prefix` makes comps distinguishable when several fakes are merged.
+    """
+
+    def __init__(self, delay_seconds: float = 0.0, title_prefix: str = "", fail: bool = False) -> None:
+        self.delay_seconds = delay_seconds
+        self.title_prefix = title_prefix
+        self.fail = fail
+        self.calls = 0
+        self._stub = StubCompsProvider()
+
+    async def get_recent_sold_comps(self, identity: CardIdentity) -> Tuple[List[SoldComp], MarketStats]:
+        self.calls += 1
+        if self.delay_seconds > 0:
+            await asyncio.sleep(self.delay_seconds)
+        if self.fail:
+            raise RuntimeError("fake provider failure")
+        comps_list, stats = self._stub.get_recent_sold_comps(identity)
+        if self.title_prefix:
+            comps_list = [c.model_copy(update={"title": self.title_prefix + c.title}) for c in comps_list]
+        return comps_list, stats
+
+class FakeCompsProvider(CompsProvider):
+    """Stand-in for a remote comps API when load testing: stub data behind injected latency and errors.
+
+    Each call sleeps for a lognormal delay with median `latency_seconds`
+    (`latency_sigma` 0 makes it fixed; 1 gives a p99 about 10x the median)
+    and then fails with probability `error_rate`. Draws come from a seeded
+    RNG, so a run's sequence of delays and failures is reproducible.
+    """
+
+    def __init__(self, latency_seconds: float = 0.05, latency_sigma: float = 0.5, error_rate: float = 0.0, seed: int = 0) -> None:
+        if latency_seconds < 0 or latency_sigma < 0 or not 0.0 <= error_rate <= 1.0:
+            raise ValueError("latency must be >= 0 and error_rate in [0, 1]")
+        self.latency_seconds = latency_seconds
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.calls = 0
+        self.errors = 0
+        self._rng = Random(seed)
+        self._lock = threading.Lock()
+        self._stub = StubCompsProvider()
+
+    def get_recent_sold_comps(self, identity: CardIdentity) -> Tuple[List[SoldComp], MarketStats]:
+        with self._lock:
+            self.calls += 1
+            delay = self.latency_seconds * math.exp(self.latency_sigma * self._rng.gauss(0.0, 1.0))
+            fail = self._rng.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay > 0:
+            time.sleep(delay)
+        if fail:
+            raise RuntimeError("injected comps provider failure")
+        return self._stub.get_recent_sold_comps(identity)
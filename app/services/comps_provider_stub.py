@@ -7,50 +7,43 @@ from random import Random
 from typing import List, Tuple
 
 from app.engine.schemas import CardIdentity, SoldComp, MarketStats
-from app.engine.market import percentile, median, spread_ratio, comps_confidence, quantize_money
+from app.services.comps_provider_base import CompsProvider, build_market_stats
 
-class StubCompsProvider:
+def stub_sales(card_key: str, category: str, count: int = 10) -> List[Tuple[float, int]]:
+    """(price rounded to cents, days ago) per sale; the stub's seeding scheme."""
+    seed_int = int(hashlib.sha256(card_key.encode("utf-8")).hexdigest()[:16], 16)
+    rng = Random(seed_int)
+
+    base = 20.0 if category == "tcg" else 35.0
+    base += (seed_int % 7000) / 100.0  # 0..70 shift
+
+    sales: List[Tuple[float, int]] = []
+    for _ in range(count):
+        noise = rng.uniform(-0.22, 0.28)
+        price = max(1.0, base * (1.0 + noise))
+        days_ago = int(rng.uniform(1, 45))
+        sales.append((round(price, 2), days_ago))
+    return sales
+
+class StubCompsProvider(CompsProvider):
     """Deterministic stub comps provider.
 
     Generates the same comps for the same card_key, every time.
     """
 
     def get_recent_sold_comps(self, identity: CardIdentity) -> Tuple[List[SoldComp], MarketStats]:
-        seed_int = int(hashlib.sha256(identity.card_key.encode("utf-8")).hexdigest()[:16], 16)
-        rng = Random(seed_int)
-
-        base = 20.0 if identity.category == "tcg" else 35.0
-        base += (seed_int % 7000) / 100.0  # 0..70 shift
-
         comps: List[SoldComp] = []
         now = datetime.now(timezone.utc)
-        for i in range(10):
-            noise = rng.uniform(-0.22, 0.28)
-            price = max(1.0, base * (1.0 + noise))
-            days_ago = int(rng.uniform(1, 45))
+        for i, (price, days_ago) in enumerate(stub_sales(identity.card_key, identity.category)):
             sold_dt = now - timedelta(days=days_ago)
             comps.append(
                 SoldComp(
-                    sold_price=Decimal(str(round(price, 2))),
+                    sold_price=Decimal(str(price)),
                     sold_date_utc=sold_dt.isoformat(),
                     title=f"{identity.display_name} — Sold comp {i+1}",
+                    listing_id=f"stub-{i+1}",
                 )
             )
 
-        values = [Decimal(str(c.sold_price)) for c in comps]
-        p25 = quantize_money(percentile(values, 25))
-        med = quantize_money(median(values))
-        p75 = quantize_money(percentile(values, 75))
-        spr = spread_ratio(p25, p75, med)
-        conf = comps_confidence(len(values), spr)
-
-        stats = MarketStats(
-            p25=p25,
-            median=med,
-            p75=p75,
-            comps_count=len(values),
-            spread_ratio=float(spr),
-            confidence=conf,
-            currency="USD",
-        )
+        stats = build_market_stats(comps, currency="USD")
         return comps, stats
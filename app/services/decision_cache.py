@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Dict, Hashable, Optional, Set, Tuple
+
+from app.engine.schemas import ConditionMetrics
+
+# The UI moves condition sliders in 0.1 steps.
+METRIC_STEPS = 10
+
+def quantize_metrics(m: ConditionMetrics) -> Optional[Tuple[int, int, int, int, bool]]:
+    """Metrics as integer slider ticks, or None if any value is off the UI grid.
+
+    Off-grid values are never cached: two of them that round to the same
+    tick would otherwise share a response computed from slightly different
+    inputs.
+    """
+    ticks = []
+    for v in (m.centering, m.corners, m.edges, m.surface):
+        t = round(float(v) * METRIC_STEPS)
+        if t / METRIC_STEPS != float(v):
+            return None
+        ticks.append(t)
+    return (ticks[0], ticks[1], ticks[2], ticks[3], bool(m.issue_flag))
+
+class DecisionCache:
+    """Bounded LRU of serialized /api/decision responses.
+
+    Keys cover everything the pipeline reads: card_key, metrics on the UI
+    grid, listed price, the comps snapshot (fetched_at of the cached comps)
+    and the fee-schedule version, so a changed input can never hit a stale
+    entry. Entries for a card are also dropped eagerly when its comps are
+    refreshed, and everything is dropped when the fee version changes.
+    """
+
+    COUNTERS: Tuple[str, ...] = ("hits", "misses", "uncacheable", "evictions", "invalidations")
+
+    def __init__(self, max_entries: int = 10000) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be >= 1")
+        self.max_entries = max_entries
+        self._lru: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._by_card: Dict[str, Set[Hashable]] = {}
+        self._fee_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._counters: Dict[str, int] = dict.fromkeys(self.COUNTERS, 0)
+
+    def key(
+        self,
+        card_key: str,
+        metrics: ConditionMetrics,
+        listed_price: Optional[Decimal],
+        comps_snapshot: str,
+        fee_version: str,
+    ) -> Optional[Tuple]:
+        ticks = quantize_metrics(metrics)
+        if ticks is None:
+            with self._lock:
+                self._counters["uncacheable"] += 1
+            return None
+        price = None if listed_price is None else str(Decimal(str(listed_price)).normalize())
+        return (card_key, ticks, price, comps_snapshot, fee_version)
+
+    def get(self, key: Tuple) -> Optional[bytes]:
+        with self._lock:
+            body = self._lru.get(key)
+            if body is None:
+                self._counters["misses"] += 1
+                return None
+            self._lru.move_to_end(key)
+            self._counters["hits"] += 1
+            return body
+
+    def put(self, key: Tuple, body: bytes) -> None:
+        card_key, fee_version = key[0], key[4]
+        with self._lock:
+            if self._fee_version != fee_version:
+                self._clear_locked()
+                self._fee_version = fee_version
+            self._lru[key] = body
+            self._lru.move_to_end(key)
+            self._by_card.setdefault(card_key, set()).add(key)
+            while len(self._lru) > self.max_entries:
+                old, _ = self._lru.popitem(last=False)
+                self._forget(old)
+                self._counters["evictions"] += 1
+
+    def invalidate_card(self, card_key: str) -> None:
+        with self._lock:
+            for k in self._by_card.pop(card_key, ()):
+                self._lru.pop(k, None)
+                self._counters["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clear_locked()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self._counters)
+            out["size"] = len(self._lru)
+            out["max_entries"] = self.max_entries
+        return out
+
+    def _forget(self, key: Hashable) -> None:
+        keys = self._by_card.get(key[0])  # type: ignore[index]
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_card[key[0]]  # type: ignore[index]
+
+    def _clear_locked(self) -> None:
+        self._counters["invalidations"] += len(self._lru)
+        self._lru.clear()
+        self._by_card.clear()
+        self._fee_version = None
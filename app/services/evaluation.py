@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.data.log_writer import to_cents
+from app.engine.decision import DecisionResult
+from app.engine.fees import GRADE_ORDER, FeeSchedule
+from app.engine.grading import grade_probabilities
+from app.engine.montecarlo import RoiDistribution, simulate_roi
+from app.engine.schemas import ConditionMetrics, DecisionResponse, MarketStats, MarketValueOut, RoiDistributionOut, RoiOut
+from app.engine.serialize import dump
+from app.engine.trend import recency_weighted_quartiles
+
+def grade_probs_for(metrics: ConditionMetrics) -> Dict[str, float]:
+    return grade_probabilities(
+        centering=float(metrics.centering),
+        corners=float(metrics.corners),
+        edges=float(metrics.edges),
+        surface=float(metrics.surface),
+        issue_flag=bool(metrics.issue_flag),
+    )
+
+DEGRADED_NOTE = "Comps provider unavailable: decided on the last cached market data, confidence is degraded."
+
+def decision_response(
+    res: DecisionResult,
+    stats: MarketStats,
+    probs: Dict[str, float],
+    degraded: bool = False,
+    roi_distribution: Optional[RoiDistributionOut] = None,
+) -> DecisionResponse:
+    """The response for an engine result; built without re-validating what decide and grading produced."""
+    return DecisionResponse.model_construct(
+        decision=res.decision,
+        confidence=int(res.confidence),
+        risk=res.risk,
+        market_value=MarketValueOut.model_construct(p25=stats.p25, median=stats.median, p75=stats.p75, currency=stats.currency),
+        grade_probabilities=probs,
+        roi=RoiOut.model_construct(expected_net=res.expected_net, roi_pct=float(res.roi_pct), breakeven_grade=res.breakeven_grade),
+        explanation=(res.explanation + [DEGRADED_NOTE]) if degraded else res.explanation,
+        degraded=degraded,
+        roi_distribution=roi_distribution,
+    )
+
+def response_body(resp: DecisionResponse) -> bytes:
+    """JSON bytes exactly as the API serves a DecisionResponse."""
+    return dump(resp)
+
+def log_summary(res: DecisionResult) -> Tuple[str, int, str, Optional[int]]:
+    """The typed decision_log columns of a result, so the log writer needn't parse the response back."""
+    return (res.decision, int(res.confidence), res.risk, to_cents(res.expected_net))
+
+def recency_weighted_stats(stats: MarketStats, ew_median: Optional[Decimal]) -> MarketStats:
+    """`stats` with its quartiles re-centred on the recency-weighted median (unchanged without one)."""
+    if ew_median is None:
+        return stats
+    p25, median, p75 = recency_weighted_quartiles(
+        Decimal(str(stats.p25)), Decimal(str(stats.median)), Decimal(str(stats.p75)), ew_median
+    )
+    return stats.model_copy(update={"p25": p25, "median": median, "p75": p75})
+
+def _distribution_out(d: RoiDistribution, samples: int, seed: int) -> RoiDistributionOut:
+    return RoiDistributionOut.model_construct(
+        samples=samples,
+        seed=seed,
+        mean_net=round(d.mean_net, 2),
+        p_loss=round(d.p_loss, 4),
+        p10_net=round(d.p10_net, 2),
+        p90_net=round(d.p90_net, 2),
+        value_at_risk_95=round(d.var_95, 2),
+    )
+
+def roi_distributions(
+    stats: Sequence[MarketStats],
+    probs: Sequence[Dict[str, float]],
+    fees: FeeSchedule,
+    samples: int,
+    seed: int = 0,
+    streams: Optional[Sequence[int]] = None,
+) -> Tuple[List[RoiDistributionOut], RoiDistributionOut]:
+    """Simulated net outcomes per card and for the cards together (see montecarlo.simulate_roi)."""
+    per_card, total = simulate_roi(
+        [float(s.median) for s in stats],
+        [float(s.p25) for s in stats],
+        [float(s.p75) for s in stats],
+        np.array([[p.get(g, 0.0) for g in GRADE_ORDER] for p in probs], dtype=np.float64),
+        fees,
+        samples=samples,
+        seed=seed,
+        streams=streams,
+    )
+    return [_distribution_out(d, samples, seed) for d in per_card], _distribution_out(total, samples, seed)
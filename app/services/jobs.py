@@ -0,0 +1,312 @@
+from __future__ import annotations
+
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import uuid
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from decimal import Decimal
+from typing import Callable, Dict, FrozenSet, Iterator, List, Optional, Set, Tuple
+
+from app.data import db
+from app.data.log_writer import now_utc
+from app.engine.decision import DecisionInput, decide_many
+from app.engine.fees import FeeSchedule
+from app.engine.schemas import DecisionRequest, JobStatus, MarketStats
+from app.services.comps_guard import ProviderUnavailable
+from app.services.evaluation import decision_response, grade_probs_for, response_body
+
+TERMINAL_STATUSES = frozenset({"done", "failed", "cancelled"})
+
+# query -> (card_key, market stats, degraded); supplied by the API so jobs share its
+# comps cache. degraded: the stats are the last cached ones, the provider being unavailable
+Resolver = Callable[[str], Tuple[str, MarketStats, bool]]
+# (card_key, stats) -> recency-weighted stats, for items with recency_weighted set
+RecencyAdjuster = Callable[[str, MarketStats], MarketStats]
+
+_STATUS_COLUMNS = "id, kind, status, total, done, created_at_utc, updated_at_utc, fee_version, error"
+
+def evaluate_chunk(
+    fees: FeeSchedule,
+    mode: str,
+    rows: List[Tuple[int, MarketStats, DecisionRequest]],
+    degraded: FrozenSet[int] = frozenset(),
+) -> List[Tuple[int, str]]:
+    """Decide one chunk of cards; returns (index, DecisionResponse JSON) pairs.
+
+    Runs in pool workers, so it only takes picklable inputs. Grading runs
+    once per distinct metrics tuple and decide_many compiles fees once per
+    chunk (the fixed path caches them per worker and fee version). Rows
+    whose index is in `degraded` were resolved from stale comps and are
+    answered as such.
+    """
+    probs_memo: Dict[Tuple, Dict[str, float]] = {}
+    inputs: List[DecisionInput] = []
+    probs_list: List[Dict[str, float]] = []
+    for _, stats, item in rows:
+        m = item.metrics
+        mkey = (m.centering, m.corners, m.edges, m.surface, m.issue_flag)
+        probs = probs_memo.get(mkey)
+        if probs is None:
+            probs = probs_memo[mkey] = grade_probs_for(m)
+        probs_list.append(probs)
+        inputs.append(
+            DecisionInput(
+                market_p25=Decimal(str(stats.p25)),
+                market_median=Decimal(str(stats.median)),
+                market_p75=Decimal(str(stats.p75)),
+                comps_count=int(stats.comps_count),
+                grade_probs=probs,
+                listed_price=Decimal(str(item.listed_price)) if item.listed_price is not None else None,
+            )
+        )
+    results = decide_many(inputs, fees, mode=mode)
+    return [
+        (idx, response_body(decision_response(res, stats, probs, degraded=idx in degraded)).decode("utf-8"))
+        for (idx, stats, _), res, probs in zip(rows, results, probs_list)
+    ]
+
+def _encode_items(items: List[DecisionRequest]) -> bytes:
+    return zlib.compress(json.dumps([i.model_dump(mode="json") for i in items], separators=(",", ":")).encode("utf-8"))
+
+def _decode_items(blob: bytes) -> List[DecisionRequest]:
+    return [DecisionRequest.model_validate(d) for d in json.loads(zlib.decompress(blob))]
+
+class JobManager:
+    """Runs re-evaluation jobs over lists of cards on a process pool.
+
+    Jobs run one at a time, FIFO, on a coordinator thread. The coordinator
+    resolves card identities and comps through `resolve` (the API's comps
+    cache), cuts the outstanding items into `chunk_size` chunks and keeps
+    up to two chunks per worker in flight; workers only run the CPU-bound
+    grading, decision and serialization. The fee schedule travels with each
+    chunk (about a kilobyte) so a hot-reloaded schedule is picked up by the
+    next job without restarting workers.
+
+    State lives in SQLite: `jobs` holds status, progress and the compressed
+    input; each finished chunk commits its rows to `job_results` together
+    with the progress counter. On start, jobs left queued or running are
+    resumed, skipping items that already have results. `workers=0` runs
+    chunks on the coordinator thread instead of a pool.
+
+    Jobs run at batch priority, the first traffic the comps guard sheds: an
+    item whose comps are unavailable gets an {"error": ...} result and the
+    job carries on; items decided on stale comps are marked degraded.
+    """
+
+    def __init__(
+        self,
+        resolve: Resolver,
+        fees: Callable[[], FeeSchedule],
+        mode: str = "decimal",
+        workers: Optional[int] = None,
+        chunk_size: int = 256,
+        recency: Optional[RecencyAdjuster] = None,
+    ) -> None:
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be >= 1")
+        self.resolve = resolve
+        self.fees = fees
+        self.mode = mode
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.chunk_size = chunk_size
+        self.recency = recency
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._cancelled: Set[str] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._stopping = threading.Event()
+
+    # -- lifecycle ----------------------------------------------------------
+
+    def start(self) -> None:
+        """Start the coordinator and requeue unfinished jobs; idempotent."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping.clear()
+            if self.workers > 0:
+                # spawn: the server process has threads (log writer, pools) that fork would copy mid-flight
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            with db.connection() as conn:
+                pending = conn.execute(
+                    "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at_utc"
+                ).fetchall()
+            for (job_id,) in pending:
+                self._queue.put(job_id)
+            self._thread = threading.Thread(target=self._run, name="cardking-jobs", daemon=True)
+            self._thread.start()
+
+    def close(self) -> None:
+        """Stop after the chunks in flight; unfinished jobs stay resumable."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            executor, self._executor = self._executor, None
+        if thread is None:
+            return
+        self._stopping.set()
+        self._queue.put(None)
+        thread.join()
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    # -- public API ---------------------------------------------------------
+
+    def submit(self, items: List[DecisionRequest], kind: str = "reevaluate") -> JobStatus:
+        self.start()  # before the insert, so start() doesn't also requeue this job
+        job_id = uuid.uuid4().hex
+        now = now_utc()
+        with db.connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs(id, kind, status, created_at_utc, updated_at_utc, total, input_z)"
+                " VALUES(?,?,?,?,?,?,?)",
+                (job_id, kind, "queued", now, now, len(items), _encode_items(items)),
+            )
+        self._queue.put(job_id)
+        return self.status(job_id)  # type: ignore[return-value]
+
+    def status(self, job_id: str) -> Optional[JobStatus]:
+        with db.connection() as conn:
+            row = conn.execute(f"SELECT {_STATUS_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return None if row is None else JobStatus(**dict(zip(_STATUS_COLUMNS.split(", "), row)))
+
+    def cancel(self, job_id: str) -> Optional[JobStatus]:
+        """Cancel a queued or running job; chunks already finished keep their results."""
+        with db.connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at_utc = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (now_utc(), job_id),
+            )
+        with self._lock:
+            self._cancelled.add(job_id)
+        return self.status(job_id)
+
+    def iter_results(self, job_id: str, after: int = -1, page_size: int = 1000) -> Iterator[Tuple[int, Optional[str], str]]:
+        """(index, card_key, response JSON) in index order, one keyset page per pool checkout."""
+        while True:
+            with db.connection() as conn:
+                page = conn.execute(
+                    "SELECT idx, card_key, response_json FROM job_results WHERE job_id = ? AND idx > ? ORDER BY idx LIMIT ?",
+                    (job_id, after, page_size),
+                ).fetchall()
+            yield from page
+            if len(page) < page_size:
+                return
+            after = page[-1][0]
+
+    # -- coordinator ----------------------------------------------------------
+
+    def _run(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None or self._stopping.is_set():
+                return
+            try:
+                self._process(job_id)
+            except Exception as exc:
+                self._finish(job_id, "failed", f"{type(exc).__name__}: {exc}")
+            finally:
+                with self._lock:
+                    self._cancelled.discard(job_id)
+
+    def _is_cancelled(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._cancelled
+
+    def _process(self, job_id: str) -> None:
+        with db.connection() as conn:
+            row = conn.execute("SELECT status, input_z FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or row[0] in TERMINAL_STATUSES:
+                return
+            finished = {idx for (idx,) in conn.execute("SELECT idx FROM job_results WHERE job_id = ?", (job_id,))}
+            fees = self.fees()
+            conn.execute(
+                "UPDATE jobs SET status = 'running', fee_version = ?, updated_at_utc = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (fees.version, now_utc(), job_id),
+            )
+        items = _decode_items(row[1])
+        pending = [i for i in range(len(items)) if i not in finished]
+        chunks = iter([pending[i:i + self.chunk_size] for i in range(0, len(pending), self.chunk_size)])
+        market: Dict[Tuple[str, bool], Tuple[str, MarketStats, bool]] = {}
+
+        def prepare(chunk: List[int]) -> Tuple[List[str], List[Tuple[int, MarketStats, DecisionRequest]], FrozenSet[int]]:
+            keys, rows, degraded, failed = [], [], set(), []
+            for i in chunk:
+                item = items[i]
+                key = (item.query, item.recency_weighted)
+                resolved = market.get(key)
+                if resolved is None:
+                    try:
+                        card_key, stats, stale = self.resolve(item.query)
+                    except ProviderUnavailable as exc:
+                        # shed with nothing cached: this item fails, the job goes on
+                        failed.append((i, json.dumps({"error": f"comps unavailable: {exc}"})))
+                        continue
+                    if item.recency_weighted and self.recency is not None:
+                        stats = self.recency(card_key, stats)
+                    resolved = market[key] = (card_key, stats, stale)
+                keys.append(resolved[0])
+                rows.append((i, resolved[1], item))
+                if resolved[2]:
+                    degraded.add(i)
+            if failed:
+                self._save(job_id, [None] * len(failed), failed)
+            return keys, rows, frozenset(degraded)
+
+        def stopped() -> bool:
+            return self._stopping.is_set() or self._is_cancelled(job_id)
+
+        executor = self._executor
+        if executor is None:
+            for chunk in chunks:
+                if stopped():
+                    return
+                keys, rows, degraded = prepare(chunk)
+                self._save(job_id, keys, evaluate_chunk(fees, self.mode, rows, degraded))
+        else:
+            in_flight: Dict[Future, List[str]] = {}
+
+            def fill() -> None:
+                while len(in_flight) < 2 * self.workers and not stopped():
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        return
+                    keys, rows, degraded = prepare(chunk)
+                    in_flight[executor.submit(evaluate_chunk, fees, self.mode, rows, degraded)] = keys
+
+            fill()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    self._save(job_id, in_flight.pop(fut), fut.result())
+                if stopped():
+                    for fut in in_flight:
+                        fut.cancel()
+                    for fut in wait(in_flight).done:
+                        if not fut.cancelled() and fut.exception() is None:
+                            self._save(job_id, in_flight[fut], fut.result())
+                    return
+                fill()
+        if not stopped():
+            self._finish(job_id, "done")
+
+    def _save(self, job_id: str, keys: List[Optional[str]], results: List[Tuple[int, str]]) -> None:
+        with db.connection() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO job_results(job_id, idx, card_key, response_json) VALUES(?,?,?,?)",
+                [(job_id, idx, key, body) for key, (idx, body) in zip(keys, results)],
+            )
+            conn.execute(
+                "UPDATE jobs SET done = done + ?, updated_at_utc = ? WHERE id = ?", (len(results), now_utc(), job_id)
+            )
+
+    def _finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        with db.connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at_utc = ? WHERE id = ? AND status IN ('queued', 'running')",
+                (status, error, now_utc(), job_id),
+            )
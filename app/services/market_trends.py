@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Sequence, Set
+
+from app.data import sold_comps
+from app.engine.market import MarketSummary
+from app.engine.schemas import MarketStats, MarketTrend
+from app.engine.trend import RollingWindows, momentum
+
+def _stats(summary: Optional[MarketSummary], currency: str = "USD") -> Optional[MarketStats]:
+    if summary is None:
+        return None
+    return MarketStats.model_construct(
+        p25=summary.p25,
+        median=summary.median,
+        p75=summary.p75,
+        comps_count=summary.count,
+        spread_ratio=float(summary.spread_ratio),
+        confidence=summary.confidence,
+        currency=currency,
+    )
+
+class _Card:
+    __slots__ = ("windows", "last_id", "stale")
+
+    def __init__(self, windows: RollingWindows) -> None:
+        self.windows = windows
+        self.last_id = 0
+        self.stale = True
+
+class TrendTracker:
+    """Rolling-window market stats per card over the sold_comps history.
+
+    A card's windows are loaded from SQLite on first use (only the longest
+    window's worth of sales) and after that only move forward: sales the
+    comps cache appends are pulled by row id when it reports the card
+    (`notify`, subscribed to the cache), and each read advances the windows
+    to the clock, expiring old sales one by one. Nothing is re-sorted or
+    re-scanned per request. Cards are kept in a bounded LRU.
+    """
+
+    def __init__(
+        self,
+        windows: Sequence[float] = (7, 30, 90),
+        half_life_days: float = 7.0,
+        max_cards: int = 4096,
+        clock: Callable[[], datetime] = lambda: datetime.now(timezone.utc),
+    ) -> None:
+        if max_cards < 1:
+            raise ValueError("max_cards must be >= 1")
+        self.windows = sorted(set(float(d) for d in windows))
+        self.half_life_days = half_life_days
+        self.max_cards = max_cards
+        self._clock = clock
+        self._cards: "OrderedDict[str, _Card]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def notify(self, card_key: str) -> None:
+        """New sales were stored for `card_key`; pull them on its next read."""
+        with self._lock:
+            card = self._cards.get(card_key)
+            if card is not None:
+                card.stale = True
+
+    def tracked(self) -> Set[str]:
+        with self._lock:
+            return set(self._cards)
+
+    def _card(self, card_key: str, now: datetime) -> _Card:
+        # callers hold self._lock
+        card = self._cards.get(card_key)
+        if card is not None and now.isoformat() < card.windows.now:
+            card = None  # the clock went back: start over from the table
+        if card is None:
+            card = _Card(RollingWindows(self.windows, self.half_life_days))
+            self._cards[card_key] = card
+            while len(self._cards) > self.max_cards:
+                self._cards.popitem(last=False)
+        self._cards.move_to_end(card_key)
+        if card.stale:
+            since = (now - timedelta(days=self.windows[-1])).isoformat() if card.last_id == 0 else ""
+            for row_id, sold_date, cents in sold_comps.rows_after(card_key, card.last_id, since):
+                card.windows.add(sold_date, int(cents))
+                card.last_id = row_id
+            card.stale = False
+        card.windows.advance(now)
+        return card
+
+    def window_stats(self, card_key: str, days: float, now: Optional[datetime] = None) -> Optional[MarketStats]:
+        """Stats over the trailing `days` (one of `windows`), or None if no sales fall in it."""
+        if float(days) not in self.windows:
+            raise KeyError(days)
+        with self._lock:
+            return _stats(self._card(card_key, now or self._clock()).windows.summary(float(days)))
+
+    def trend(self, card_key: str, now: Optional[datetime] = None) -> MarketTrend:
+        with self._lock:
+            windows = self._card(card_key, now or self._clock()).windows
+            stats = {f"{d:g}": _stats(windows.summary(d)) for d in self.windows}
+            ew = windows.ew_median()
+        longest = stats[f"{self.windows[-1]:g}"]
+        return MarketTrend(
+            card_key=card_key,
+            windows=stats,
+            half_life_days=self.half_life_days,
+            ew_median=ew,
+            momentum=None if ew is None or longest is None else momentum(ew, longest.median),
+        )
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"cards": len(self._cards), "max_cards": self.max_cards}
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally, deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds: 50µs .. 10s.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for lv, v in items:
+            out.append(f"{self.name}{_fmt_labels(self.labels, lv)} {v:g}")
+        return out
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        # per label tuple: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[label_values] = series
+            series[0][i] += 1
+            series[1][0] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        out = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((lv, (list(c), s[0])) for lv, (c, s) in self._series.items())
+        for lv, (counts, total) in items:
+            acc = 0
+            for bound, c in zip(self.buckets, counts):
+                acc += c
+                le = 'le="%g"' % bound
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labels, lv, le)} {acc}")
+            acc += counts[-1]
+            le = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_fmt_labels(self.labels, lv, le)} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labels, lv)} {total:.9g}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labels, lv)} {acc}")
+        return out
+
+class Registry:
+    """Metrics plus pull-style gauges for components that keep their own stats."""
+
+    def __init__(self) -> None:
+        self._metrics: List = []
+        self._gauges: List[Tuple[str, str, Callable[[], Dict[str, float]], FrozenSet[str]]] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        m = Counter(name, help, labels)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        m = Histogram(name, help, labels, buckets)
+        self._metrics.append(m)
+        return m
+
+    def gauges(
+        self, prefix: str, help: str, collect: Callable[[], Dict[str, float]], counters: Iterable[str] = ()
+    ) -> None:
+        """Expose every numeric entry of `collect()` as `<prefix>_<key>`.
+
+        Keys in `counters` are cumulative and become counters named
+        `<prefix>_<key>_total`; the rest are gauges. `help` names the
+        component; each series gets "<help>: <key>" as its HELP.
+        """
+        self._gauges.append((prefix, help, collect, frozenset(counters)))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        for prefix, help, collect, counters in self._gauges:
+            try:
+                values = collect()
+            except Exception:
+                continue
+            for key, v in sorted(values.items()):
+                if isinstance(v, bool) or not isinstance(v, (int, float)):
+                    continue
+                kind = "counter" if key in counters else "gauge"
+                name = f"{prefix}_{key}_total" if kind == "counter" else f"{prefix}_{key}"
+                lines.append(f"# HELP {name} {help}: {key.replace('_', ' ')}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.append(f"{name} {v:g}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram("cardking_stage_seconds", "Time spent per pipeline stage.", labels=("stage",))
+REQUEST_SECONDS = REGISTRY.histogram("cardking_request_seconds", "HTTP request latency.", labels=("path",))
+REQUESTS_TOTAL = REGISTRY.counter("cardking_requests_total", "HTTP requests by endpoint and status.", labels=("path", "method", "status"))
+DB_WAIT_SECONDS = REGISTRY.histogram("cardking_db_wait_seconds", "Time waiting for a pooled database connection.")
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - t0, name)
+
+# Floors for configure(): faster sampling or a lower slow threshold turns the
+# profiler into a measurable load of its own.
+PROFILER_MIN_INTERVAL_MS = 5.0
+PROFILER_MIN_SLOW_MS = 10.0
+
+class SamplingProfiler:
+    """Low-rate stack sampler that keeps stacks for slow requests.
+
+    While enabled, a background thread snapshots every thread's stack each
+    `interval_ms`. When a request takes longer than `slow_ms`, the samples
+    taken during it are folded ("a;b;c count") and kept in a small ring of
+    captures. Disabled by default; costs nothing when off.
+    """
+
+    def __init__(self, max_samples: int = 20000, max_captures: int = 20) -> None:
+        self.enabled = False
+        self.interval = 0.005
+        self.slow_seconds = 0.25
+        self._samples: Deque[Tuple[float, int, str]] = deque(maxlen=max_samples)
+        self._captures: Deque[Dict] = deque(maxlen=max_captures)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def configure(self, enabled: bool, interval_ms: Optional[float] = None, slow_ms: Optional[float] = None) -> Dict:
+        if interval_ms is not None:
+            self.interval = max(PROFILER_MIN_INTERVAL_MS, interval_ms) / 1000.0
+        if slow_ms is not None:
+            self.slow_seconds = max(PROFILER_MIN_SLOW_MS, slow_ms) / 1000.0
+        with self._lock:
+            if enabled and not self.enabled:
+                self._stop = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(self._stop,), name="sampling-profiler", daemon=True)
+                self._thread.start()
+            elif not enabled and self.enabled:
+                self._stop.set()
+            self.enabled = enabled
+        return self.status()
+
+    def status(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "interval_ms": self.interval * 1000.0,
+            "slow_ms": self.slow_seconds * 1000.0,
+            "captures": len(self._captures),
+        }
+
+    def _run(self, stop: threading.Event) -> None:
+        me = threading.get_ident()
+        while not stop.wait(self.interval):
+            now = time.perf_counter()
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                stack = []
+                f = frame
+                while f is not None and len(stack) < 64:
+                    code = f.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{f.f_lineno})")
+                    f = f.f_back
+                self._samples.append((now, tid, ";".join(reversed(stack))))
+
+    def request_finished(self, path: str, started: float, elapsed: float) -> None:
+        if not self.enabled or elapsed < self.slow_seconds:
+            return
+        end = started + elapsed
+        folded = _Tally(s for ts, _, s in list(self._samples) if started <= ts <= end)
+        self._captures.append({
+            "path": path,
+            "elapsed_ms": elapsed * 1000.0,
+            "samples": sum(folded.values()),
+            "stacks": dict(folded.most_common(50)),
+        })
+
+    def captures(self) -> List[Dict]:
+        return list(self._captures)
+
+PROFILER = SamplingProfiler()
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from pydantic import ValidationError
+
+from app.data import portfolio
+from app.data.log_writer import now_utc
+from app.engine.fees import FeeSchedule
+from app.engine.schemas import DecisionRequest, MarketStats, PortfolioItem
+from app.services.jobs import evaluate_chunk
+from app.services.metrics import stage
+
+# query -> (card_key, market stats, comps snapshot id)
+SnapshotResolver = Callable[[str], Tuple[str, MarketStats, str]]
+
+# (row_key, item) or (row_key, error message) for rows that didn't parse
+ParsedRow = Tuple[str, Union[PortfolioItem, str]]
+
+_METRICS = ("centering", "corners", "edges", "surface", "issue_flag")
+_FALSE = {"", "0", "false", "no", "n"}
+
+def _item(raw: Dict[str, Any]) -> PortfolioItem:
+    if "metrics" not in raw:
+        raw = {**raw, "metrics": {k: raw[k] for k in _METRICS if raw.get(k) not in (None, "")}}
+    metrics = raw["metrics"]
+    if isinstance(metrics.get("issue_flag"), str):
+        metrics = {**metrics, "issue_flag": metrics["issue_flag"].strip().lower() not in _FALSE}
+        raw = {**raw, "metrics": metrics}
+    if raw.get("purchase_price") == "":
+        raw = {**raw, "purchase_price": None}
+    return PortfolioItem.model_validate(raw)
+
+def _parsed(number: int, raw: Any) -> ParsedRow:
+    try:
+        if not isinstance(raw, dict):
+            raise ValueError("row is not an object")
+        item = _item(raw)
+    except (ValidationError, ValueError, KeyError) as exc:
+        row_id = raw.get("id") if isinstance(raw, dict) else None
+        return str(row_id or number), str(exc).splitlines()[0]
+    return item.id or str(number), item
+
+def parse_csv(lines: Iterable[str]) -> Iterator[ParsedRow]:
+    """Rows of a CSV with a header (id, query, centering, corners, edges, surface, issue_flag, purchase_price).
+
+    Rows without an `id` are keyed by their 1-based row number.
+    """
+    for number, raw in enumerate(csv.DictReader(lines), start=1):
+        yield _parsed(number, raw)
+
+def parse_ndjson(lines: Iterable[str]) -> Iterator[ParsedRow]:
+    """One JSON object per line, with the CSV columns as keys or metrics nested under "metrics"."""
+    number = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            raw = json.loads(line)
+        except ValueError as exc:
+            yield str(number), f"invalid JSON: {exc}"
+            continue
+        yield _parsed(number, raw)
+
+def stored_items(portfolio_id: str) -> Iterator[ParsedRow]:
+    """The persisted rows of a portfolio, for re-evaluation without an upload."""
+    for row in portfolio.iter_rows(portfolio_id):
+        cents = row["purchase_price_cents"]
+        yield str(row["row_key"]), PortfolioItem(
+            id=str(row["row_key"]),
+            query=str(row["query"]),
+            metrics={k: row[k] for k in _METRICS},
+            purchase_price=None if cents is None else Decimal(int(cents)).scaleb(-2),  # type: ignore[arg-type]
+        )
+
+def fingerprint(card_key: str, snapshot: str, fee_version: str, item: PortfolioItem) -> str:
+    """Hash of every input the stored decision depends on."""
+    m = item.metrics
+    raw = f"{card_key}|{snapshot}|{fee_version}|{m.centering!r}|{m.corners!r}|{m.edges!r}|{m.surface!r}|{int(m.issue_flag)}"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).hexdigest()
+
+class PortfolioEvaluator:
+    """Streams a portfolio through `decide`, persisting rows and recomputing only what changed.
+
+    Rows are handled in batches of `batch_size`: each batch resolves comps
+    (memoized per query, bounded), looks up the stored fingerprints in one
+    query, decides only rows whose fingerprint differs, upserts the batch in
+    one transaction and yields its NDJSON lines. Unchanged rows reuse their
+    stored response bytes, so memory is bounded by the batch, not the file.
+    """
+
+    def __init__(self, resolve: SnapshotResolver, fees: Callable[[], FeeSchedule], mode: str = "decimal",
+                 batch_size: int = 256, memo_size: int = 4096) -> None:
+        self.resolve = resolve
+        self.fees = fees
+        self.mode = mode
+        self.batch_size = batch_size
+        self.memo_size = memo_size
+
+    def run(self, portfolio_id: str, rows: Iterable[ParsedRow], import_id: Optional[str] = None,
+            replace: bool = False) -> Iterator[bytes]:
+        """NDJSON lines, one per row, then a {"summary": ...} line.
+
+        With `replace`, rows of the portfolio that this run didn't touch are
+        deleted at the end (a full re-upload of the spreadsheet). Rows that
+        are in the upload but fail to parse or resolve keep their stored
+        version.
+        """
+        fees = self.fees()
+        import_id = import_id or now_utc()
+        memo: Dict[str, Tuple[str, MarketStats, str]] = {}
+        counts = {"rows": 0, "recomputed": 0, "unchanged": 0, "errors": 0, "removed": 0}
+        it = iter(rows)
+        while True:
+            batch = list(islice(it, self.batch_size))
+            if not batch:
+                break
+            with stage("portfolio_batch"):
+                out = self._batch(portfolio_id, import_id, batch, fees, memo, counts)
+            if len(memo) > self.memo_size:
+                memo.clear()
+            yield out
+        if replace:
+            counts["removed"] = portfolio.delete_except(portfolio_id, import_id)
+        yield (json.dumps({"summary": counts}) + "\n").encode("utf-8")
+
+    def _batch(self, portfolio_id: str, import_id: str, batch: List[ParsedRow], fees: FeeSchedule,
+               memo: Dict[str, Tuple[str, MarketStats, str]], counts: Dict[str, int]) -> bytes:
+        # output stays in input order: error lines go straight into their slot
+        lines: List[bytes] = [b""] * len(batch)
+        resolved: List[Tuple[int, str, PortfolioItem, str, MarketStats, str]] = []
+        failed: List[str] = []
+        for pos, (row_key, item) in enumerate(batch):
+            counts["rows"] += 1
+            if isinstance(item, str):
+                counts["errors"] += 1
+                failed.append(row_key)
+                lines[pos] = b'{"row":%s,"error":%s}\n' % (_j(row_key), _j(item))
+                continue
+            hit = memo.get(item.query)
+            if hit is None:
+                try:
+                    hit = memo[item.query] = self.resolve(item.query)
+                except Exception as exc:
+                    counts["errors"] += 1
+                    failed.append(row_key)
+                    lines[pos] = b'{"row":%s,"error":%s}\n' % (_j(row_key), _j(f"comps unavailable: {exc}"))
+                    continue
+            card_key, stats, snapshot = hit
+            resolved.append((pos, row_key, item, card_key, stats, fingerprint(card_key, snapshot, fees.version, item)))
+
+        # the same row_key twice in one batch: the later row wins, as it would across batches
+        previous = portfolio.stored(portfolio_id, list({r[1] for r in resolved}))
+        todo = [
+            (i, r[4], DecisionRequest(query=r[2].query, metrics=r[2].metrics))
+            for i, r in enumerate(resolved)
+            if previous.get(r[1], (None, None))[0] != r[5] or previous[r[1]][1] is None
+        ]
+        bodies: Dict[int, str] = dict(evaluate_chunk(fees, self.mode, todo)) if todo else {}
+        counts["recomputed"] += len(bodies)
+        counts["unchanged"] += len(resolved) - len(bodies)
+
+        now = now_utc()
+        upserts = []
+        for i, (pos, row_key, item, card_key, _, fp) in enumerate(resolved):
+            changed = i in bodies
+            body = bodies[i] if changed else previous[row_key][1]
+            m = item.metrics
+            cents = None if item.purchase_price is None else int(item.purchase_price * 100)
+            upserts.append((portfolio_id, row_key, item.query, m.centering, m.corners, m.edges, m.surface,
+                            int(m.issue_flag), cents, card_key, fp, body, now, import_id))
+            purchase = b"null" if item.purchase_price is None else b'"%s"' % str(item.purchase_price).encode("ascii")
+            lines[pos] = b'{"row":%s,"card_key":%s,"changed":%s,"purchase_price":%s,"result":%s}\n' % (
+                _j(row_key), _j(card_key), b"true" if changed else b"false", purchase, str(body).encode("utf-8"))
+        if upserts:
+            portfolio.upsert(upserts)
+        if failed:
+            # still part of this upload: a replace must not delete them over a transient error
+            portfolio.touch(portfolio_id, failed, import_id)
+        return b"".join(lines)
+
+def _j(value: Any) -> bytes:
+    return json.dumps(value).encode("utf-8")
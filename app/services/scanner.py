@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from decimal import ROUND_FLOOR, Decimal, InvalidOperation
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, TextIO
+
+from pydantic import ValidationError
+
+from app.data import db
+from app.data.log_writer import now_utc
+from app.engine.decision import decide, decide_fixed
+from app.engine.fees import FeeSchedule
+from app.engine.identity import stable_card_key
+from app.engine.schemas import ConditionMetrics, MarketStats
+from app.services.evaluation import decision_response, grade_probs_for, response_body
+from app.services.portfolio_import import SnapshotResolver
+
+# Listings rarely say anything about condition; candidates are decided as if
+# the card were a typical raw copy unless the feed supplies metrics.
+DEFAULT_METRICS = ConditionMetrics(centering=8.0, corners=8.0, edges=8.0, surface=8.0)
+
+_COLUMNS = (
+    "card_key, query, max_buy_cents, p25_cents, median_cents, p75_cents, comps_count, currency,"
+    " fee_version, snapshot"
+)
+SQL_UPSERT_BUY_THRESHOLD = (
+    f"INSERT OR REPLACE INTO buy_thresholds({_COLUMNS}, updated_at_utc) VALUES(?,?,?,?,?,?,?,?,?,?,?)"
+)
+
+@dataclass(frozen=True)
+class Threshold:
+    card_key: str
+    query: str
+    max_buy_cents: Optional[int]  # None: decide can't return BUY for this card
+    p25_cents: int
+    median_cents: int
+    p75_cents: int
+    comps_count: int
+    currency: str
+    fee_version: str
+    snapshot: str
+
+    def stats(self) -> MarketStats:
+        """The market inputs `decide` needs (spread/confidence are recomputed there)."""
+        return MarketStats(
+            p25=Decimal(self.p25_cents).scaleb(-2),
+            median=Decimal(self.median_cents).scaleb(-2),
+            p75=Decimal(self.p75_cents).scaleb(-2),
+            comps_count=self.comps_count,
+            spread_ratio=0.0,
+            confidence=0,
+            currency=self.currency,
+        )
+
+def _cents(x: Decimal) -> int:
+    return int(Decimal(str(x)).scaleb(2))
+
+def max_buy_cents(p25: Decimal, comps_count: int, fees: FeeSchedule) -> Optional[int]:
+    """Highest listed price, in cents, at which `decide` returns BUY; None if it never does.
+
+    decide returns BUY iff the card passes the comps gate (which also makes
+    its risk at least Medium) and listed_price <= p25 * buy_price_factor.
+    For whole-cent prices that is listed_cents <= floor(p25 * factor * 100).
+    """
+    if comps_count < max(3, fees.min_comps_count // 2):
+        return None
+    return int((Decimal(str(p25)) * fees.buy_price_factor).scaleb(2).to_integral_value(ROUND_FLOOR))
+
+def build_threshold(card_key: str, query: str, stats: MarketStats, snapshot: str, fees: FeeSchedule) -> Threshold:
+    return Threshold(
+        card_key=card_key,
+        query=query,
+        max_buy_cents=max_buy_cents(stats.p25, stats.comps_count, fees),
+        p25_cents=_cents(stats.p25),
+        median_cents=_cents(stats.median),
+        p75_cents=_cents(stats.p75),
+        comps_count=stats.comps_count,
+        currency=stats.currency,
+        fee_version=fees.version,
+        snapshot=snapshot,
+    )
+
+class ThresholdTable:
+    """card_key -> Threshold for the watched cards, in memory and in buy_thresholds.
+
+    `mark_dirty` (subscribed to the comps cache) flags cards whose comps
+    were refetched; `refresh` re-resolves those and, when the fee schedule
+    version changed, recomputes every threshold from its stored snapshot.
+    Lookups are a dict get.
+    """
+
+    def __init__(self, resolve: SnapshotResolver, fees: Callable[[], FeeSchedule]) -> None:
+        self.resolve = resolve
+        self.fees = fees
+        self._by_key: Dict[str, Threshold] = {}
+        self._dirty: Set[str] = set()
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self) -> None:
+        with db.connection() as conn:
+            rows = conn.execute(f"SELECT {_COLUMNS} FROM buy_thresholds").fetchall()
+        with self._lock:
+            self._by_key = {r[0]: Threshold(*r) for r in rows}
+            self._loaded = True
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def _store(self, thresholds: List[Threshold]) -> None:
+        now = now_utc()
+        with db.connection() as conn:
+            conn.executemany(
+                SQL_UPSERT_BUY_THRESHOLD,
+                [(t.card_key, t.query, t.max_buy_cents, t.p25_cents, t.median_cents, t.p75_cents,
+                  t.comps_count, t.currency, t.fee_version, t.snapshot, now) for t in thresholds],
+            )
+        with self._lock:
+            for t in thresholds:
+                self._by_key[t.card_key] = t
+
+    def watch(self, queries: Iterable[str]) -> List[Threshold]:
+        """Start tracking cards (or refresh them if already tracked)."""
+        self._ensure_loaded()
+        fees = self.fees()
+        out = []
+        for q in queries:
+            card_key, stats, snapshot = self.resolve(q)
+            out.append(build_threshold(card_key, q, stats, snapshot, fees))
+        self._store(out)
+        return out
+
+    def unwatch(self, card_key: str) -> bool:
+        self._ensure_loaded()
+        with db.connection() as conn:
+            conn.execute("DELETE FROM buy_thresholds WHERE card_key = ?", (card_key,))
+        with self._lock:
+            self._dirty.discard(card_key)
+            return self._by_key.pop(card_key, None) is not None
+
+    def mark_dirty(self, card_key: str) -> None:
+        with self._lock:
+            if card_key in self._by_key:
+                self._dirty.add(card_key)
+
+    def refresh(self) -> int:
+        """Recompute stale thresholds; returns how many changed."""
+        self._ensure_loaded()
+        fees = self.fees()
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            stale_fees = [t for t in self._by_key.values() if t.fee_version != fees.version and t.card_key not in dirty]
+            queries = [self._by_key[k].query for k in dirty if k in self._by_key]
+        updated = [
+            build_threshold(t.card_key, t.query, t.stats(), t.snapshot, fees) for t in stale_fees
+        ]
+        for q in queries:
+            card_key, stats, snapshot = self.resolve(q)
+            updated.append(build_threshold(card_key, q, stats, snapshot, fees))
+        if updated:
+            self._store(updated)
+        return len(updated)
+
+    def get(self, card_key: str) -> Optional[Threshold]:
+        return self._by_key.get(card_key)
+
+    def all(self) -> List[Threshold]:
+        self._ensure_loaded()
+        with self._lock:
+            return sorted(self._by_key.values(), key=lambda t: t.card_key)
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+@dataclass(frozen=True)
+class Listing:
+    listing_id: str
+    price_cents: int
+    card_key: Optional[str] = None
+    title: Optional[str] = None
+    metrics: Optional[ConditionMetrics] = None
+
+def _listing(raw: Dict[str, object]) -> Optional[Listing]:
+    """Listing from a parsed feed row; None without a positive whole-cent price."""
+    try:
+        cents = Decimal(str(raw["price"])).scaleb(2)
+        if not cents.is_finite() or not cents > 0 or cents != cents.to_integral_value():
+            return None
+        metrics = raw.get("metrics")
+        return Listing(
+            listing_id=str(raw.get("listing_id") or raw.get("id") or ""),
+            price_cents=int(cents),
+            card_key=str(raw["card_key"]) if raw.get("card_key") else None,
+            title=str(raw.get("title") or raw.get("query") or "") or None,
+            metrics=ConditionMetrics.model_validate(metrics) if isinstance(metrics, dict) else None,
+        )
+    except (KeyError, InvalidOperation, ValidationError):
+        return None
+
+def read_ndjson(lines: Iterable[str]) -> Iterator[Listing]:
+    """Listings from NDJSON ({"listing_id", "price", "card_key" or "title", optional "metrics"}); bad lines are skipped."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            raw = json.loads(line)
+        except ValueError:
+            continue
+        listing = _listing(raw) if isinstance(raw, dict) else None
+        if listing is not None:
+            yield listing
+
+def read_csv(lines: Iterable[str]) -> Iterator[Listing]:
+    """Listings from CSV with listing_id, price and card_key or title columns."""
+    for raw in csv.DictReader(lines):
+        listing = _listing(raw)
+        if listing is not None:
+            yield listing
+
+class Scanner:
+    """Matches listings against a ThresholdTable and fully decides only the candidates.
+
+    Per listing the hot path is one key lookup (the feed's card_key, or the
+    title mapped through `key_for`, memoized) and one integer comparison.
+    Candidates go through `decide` on the threshold's market snapshot and
+    are reported when it says BUY. The table is refreshed every
+    `refresh_seconds`, so comps refetches and fee changes reach a running scan.
+    """
+
+    def __init__(
+        self,
+        table: ThresholdTable,
+        fees: Callable[[], FeeSchedule],
+        key_for: Callable[[str], str] = stable_card_key,
+        mode: str = "decimal",
+        default_metrics: ConditionMetrics = DEFAULT_METRICS,
+        refresh_seconds: float = 5.0,
+        memo_size: int = 100_000,
+    ) -> None:
+        self.table = table
+        self.fees = fees
+        self.key_for = key_for
+        self._decide = decide_fixed if mode == "fixed" else decide
+        self.default_metrics = default_metrics
+        self.refresh_seconds = refresh_seconds
+        self.memo_size = memo_size
+        self._keys: Dict[str, str] = {}
+        self.counters: Dict[str, int] = {"scanned": 0, "matched": 0, "candidates": 0, "buys": 0}
+
+    def _key(self, listing: Listing) -> Optional[str]:
+        if listing.card_key:
+            return listing.card_key
+        if not listing.title:
+            return None
+        key = self._keys.get(listing.title)
+        if key is None:
+            if len(self._keys) >= self.memo_size:
+                self._keys.clear()
+            key = self._keys[listing.title] = self.key_for(listing.title)
+        return key
+
+    def scan(self, listings: Iterable[Listing]) -> Iterator[Dict[str, object]]:
+        """Yield one hit per listing that `decide` would BUY."""
+        self.table.refresh()
+        fees = self.fees()
+        next_refresh = time.monotonic() + self.refresh_seconds
+        counters = self.counters
+        for n, listing in enumerate(listings, start=1):
+            if n % 1024 == 0 and time.monotonic() >= next_refresh:
+                self.table.refresh()
+                fees = self.fees()
+                next_refresh = time.monotonic() + self.refresh_seconds
+            counters["scanned"] += 1
+            key = self._key(listing)
+            t = self.table.get(key) if key is not None else None
+            if t is None:
+                continue
+            counters["matched"] += 1
+            if t.max_buy_cents is None or listing.price_cents > t.max_buy_cents:
+                continue
+            counters["candidates"] += 1
+            hit = self._evaluate(listing, t, fees)
+            if hit is not None:
+                counters["buys"] += 1
+                yield hit
+
+    def _evaluate(self, listing: Listing, t: Threshold, fees: FeeSchedule) -> Optional[Dict[str, object]]:
+        stats = t.stats()
+        price = Decimal(listing.price_cents).scaleb(-2)
+        probs = grade_probs_for(listing.metrics or self.default_metrics)
+        res = self._decide(
+            market_p25=stats.p25,
+            market_median=stats.median,
+            market_p75=stats.p75,
+            comps_count=t.comps_count,
+            grade_probs=probs,
+            fees=fees,
+            listed_price=price,
+        )
+        if res.decision != "BUY":
+            return None
+        return {
+            "listing_id": listing.listing_id,
+            "card_key": t.card_key,
+            "query": t.query,
+            "price": str(price),
+            "max_buy_price": str(Decimal(t.max_buy_cents).scaleb(-2)),
+            "decision": json.loads(response_body(decision_response(res, stats, probs))),
+        }
+
+def main(argv: Optional[List[str]] = None, stdin: Optional[TextIO] = None, stdout: Optional[TextIO] = None) -> int:
+    ap = argparse.ArgumentParser(description="Scan a listing feed for BUYs against the watched cards.")
+    ap.add_argument("--feed", default="-", help="NDJSON/CSV listing file, or - for stdin (default)")
+    ap.add_argument("--format", choices=("ndjson", "csv"), help="feed format (default: from the file extension, else ndjson)")
+    ap.add_argument("--watch", help="file with one card query per line to add to the watchlist first")
+    args = ap.parse_args(argv)
+
+    # the API module owns the comps cache, fee loader and card identification
+    from app.api import routes
+
+    table = routes.buy_thresholds
+    if args.watch:
+        with open(args.watch, encoding="utf-8") as f:
+            table.watch([line.strip() for line in f if line.strip()])
+    fmt = args.format or ("csv" if args.feed.endswith(".csv") else "ndjson")
+    reader = read_csv if fmt == "csv" else read_ndjson
+    out = stdout or sys.stdout
+    scanner = routes.listing_scanner()
+    started = time.perf_counter()
+    feed = (stdin or sys.stdin) if args.feed == "-" else open(args.feed, encoding="utf-8", newline="")
+    try:
+        for hit in scanner.scan(reader(feed)):
+            out.write(json.dumps(hit) + "\n")
+            out.flush()
+    finally:
+        if feed is not stdin and feed is not sys.stdin:
+            feed.close()
+    elapsed = time.perf_counter() - started
+    c = scanner.counters
+    print(
+        f"scanned {c['scanned']} listings in {elapsed:.2f}s ({c['scanned'] / elapsed if elapsed else 0:.0f}/s):"
+        f" {c['matched']} matched, {c['candidates']} candidates, {c['buys']} buys",
+        file=sys.stderr,
+    )
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
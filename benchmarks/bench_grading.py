@@ -0,0 +1,58 @@
+"""Grade-probability throughput: scalar loop vs NumPy batch vs lookup table.
+
+    python -m benchmarks.bench_grading --rows 100000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from app.engine.grading import grade_probabilities
+from app.engine.grading_batch import grade_probabilities_batch, grade_table
+
+def _inputs(rows: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    cols = [rng.integers(0, 101, rows) / 10.0 for _ in range(4)]
+    issue = rng.random(rows) < 0.1
+    return cols, issue
+
+def run(rows: int) -> dict:
+    cols, issue = _inputs(rows)
+
+    t0 = time.perf_counter()
+    for c, co, e, s, f in zip(*(x.tolist() for x in cols), issue.tolist()):
+        grade_probabilities(c, co, e, s, f)
+    scalar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    grade_probabilities_batch(*cols, issue)
+    batch = time.perf_counter() - t0
+
+    table = grade_table()  # built outside the timed region
+    t0 = time.perf_counter()
+    table.lookup(*cols, issue)
+    lookup = time.perf_counter() - t0
+
+    return {
+        "rows": rows,
+        "scalar_s": scalar,
+        "batch_s": batch,
+        "table_s": lookup,
+        "batch_speedup": scalar / batch,
+        "table_speedup": scalar / lookup,
+    }
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__)
+    ap.add_argument("--rows", type=int, default=100_000)
+    args = ap.parse_args()
+    r = run(args.rows)
+    print(f"rows={r['rows']}")
+    print(f"scalar  {r['scalar_s'] * 1000:9.1f} ms")
+    print(f"batch   {r['batch_s'] * 1000:9.1f} ms  ({r['batch_speedup']:.0f}x)")
+    print(f"table   {r['table_s'] * 1000:9.1f} ms  ({r['table_speedup']:.0f}x)")
+
+if __name__ == "__main__":
+    main()
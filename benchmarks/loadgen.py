@@ -0,0 +1,286 @@
+"""Load test a Card King server with a skewed mix of identify, comps and decision calls.
+
+    uvicorn app.main:app --port 8000 &
+    python -m benchmarks.loadgen --url http://127.0.0.1:8000 --duration 30 --concurrency 32
+    python -m benchmarks.loadgen --serve --workers 2 --rate 300 --mix identify=1,comps=2,decision=6
+    CARDKING_COMPS_PROVIDER=fake CARDKING_FAKE_LATENCY_MS=120 CARDKING_FAKE_ERROR_RATE=0.02 \\
+        python -m benchmarks.loadgen --serve --cards 50000 --zipf 1.1 --out load.json
+
+Card popularity is Zipf-distributed over --cards synthetic queries, so a few
+cards take most of the traffic like on the real site. Without --rate,
+--concurrency clients send back to back (closed loop, finds the saturation
+throughput). With --rate, requests arrive as a Poisson stream at that rate
+and latency is measured from each request's scheduled start, so time spent
+queued behind a saturated server counts (open loop, no coordinated
+omission). Every --interval seconds a line reports throughput, errors and
+p50/p95/p99; the run ends with per-endpoint totals. --serve starts the app
+under uvicorn on a free local port with the current environment (e.g. the
+fake comps provider's CARDKING_FAKE_* settings). Everything stays on
+localhost.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from bisect import bisect_left
+from itertools import accumulate
+from random import Random
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.engine.identity import guess_category, stable_card_key
+
+ENDPOINTS = ("identify", "comps", "decision")
+
+_NAMES = ["Charizard", "Pikachu", "Blastoise", "Mewtwo", "Lugia", "Jordan", "Griffey", "Brady", "Ohtani", "Wembanyama"]
+_SETS = ["Base Set Holo", "Jungle", "Neo Genesis", "Fleer Rookie", "Topps Chrome", "Prizm Silver", "Upper Deck"]
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """'identify=1,comps=2,decision=6' -> relative weights per endpoint."""
+    mix: Dict[str, float] = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"unknown endpoint {name!r}; expected one of {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0 or min(mix.values()) < 0:
+        raise ValueError("mix needs at least one positive weight")
+    return mix
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    """Nearest-rank p50/p95/p99 in milliseconds (zeros when empty)."""
+    if not latencies:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0}
+    s = sorted(latencies)
+    at = lambda q: s[min(len(s) - 1, int(len(s) * q))] * 1000.0
+    return {"p50_ms": at(0.50), "p95_ms": at(0.95), "p99_ms": at(0.99)}
+
+class Workload:
+    """Seeded request generator: endpoint by `mix` weight, card by Zipf(`zipf`) rank over `cards` queries."""
+
+    def __init__(self, mix: Dict[str, float], cards: int = 10_000, zipf: float = 1.1, seed: int = 0) -> None:
+        if cards < 1:
+            raise ValueError("cards must be >= 1")
+        self.endpoints = list(mix)
+        self._endpoint_cum = list(accumulate(mix[e] for e in self.endpoints))
+        self._card_cum = list(accumulate(1.0 / (rank ** zipf) for rank in range(1, cards + 1)))
+        self._rng = Random(seed)
+
+    def pick_card(self) -> int:
+        return bisect_left(self._card_cum, self._rng.random() * self._card_cum[-1])
+
+    def pick_endpoint(self) -> str:
+        return self.endpoints[bisect_left(self._endpoint_cum, self._rng.random() * self._endpoint_cum[-1])]
+
+    def next(self) -> Tuple[str, str, Dict[str, Any]]:
+        """(endpoint, path, JSON body) of the next request."""
+        endpoint = self.pick_endpoint()
+        card = self.pick_card()
+        query = card_query(card)
+        if endpoint == "identify":
+            return endpoint, "/api/identify", {"query": query}
+        if endpoint == "comps":
+            identity = {"card_key": stable_card_key(query), "display_name": query, "category": guess_category(query)}
+            return endpoint, "/api/comps", {"identity": identity}
+        return endpoint, "/api/decision", {"query": query, "metrics": card_metrics(card, self._rng)}
+
+def card_query(rank: int) -> str:
+    return f"{1996 + rank % 28} {_NAMES[rank % len(_NAMES)]} {_SETS[rank % len(_SETS)]} #{rank}"
+
+def card_metrics(rank: int, rng: Random) -> Dict[str, Any]:
+    # a popular card is mostly asked about in the same condition; one in five asks is a different copy
+    r = Random(rank) if rng.random() < 0.8 else rng
+    grade = lambda: round(r.uniform(6.5, 10.0) * 2) / 2
+    return {"centering": grade(), "corners": grade(), "edges": grade(), "surface": grade(), "issue_flag": r.random() < 0.05}
+
+class Recorder:
+    """Latencies and failures, per reporting interval and for the whole run."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self._clock = clock
+        self.started = clock()
+        self._window_started = self.started
+        self._window: List[float] = []
+        self._window_errors = 0
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, int] = {}
+
+    def record(self, endpoint: str, seconds: float, status: Optional[int]) -> None:
+        ok = status is not None and status < 400
+        self.latencies.setdefault(endpoint, []).append(seconds)
+        self._window.append(seconds)
+        key = str(status) if status is not None else "transport_error"
+        self.statuses[key] = self.statuses.get(key, 0) + 1
+        if not ok:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            self._window_errors += 1
+
+    def interval(self) -> Dict[str, float]:
+        """Stats since the previous call; resets the window."""
+        now = self._clock()
+        span = max(now - self._window_started, 1e-9)
+        row = {"t_s": now - self.started, "rps": len(self._window) / span, "errors": self._window_errors, **percentiles(self._window)}
+        self._window, self._window_errors, self._window_started = [], 0, now
+        return row
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = max(self._clock() - self.started, 1e-9)
+        endpoints = {}
+        for name, lat in sorted(self.latencies.items()):
+            endpoints[name] = {"requests": len(lat), "errors": self.errors.get(name, 0), "rps": len(lat) / elapsed, **percentiles(lat)}
+        everything = [x for lat in self.latencies.values() for x in lat]
+        total = {"requests": len(everything), "errors": sum(self.errors.values()), "rps": len(everything) / elapsed, **percentiles(everything)}
+        return {"elapsed_s": elapsed, "total": total, "endpoints": endpoints, "statuses": dict(sorted(self.statuses.items()))}
+
+async def _send(client: httpx.AsyncClient, recorder: Recorder, request: Tuple[str, str, Dict[str, Any]], started: float) -> None:
+    endpoint, path, body = request
+    try:
+        status: Optional[int] = (await client.post(path, json=body)).status_code
+    except httpx.HTTPError:
+        status = None
+    recorder.record(endpoint, time.perf_counter() - started, status)
+
+async def run_load(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    duration: float,
+    concurrency: int = 32,
+    rate: Optional[float] = None,
+    interval: float = 5.0,
+    report: Callable[[Dict[str, float]], None] = lambda row: None,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """Drive `client` for `duration` seconds; `report` gets a row every `interval`, the result is the run summary."""
+    recorder = Recorder()
+    deadline = recorder.started + duration
+
+    async def reporter() -> None:
+        while True:
+            await asyncio.sleep(interval)
+            report(recorder.interval())
+
+    async def closed_loop() -> None:
+        while time.perf_counter() < deadline:
+            await _send(client, recorder, workload.next(), time.perf_counter())
+
+    async def open_loop() -> None:
+        gate = asyncio.Semaphore(concurrency)
+        arrivals = Random(seed + 1)
+        tasks = set()
+        scheduled = time.perf_counter()
+
+        async def one(request: Tuple[str, str, Dict[str, Any]], at: float) -> None:
+            async with gate:
+                await _send(client, recorder, request, at)
+
+        while scheduled < deadline:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            task = asyncio.ensure_future(one(workload.next(), scheduled))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            scheduled += arrivals.expovariate(rate)
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    ticker = asyncio.ensure_future(reporter())
+    try:
+        if rate:
+            await open_loop()
+        else:
+            await asyncio.gather(*(closed_loop() for _ in range(concurrency)))
+    finally:
+        ticker.cancel()
+    tail = recorder.interval()
+    if tail["t_s"] % interval >= interval / 10:  # skip a sliver of a last interval
+        report(tail)
+    return recorder.summary()
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def serve(workers: int = 1, port: Optional[int] = None, timeout: float = 30.0) -> Tuple[subprocess.Popen, str]:
+    """Start `uvicorn app.main:app` on localhost (as render.yaml does) and wait for /health."""
+    port = port or _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning", "--no-access-log"],
+        env=dict(os.environ),
+    )
+    url = f"http://127.0.0.1:{port}"
+    stop = time.monotonic() + timeout
+    while time.monotonic() < stop:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with status {proc.returncode}")
+        try:
+            if httpx.get(url + "/health", timeout=1.0).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError(f"server on {url} not healthy after {timeout:g}s")
+
+def _print_row(row: Dict[str, float]) -> None:
+    print(f"{row['t_s']:7.1f}s  {row['rps']:9.1f} req/s  {row['errors']:5d} err  "
+          f"p50 {row['p50_ms']:8.1f} ms  p95 {row['p95_ms']:8.1f} ms  p99 {row['p99_ms']:8.1f} ms", flush=True)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Card King load generator")
+    ap.add_argument("--url", default="http://127.0.0.1:8000", help="server to load (ignored with --serve)")
+    ap.add_argument("--serve", action="store_true", help="start uvicorn app.main:app locally for the run")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn workers with --serve")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds to run")
+    ap.add_argument("--concurrency", type=int, default=32, help="clients (closed loop) or max in flight (with --rate)")
+    ap.add_argument("--rate", type=float, help="open loop: Poisson arrivals per second")
+    ap.add_argument("--mix", default="identify=1,comps=2,decision=6", help="endpoint weights")
+    ap.add_argument("--cards", type=int, default=10_000, help="distinct cards")
+    ap.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent of card popularity (0 = uniform)")
+    ap.add_argument("--interval", type=float, default=5.0, help="seconds between progress lines")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write the summary JSON here")
+    args = ap.parse_args(argv)
+
+    workload = Workload(parse_mix(args.mix), cards=args.cards, zipf=args.zipf, seed=args.seed)
+    proc = None
+    url = args.url
+    if args.serve:
+        proc, url = serve(args.workers)
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+        async def go() -> Dict[str, Any]:
+            async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+                return await run_load(client, workload, args.duration, args.concurrency, args.rate,
+                                      args.interval, _print_row, args.seed)
+
+        summary = asyncio.run(go())
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    print()
+    for name, r in [("total", summary["total"]), *summary["endpoints"].items()]:
+        print(f"{name:<10}  {r['requests']:8d} req  {r['errors']:6d} err  {r['rps']:9.1f} req/s  "
+              f"p50 {r['p50_ms']:8.1f} ms  p95 {r['p95_ms']:8.1f} ms  p99 {r['p99_ms']:8.1f} ms")
+    if args.out:
+        summary["meta"] = {"url": url, **{k: v for k, v in vars(args).items() if k not in ("out", "url")}}
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, sort_keys=True)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
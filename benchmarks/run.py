@@ -0,0 +1,61 @@
+"""Run the benchmark suite, save results as JSON, optionally flag regressions.
+
+    python -m benchmarks.run --out bench.json
+    python -m benchmarks.run --out new.json --compare bench.json --threshold 0.2
+    python -m benchmarks.run --only decide --group engine --min-time 0.2
+
+Exits with status 1 when --compare finds a benchmark slower than the
+threshold. Everything runs in-process and offline.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+
+from benchmarks import suite
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Card King benchmark suite")
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--compare", help="baseline results JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging (0.2 = 20%%)")
+    ap.add_argument("--only", action="append", help="run benchmarks whose name contains this (repeatable)")
+    ap.add_argument("--group", action="append", choices=["engine", "http"], help="restrict to a group (repeatable)")
+    ap.add_argument("--min-time", type=float, default=0.5, help="seconds to spend per benchmark")
+    args = ap.parse_args(argv)
+
+    results = suite.run(names=args.only, groups=args.group, min_time=args.min_time)
+    doc = {
+        "meta": {
+            "created_at_utc": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "min_time": args.min_time,
+        },
+        "results": results,
+    }
+
+    width = max((len(n) for n in results), default=10)
+    for name, r in results.items():
+        print(f"{name:<{width}}  {r['mean_us']:12.1f} us/op  p95 {r['p95_us']:12.1f} us  p99 {r['p99_us']:12.1f} us  {r['ops_per_sec']:12.1f} ops/s")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = suite.compare(baseline, results, threshold=args.threshold)
+        for r in regressions:
+            print(f"REGRESSION {r['name']}: {r['baseline_us']:.1f} -> {r['current_us']:.1f} us/op (+{r['change']:.0%})")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
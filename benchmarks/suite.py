@@ -0,0 +1,324 @@
+from __future__ import annotations
+
+import os
+import statistics
+import tempfile
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from itertools import count, cycle
+from random import Random
+from typing import Callable, Dict, List, Optional
+
+@dataclass(frozen=True)
+class Benchmark:
+    name: str
+    group: str  # "engine" or "http"
+    setup: Callable[[], Callable[[], object]]  # returns the zero-arg function to time
+
+_REGISTRY: List[Benchmark] = []
+
+def benchmark(name: str, group: str = "engine"):
+    def wrap(setup: Callable[[], Callable[[], object]]):
+        _REGISTRY.append(Benchmark(name, group, setup))
+        return setup
+    return wrap
+
+def all_benchmarks() -> List[Benchmark]:
+    return list(_REGISTRY)
+
+def measure(fn: Callable[[], object], min_time: float = 0.5, max_iters: int = 1_000_000) -> Dict[str, float]:
+    """Time `fn` repeatedly for at least `min_time` seconds (after one warm-up call)."""
+    fn()
+    samples: List[float] = []
+    deadline = time.perf_counter() + min_time
+    while len(samples) < max_iters:
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+        if t0 >= deadline:
+            break
+    samples.sort()
+    mean = statistics.fmean(samples)
+    return {
+        "iterations": len(samples),
+        "mean_us": mean * 1e6,
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p95_us": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1e6,
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+        "ops_per_sec": 1.0 / mean if mean > 0 else 0.0,
+    }
+
+# -- fixtures ------------------------------------------------------------------
+
+def _fees():
+    from app.engine.fees import FeeScheduleLoader
+    path = os.path.join(os.path.dirname(__file__), "..", "app", "data", "fees_default.json")
+    return FeeScheduleLoader(path).get()
+
+def _prices(n: int, seed: int = 0) -> List[Decimal]:
+    rng = Random(seed)
+    return [Decimal(str(round(rng.uniform(5, 500), 2))) for _ in range(n)]
+
+_PROBS = {"PSA10": 0.25, "PSA9": 0.5, "PSA8": 0.15, "PSA7": 0.07, "LT7": 0.03}
+
+# -- engine microbenchmarks ----------------------------------------------------
+
+@benchmark("decide")
+def _decide():
+    from app.engine.decision import decide
+    fees = _fees()
+    return lambda: decide(Decimal("90"), Decimal("110"), Decimal("130"), 10, _PROBS, fees, listed_price=Decimal("80"))
+
+@benchmark("decide_raw_dict_fees")
+def _decide_dict():
+    from app.engine.decision import decide
+    raw = _fees().raw
+    return lambda: decide(Decimal("90"), Decimal("110"), Decimal("130"), 10, _PROBS, raw)
+
+@benchmark("roi_summary")
+def _roi():
+    from app.engine.roi import roi_summary
+    fees = _fees()
+    return lambda: roi_summary(Decimal("110"), _PROBS, fees=fees)
+
+@benchmark("decide_fixed")
+def _decide_fixed():
+    from app.engine.decision import decide_fixed
+    fees = _fees()
+    return lambda: decide_fixed(Decimal("90"), Decimal("110"), Decimal("130"), 10, _PROBS, fees, listed_price=Decimal("80"))
+
+@benchmark("roi_summary_cents")
+def _roi_cents():
+    from app.engine.fastmoney import fixed_fees, roi_summary_cents
+    ff = fixed_fees(_fees())
+    return lambda: roi_summary_cents(11000, _PROBS, ff)
+
+def _engine_mode_bench(mode: str) -> None:
+    @benchmark(f"decide_many_10k_{mode}")
+    def _many():
+        from app.engine.decision import DecisionInput, decide_many
+        from app.engine.grading import grade_probabilities
+        fees = _fees()
+        probs = grade_probabilities(9.0, 9.5, 8.5, 9.0, False)  # full-precision floats, as in production
+        inputs = [
+            DecisionInput(p, p + Decimal("20"), p + Decimal("45"), 10, probs, listed_price=p - Decimal("5"))
+            for p in _prices(10_000)
+        ]
+        return lambda: decide_many(inputs, fees, mode=mode)
+
+for _mode in ("decimal", "fixed"):
+    _engine_mode_bench(_mode)
+
+@benchmark("grade_probabilities")
+def _grading():
+    from app.engine.grading import grade_probabilities
+    return lambda: grade_probabilities(9.0, 9.5, 8.5, 9.0, False)
+
+@benchmark("grade_probabilities_batch_100k")
+def _grading_batch():
+    import numpy as np
+    from app.engine.grading_batch import grade_probabilities_batch
+    rng = np.random.default_rng(0)
+    cols = [rng.integers(0, 101, 100_000) / 10.0 for _ in range(4)]
+    return lambda: grade_probabilities_batch(*cols)
+
+def _market_benches(n: int) -> None:
+    @benchmark(f"percentile_median_{n}")
+    def _pm():
+        from app.engine.market import median, percentile
+        vals = _prices(n)
+        return lambda: (percentile(vals, 25), median(vals), percentile(vals, 75))
+
+    @benchmark(f"market_summarize_{n}")
+    def _summary():
+        from app.engine.market import summarize
+        vals = _prices(n)
+        return lambda: summarize(vals)
+
+for _n in (10, 1_000, 100_000):
+    _market_benches(_n)
+
+@benchmark("decision_response_json")
+def _response_json():
+    from app.engine.decision import decide
+    from app.engine.schemas import CardIdentity, ConditionMetrics
+    from app.services.comps_provider_stub import StubCompsProvider
+    from app.services.evaluation import decision_response, grade_probs_for, response_body
+    _, stats = StubCompsProvider().get_recent_sold_comps(CardIdentity(card_key="0123456789abcdef", display_name="Charizard"))
+    probs = grade_probs_for(ConditionMetrics(centering=9, corners=9.5, edges=9, surface=9.5))
+    res = decide(stats.p25, stats.median, stats.p75, stats.comps_count, probs, _fees(), listed_price=Decimal("20"))
+    return lambda: response_body(decision_response(res, stats, probs))
+
+@benchmark("rolling_windows_update_5k")
+def _rolling_windows():
+    from datetime import datetime, timedelta, timezone
+    from app.engine.trend import RollingWindows
+    rng = Random(0)
+    now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    windows = RollingWindows((7, 30, 90))
+    for _ in range(5000):
+        windows.add((now - timedelta(days=rng.uniform(0, 90))).isoformat(), rng.randint(100, 50000))
+    windows.advance(now)
+    clock = [now]
+
+    def step():
+        # one new sale a minute; expiry keeps the 90-day window near 5k sales per ~130k minutes
+        clock[0] += timedelta(minutes=1)
+        windows.add(clock[0].isoformat(), rng.randint(100, 50000))
+        windows.advance(clock[0])
+        return windows.summary(30), windows.ew_median()
+    return step
+
+@benchmark("monte_carlo_roi_100k_x_100")
+def _monte_carlo():
+    import numpy as np
+    from app.engine.grading_batch import grade_probabilities_batch
+    from app.engine.montecarlo import simulate_roi
+    rng = np.random.default_rng(0)
+    medians = rng.uniform(20, 500, 100)
+    probs = grade_probabilities_batch(*rng.uniform(7, 10, (4, 100)))
+    fees = _fees()
+    # a tenth of the 1k-card target per call; scales linearly in cards
+    return lambda: simulate_roi(medians, medians * 0.85, medians * 1.2, probs, fees, samples=100_000)
+
+@benchmark("stub_comps_provider")
+def _stub():
+    from app.engine.schemas import CardIdentity
+    from app.services.comps_provider_stub import StubCompsProvider
+    provider = StubCompsProvider()
+    ident = CardIdentity(card_key="0123456789abcdef", display_name="Charizard")
+    return lambda: provider.get_recent_sold_comps(ident)
+
+@benchmark("archive_comps_provider")
+def _archive():
+    from app.data.comps_archive import generate
+    from app.engine.identity import stable_card_key
+    from app.engine.schemas import CardIdentity
+    from app.services.comps_provider_archive import ArchiveCompsProvider
+    path = os.path.join(tempfile.mkdtemp(prefix="cardking-bench-"), "comps.cka")
+    generate(path, 10_000)
+    provider = ArchiveCompsProvider(path)
+    ident = CardIdentity(card_key=stable_card_key("synthetic card 42"), display_name="Charizard")
+    return lambda: provider.get_recent_sold_comps(ident)
+
+_catalog_cache = {}
+
+def _synthetic_catalog(n: int):
+    """Catalog of `n` made-up cards: 20k player names across sets, years, numbers and variants."""
+    if n not in _catalog_cache:
+        from app.services.catalog import CardCatalog, CatalogEntry
+        rng = Random(0)
+        syllables = ["ka", "ri", "zo", "mo", "ta", "lu", "ne", "vi", "sha", "dor", "ben", "pix", "gar", "tho", "mel"]
+        word = lambda k: "".join(rng.choice(syllables) for _ in range(k)).capitalize()
+        names = [f"{word(rng.randint(2, 4))} {word(3)}" for _ in range(20_000)]
+        sets = [f"{a} {b}" for a in ("Base", "Neo", "Topps", "Prizm", "Chrome", "Select", "Fleer", "Donruss")
+                for b in ("Set", "Genesis", "Update", "Series", "Origins", "Heritage")]
+        variants = [None, "Holo", "Rookie", "Refractor", "1st Edition", "Silver"]
+        _catalog_cache[n] = CardCatalog(
+            CatalogEntry(f"{i:016x}", names[i % len(names)], "tcg", 1980 + (i * 7) % 44,
+                         sets[(i // len(names)) % len(sets)], str(i % 300 + 1), variants[i % 6])
+            for i in range(n)
+        )
+    return _catalog_cache[n]
+
+def _catalog_queries(catalog, typo: bool = False) -> List[str]:
+    rng = Random(1)
+    queries = []
+    for _ in range(1000):
+        e = catalog.entries[rng.randrange(len(catalog))]
+        name = e.name.split()[0]
+        if typo:
+            name = name[:-1] + "x"
+        queries.append(f"{name} {e.set_name} {e.card_number}")
+    return queries
+
+@benchmark("catalog_resolve_200k")
+def _catalog_resolve():
+    catalog = _synthetic_catalog(200_000)
+    queries = cycle(_catalog_queries(catalog))
+    return lambda: catalog.resolve(next(queries))
+
+@benchmark("catalog_resolve_typo_200k")
+def _catalog_resolve_typo():
+    catalog = _synthetic_catalog(200_000)
+    queries = cycle(_catalog_queries(catalog, typo=True))
+    return lambda: catalog.resolve(next(queries))
+
+@benchmark("catalog_suggest_200k")
+def _catalog_suggest():
+    catalog = _synthetic_catalog(200_000)
+    queries = cycle([q[:len(q) // 2] for q in _catalog_queries(catalog)])
+    return lambda: catalog.suggest(next(queries))
+
+# -- in-process HTTP pipeline --------------------------------------------------
+
+_client = None
+
+def _http_client():
+    """TestClient over the ASGI app with a throwaway database."""
+    global _client
+    if _client is None:
+        from fastapi.testclient import TestClient
+        from app.data import db
+        db.DB_PATH = os.path.join(tempfile.mkdtemp(prefix="cardking-bench-"), "bench.sqlite3")
+        from app.main import app
+        _client = TestClient(app)
+    return _client
+
+_DECISION = {
+    "query": "1999 Pokemon Charizard Holo 4/102",
+    "listed_price": 120.0,
+    "metrics": {"centering": 9.0, "corners": 9.5, "edges": 9.0, "surface": 9.5, "issue_flag": False},
+}
+
+@benchmark("http_identify", group="http")
+def _http_identify():
+    client = _http_client()
+    return lambda: client.post("/api/identify", json={"query": _DECISION["query"]})
+
+@benchmark("http_comps", group="http")
+def _http_comps():
+    client = _http_client()
+    identity = client.post("/api/identify", json={"query": _DECISION["query"]}).json()
+    return lambda: client.post("/api/comps", json={"identity": identity})
+
+@benchmark("http_decision", group="http")
+def _http_decision():
+    # a new listed price each call keeps the decision cache from answering: this
+    # times the full comps -> grading -> decide -> log pipeline. The cycle is
+    # longer than the cache, so LRU eviction never lets a price come back as a hit.
+    client = _http_client()
+    cents = count()
+
+    def call():
+        return client.post("/api/decision", json={**_DECISION, "listed_price": 120.0 + next(cents) % 50_000 / 100})
+    return call
+
+@benchmark("http_decision_cache_hit", group="http")
+def _http_decision_cache_hit():
+    client = _http_client()
+    client.post("/api/decision", json=_DECISION)
+    return lambda: client.post("/api/decision", json=_DECISION)
+
+def run(names: Optional[List[str]] = None, groups: Optional[List[str]] = None, min_time: float = 0.5) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for b in _REGISTRY:
+        if names and not any(n in b.name for n in names):
+            continue
+        if groups and b.group not in groups:
+            continue
+        results[b.name] = {"group": b.group, **measure(b.setup(), min_time=min_time)}  # type: ignore[dict-item]
+    return results
+
+def compare(baseline: Dict[str, Dict[str, float]], current: Dict[str, Dict[str, float]], threshold: float = 0.2) -> List[Dict[str, float]]:
+    """Benchmarks whose mean time grew by more than `threshold` (0.2 = 20%)."""
+    regressions = []
+    for name, cur in current.items():
+        base = baseline.get(name)
+        if not base or base.get("mean_us", 0) <= 0:
+            continue
+        change = cur["mean_us"] / base["mean_us"] - 1.0
+        if change > threshold:
+            regressions.append({"name": name, "baseline_us": base["mean_us"], "current_us": cur["mean_us"], "change": change})
+    return regressions
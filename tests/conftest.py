@@ -0,0 +1,17 @@
+import pytest
+
+from app.data import db
+from app.data.log_writer import get_log_writer
+
+@pytest.fixture
+def tmp_db(tmp_path, monkeypatch):
+    """Point the app at a fresh SQLite file for one test.
+
+    On teardown, rows queued on the shared decision log writer are flushed
+    while DB_PATH still points here, and the pool is closed.
+    """
+    path = str(tmp_path / "test.sqlite3")
+    monkeypatch.setattr(db, "DB_PATH", path)
+    yield path
+    get_log_writer().flush()
+    db.close_pool()
@@ -0,0 +1,33 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.data import db
+from app.data.log_writer import get_log_writer
+from app.main import app
+
+@pytest.fixture()
+def client(tmp_db):
+    return TestClient(app)
+
+def _item(query, listed=None, c=9.0):
+    return {"query": query, "listed_price": listed, "metrics": {"centering": c, "corners": 9.5, "edges": 9.0, "surface": 9.5}}
+
+def test_batch_matches_single_calls(client):
+    items = [_item("Charizard base set"), _item("charizard BASE set", listed=20), _item("LeBron topps rookie", c=7.5), _item("Charizard base set")]
+    batch = client.post("/api/decision/batch", json={"items": items})
+    assert batch.status_code == 200
+    results = batch.json()["results"]
+    assert len(results) == len(items)
+    for item, got in zip(items, results):
+        single = client.post("/api/decision", json=item)
+        assert single.status_code == 200
+        assert single.json() == got
+
+def test_batch_logs_every_row(client):
+    items = [_item("Pikachu promo"), _item("Pikachu promo"), _item("Mewtwo holo")]
+    assert client.post("/api/decision/batch", json={"items": items}).status_code == 200
+    get_log_writer().flush()
+    conn = db.get_conn()
+    n = conn.execute("SELECT COUNT(*) FROM decision_log").fetchone()[0]
+    conn.close()
+    assert n == 3
@@ -0,0 +1,20 @@
+from benchmarks import suite
+
+def test_compare_flags_only_slowdowns_beyond_threshold():
+    baseline = {"a": {"mean_us": 100.0}, "b": {"mean_us": 100.0}, "c": {"mean_us": 100.0}}
+    current = {"a": {"mean_us": 119.0}, "b": {"mean_us": 130.0}, "c": {"mean_us": 50.0}, "new": {"mean_us": 1.0}}
+    regressions = suite.compare(baseline, current, threshold=0.2)
+    assert [r["name"] for r in regressions] == ["b"]
+    assert round(regressions[0]["change"], 2) == 0.3
+
+def test_measure_reports_stats():
+    r = suite.measure(lambda: sum(range(100)), min_time=0.01)
+    assert r["iterations"] >= 1
+    assert r["p50_us"] <= r["p95_us"] <= r["p99_us"]
+    assert r["ops_per_sec"] > 0
+
+def test_registry_covers_engine_and_http():
+    names = {b.name for b in suite.all_benchmarks()}
+    for expected in ["decide", "roi_summary", "grade_probabilities", "stub_comps_provider",
+                     "http_identify", "http_comps", "http_decision"]:
+        assert expected in names
@@ -0,0 +1,84 @@
+import os
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.engine.identity import stable_card_key
+from app.main import app
+from app.services import catalog as catalog_mod
+from app.services.catalog import CardCatalog, CatalogEntry, load_catalog
+
+SAMPLE = os.path.join(os.path.dirname(__file__), "..", "app", "data", "catalog_sample.csv")
+
+@pytest.fixture(scope="module")
+def catalog():
+    return load_catalog(SAMPLE)
+
+def test_word_order_and_punctuation_resolve_to_one_card(catalog):
+    a = catalog.identify("Charizard base set 4")
+    b = catalog.identify("base set charizard #4")
+    assert a == b
+    assert (a.year, a.set_name, a.card_number, a.variant, a.category) == (1999, "Base Set", "4/102", "Holo", "tcg")
+    assert catalog.identify("charizard base set 4/102 1st edition").variant == "1st Edition Holo"
+
+def test_typos_are_corrected(catalog):
+    assert catalog.identify("charzard base set") == catalog.identify("charizard base set")
+    assert catalog.identify("lebron topps chrom refractor").variant == "Refractor Rookie"
+
+def test_ambiguous_or_unknown_queries_do_not_resolve(catalog):
+    assert catalog.resolve("charizard") is None
+    assert catalog.resolve("4 102") is None
+    assert catalog.resolve("charizard neo genesis") is None
+    assert catalog.resolve("completely unknown card") is None
+
+def test_suggest_prefix_and_complete_tokens(catalog):
+    assert [e.name for e in catalog.suggest("chari")][:2] == ["Charizard", "Charizard"]
+    assert {e.name for e in catalog.suggest("luka d")} == {"Luka Doncic"}
+    assert [e.name for e in catalog.suggest("base set p")] == ["Pikachu"]
+    assert all("1999" in e.display_name for e in catalog.suggest("1999 ", limit=50))
+    assert len(catalog.suggest("c", limit=3)) == 3
+    assert catalog.suggest("zzz") == [] and catalog.suggest("") == []
+
+def test_more_specific_cards_rank_first():
+    entries = [
+        CatalogEntry("k2", "Pikachu", "tcg", 1999, "Base Set", "58/102", "Red Cheeks"),
+        CatalogEntry("k1", "Pikachu", "tcg", 1999, "Base Set", "58/102", None),
+    ]
+    c = CardCatalog(entries)
+    assert c.resolve("pikachu base set").card_key == "k1"
+    assert [e.card_key for e in c.suggest("pika")] == ["k1", "k2"]
+    assert c.get("k2").variant == "Red Cheeks"
+
+def test_sqlite_source_derives_missing_fields(tmp_path):
+    path = str(tmp_path / "cards.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE cards (name TEXT, year INTEGER, set_name TEXT, card_number TEXT)")
+    conn.execute("INSERT INTO cards VALUES ('LeBron James', 2003, 'Topps Chrome', '111')")
+    conn.commit()
+    conn.close()
+    ident = load_catalog(path).identify("lebron topps chrome")
+    assert ident.card_key == stable_card_key("2003 Topps Chrome LeBron James 111")
+    assert (ident.category, ident.year, ident.variant) == ("sports", 2003, None)
+
+def test_empty_catalog():
+    c = CardCatalog([])
+    assert c.resolve("charizard base") is None and c.suggest("ch") == [] and len(c) == 0
+
+@pytest.fixture()
+def client(tmp_db, catalog):
+    catalog_mod.set_catalog(catalog)
+    yield TestClient(app)
+    catalog_mod.set_catalog(None)
+
+def test_identify_endpoints(client):
+    a = client.post("/api/identify", json={"query": "Charizard base set 4"}).json()
+    b = client.post("/api/identify", json={"query": "base set charizard #4"}).json()
+    assert a == b and a["card_number"] == "4/102"
+    fallback = client.post("/api/identify", json={"query": "some card not in the catalog"}).json()
+    assert fallback["card_key"] == stable_card_key("some card not in the catalog")
+
+    names = [s["display_name"] for s in client.get("/api/identify/suggest", params={"q": "lebron", "limit": 5}).json()]
+    assert names == ["2003 Topps Chrome LeBron James #111 Rookie", "2003 Topps Chrome LeBron James #111 Refractor Rookie"]
+    catalog_mod.set_catalog(None)
+    assert client.get("/api/identify/suggest", params={"q": "lebron"}).json() == []
@@ -0,0 +1,102 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+import pytest
+
+import json
+
+from app.data import db
+from app.data.comps_archive import CompsArchive, day_number, generate, main, write_archive
+from app.engine.identity import guess_category, stable_card_key
+from app.engine.schemas import CardIdentity, CompsResponse
+from app.engine.serialize import dump_comps
+from app.services.comps_provider_archive import ArchiveCompsProvider
+from app.services.comps_cache import CachedCompsProvider
+from app.services.comps_provider_base import build_market_stats
+from app.services.comps_provider_stub import StubCompsProvider
+
+ANCHOR = date(2024, 6, 1)
+QUERIES = [f"card {i}" for i in range(50)] + ["LeBron topps rookie", "Mahomes panini prizm"]
+
+@pytest.fixture()
+def archive_path(tmp_path):
+    path = str(tmp_path / "comps.cka")
+    assert generate(path, 0, anchor=ANCHOR, queries=QUERIES) == (len(QUERIES), 10 * len(QUERIES))
+    return path
+
+def _ident(q):
+    return CardIdentity(card_key=stable_card_key(q), display_name=q, category=guess_category(q))
+
+def test_stats_match_stub_seeding(archive_path):
+    provider = ArchiveCompsProvider(archive_path)
+    stub = StubCompsProvider()
+    for q in QUERIES:
+        comps, stats = provider.get_recent_sold_comps(_ident(q))
+        stub_comps, stub_stats = stub.get_recent_sold_comps(_ident(q))
+        assert stats == stub_stats
+        assert sorted(c.sold_price for c in comps) == sorted(c.sold_price for c in stub_comps)
+        assert build_market_stats(list(comps)) == stats
+
+def test_slices_are_zero_copy_views(archive_path):
+    provider = ArchiveCompsProvider(archive_path)
+    prices, days = provider.slices(stable_card_key("card 3"))
+    assert prices.base is not None and not prices.flags.owndata
+    assert list(prices) == sorted(prices)
+    assert all(day_number(ANCHOR - timedelta(days=45)) <= d < day_number(ANCHOR) for d in days)
+
+def test_lazy_comps_serialize(archive_path):
+    provider = ArchiveCompsProvider(archive_path)
+    ident = _ident("card 7")
+    comps, stats = provider.get_recent_sold_comps(ident)
+    body = CompsResponse(identity=ident, comps=comps, stats=stats)
+    assert len(body.comps) == 10
+    assert body.comps[0].sold_price == Decimal(int(comps.prices[0])).scaleb(-2)
+    assert body.comps[-1].title.startswith("card 7")
+
+def test_archive_behind_comps_cache(archive_path, tmp_db):
+    provider = ArchiveCompsProvider(archive_path, fallback=StubCompsProvider())
+    cache = CachedCompsProvider(provider)
+    ident = _ident("card 7")
+    comps, stats = provider.get_recent_sold_comps(ident)
+
+    entry = cache.lookup(ident)
+    comps_json, stats_json = entry.json_parts()
+    assert comps_json == dump_comps(list(comps))  # the column-built JSON is byte-identical
+    assert json.loads(stats_json) == json.loads(stats.model_dump_json())
+
+    # the archive is the store: no history rows and no cached copy of its comps
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sold_comps").fetchone()[0] == 0
+        assert conn.execute("SELECT COUNT(*) FROM comps_cache").fetchone()[0] == 0
+    cache.invalidate()
+    assert cache.lookup(ident).stats == stats
+
+    cache.lookup(_ident("not in the archive"))  # fallback comps are ordinary lists and are stored
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM comps_cache").fetchone()[0] == 1
+
+def test_unknown_cards_use_fallback(archive_path):
+    ident = _ident("not in the archive")
+    with pytest.raises(LookupError):
+        ArchiveCompsProvider(archive_path).get_recent_sold_comps(ident)
+    with_fallback = ArchiveCompsProvider(archive_path, fallback=StubCompsProvider())
+    assert with_fallback.get_recent_sold_comps(ident)[1] == StubCompsProvider().get_recent_sold_comps(ident)[1]
+    assert with_fallback.slices("not-a-hex-key") is None
+
+def test_write_archive_sorts_and_dedupes(tmp_path):
+    path = str(tmp_path / "small.cka")
+    rows = [("00000000000000ff", [300, 100, 200], [3, 1, 2]), ("0000000000000001", [5], [9]), ("00000000000000ff", [1], [1])]
+    assert write_archive(path, rows, anchor_day=10) == (2, 4)
+    a = CompsArchive(path)
+    assert list(a.keys) == [1, 255]
+    assert list(a.prices(1)) == [100, 200, 300]
+    assert list(a.days(1)) == [1, 2, 3]
+    assert list(a.card_index) == [0, 1, 1, 1]
+    a.close()
+
+def test_cli(tmp_path):
+    out = str(tmp_path / "cli.cka")
+    assert main(["--out", out, "--cards", "20", "--comps-per-card", "4", "--anchor", "2024-01-01"]) == 0
+    a = CompsArchive(out)
+    assert (a.n_cards, a.n_comps, a.anchor_day) == (20, 80, day_number(date(2024, 1, 1)))
+    a.close()
@@ -0,0 +1,133 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.engine.schemas import CardIdentity
+from app.services.comps_cache import CachedCompsProvider
+from app.services.comps_guard import ProviderUnavailable
+from app.services.comps_provider_stub import StubCompsProvider
+
+class CountingProvider(StubCompsProvider):
+    def __init__(self):
+        self.calls = 0
+
+    def get_recent_sold_comps(self, identity):
+        self.calls += 1
+        return super().get_recent_sold_comps(identity)
+
+class Clock:
+    def __init__(self):
+        self.now = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+    def __call__(self):
+        return self.now
+
+pytestmark = pytest.mark.usefixtures("tmp_db")
+
+def _ident(key):
+    return CardIdentity(card_key=key, display_name=key)
+
+def test_memory_then_db_tiers():
+    inner = CountingProvider()
+    clock = Clock()
+    cache = CachedCompsProvider(inner, ttl_seconds=60, clock=clock)
+    a = cache.get_recent_sold_comps(_ident("a"))
+    b = cache.get_recent_sold_comps(_ident("a"))
+    assert a[1] == b[1]
+    assert inner.calls == 1
+
+    # a fresh process-level cache still finds the row in SQLite
+    other = CachedCompsProvider(inner, ttl_seconds=60, clock=clock)
+    c = other.get_recent_sold_comps(_ident("a"))
+    assert c[1] == a[1]
+    assert inner.calls == 1
+    assert cache.stats()["memory_hits"] == 1
+    assert other.stats()["db_hits"] == 1
+
+def test_lru_eviction_counter():
+    cache = CachedCompsProvider(CountingProvider(), max_entries=2, clock=Clock())
+    for key in ["a", "b", "c"]:
+        cache.lookup(_ident(key))
+    s = cache.stats()
+    assert s["size"] == 2
+    assert s["evictions"] == 1
+    assert s["misses"] == 3
+
+def test_stale_entry_served_while_refreshing():
+    inner = CountingProvider()
+    clock = Clock()
+    cache = CachedCompsProvider(inner, ttl_seconds=60, max_stale_seconds=600, clock=clock)
+    first = cache.lookup(_ident("a"))
+    clock.now += timedelta(seconds=120)
+    stale = cache.lookup(_ident("a"))
+    assert stale is first
+    for _ in range(100):
+        if cache.stats()["refreshes"]:
+            break
+        time.sleep(0.01)
+    assert inner.calls == 2
+    assert cache.lookup(_ident("a")).fetched_at == clock.now
+
+def test_expired_beyond_stale_window_fetches_inline():
+    inner = CountingProvider()
+    clock = Clock()
+    cache = CachedCompsProvider(inner, ttl_seconds=60, max_stale_seconds=60, clock=clock)
+    cache.lookup(_ident("a"))
+    clock.now += timedelta(seconds=600)
+    assert cache.lookup(_ident("a")).fetched_at == clock.now
+    assert inner.calls == 2
+
+def test_concurrent_misses_share_one_fetch():
+    release = threading.Event()
+
+    class SlowProvider(CountingProvider):
+        def get_recent_sold_comps(self, identity):
+            release.wait(5)
+            return super().get_recent_sold_comps(identity)
+
+    inner = SlowProvider()
+    cache = CachedCompsProvider(inner, clock=Clock())
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.lookup(_ident("hot")))) for _ in range(20)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < 19 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for t in threads:
+        t.join()
+    assert inner.calls == 1 and cache.stats()["coalesced"] == 19
+    assert len({id(e) for e in results}) == 1
+
+def test_coalesced_waiters_share_the_error():
+    release = threading.Event()
+
+    class FailingProvider(CountingProvider):
+        def get_recent_sold_comps(self, identity):
+            self.calls += 1
+            release.wait(5)
+            raise ProviderUnavailable("fake", "error")
+
+    inner = FailingProvider()
+    cache = CachedCompsProvider(inner, clock=Clock())
+    errors = []
+
+    def call():
+        try:
+            cache.lookup(_ident("down"))
+        except ProviderUnavailable as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=call) for _ in range(5)]
+    for t in threads:
+        t.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()["coalesced"] < 4 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for t in threads:
+        t.join()
+    assert inner.calls == 1 and len(errors) == 5
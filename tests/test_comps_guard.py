@@ -0,0 +1,177 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.engine.schemas import CardIdentity
+from app.main import app
+from app.services.comps_cache import CachedCompsProvider
+from app.services.comps_guard import (
+    BATCH, CircuitBreaker, GuardedCompsProvider, ProviderUnavailable, TokenBucket, priority,
+)
+from app.services.comps_provider_stub import StubCompsProvider
+
+pytestmark = pytest.mark.usefixtures("tmp_db")
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+class Upstream(StubCompsProvider):
+    """Stub that can block, fail, and records the order of calls."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.gate.set()
+        self.fail = False
+        self.calls = []
+
+    def get_recent_sold_comps(self, identity):
+        self.calls.append(identity.card_key)
+        self.gate.wait(5)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return super().get_recent_sold_comps(identity)
+
+def _ident(key):
+    return CardIdentity(card_key=key, display_name=key)
+
+def test_token_bucket_and_breaker():
+    clock = Clock()
+    bucket = TokenBucket(rate=2, burst=2, clock=clock)
+    assert [bucket.reserve(0) for _ in range(3)] == [0.0, 0.0, None]
+    assert bucket.reserve(1.0) == pytest.approx(0.5)
+    clock.now += 1.5
+    assert bucket.reserve(0) == 0.0
+
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10, clock=clock)
+    breaker.record(False)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open" and not breaker.allow()
+    clock.now += 10
+    assert breaker.allow() and not breaker.allow()  # one half-open probe
+    breaker.record(False)
+    assert breaker.state == "open"
+    clock.now += 10
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed"
+
+def _start(guard, key, level, results):
+    def run():
+        with priority(level):
+            try:
+                guard.get_recent_sold_comps(_ident(key))
+                results[key] = "ok"
+            except ProviderUnavailable as exc:
+                results[key] = exc.reason
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+def _wait_queue(guard, depth):
+    deadline = time.monotonic() + 5
+    while guard.stats()["queue_depth"] != depth and time.monotonic() < deadline:
+        time.sleep(0.005)
+    assert guard.stats()["queue_depth"] == depth
+
+def test_interactive_requests_jump_the_queue_and_full_queues_shed_batch_first():
+    upstream = Upstream()
+    guard = GuardedCompsProvider(upstream, concurrency=1, max_queue=2, deadline_seconds=5)
+    results = {}
+    upstream.gate.clear()
+    threads = [_start(guard, "holder", 0, results)]
+    while guard.stats()["in_flight"] != 1:
+        time.sleep(0.005)
+    threads.append(_start(guard, "batch-1", BATCH, results))
+    _wait_queue(guard, 1)
+    threads.append(_start(guard, "batch-2", BATCH, results))
+    _wait_queue(guard, 2)
+    threads.append(_start(guard, "interactive", 0, results))  # queue full: sheds batch-2
+    deadline = time.monotonic() + 5
+    while "batch-2" not in results and time.monotonic() < deadline:
+        time.sleep(0.005)
+    threads.append(_start(guard, "batch-3", BATCH, results))  # nothing below it to shed
+    threads[-1].join(5)
+    upstream.gate.set()
+    for t in threads:
+        t.join(5)
+    assert results == {"holder": "ok", "interactive": "ok", "batch-1": "ok", "batch-2": "queue_full", "batch-3": "queue_full"}
+    assert upstream.calls == ["holder", "interactive", "batch-1"]
+    assert guard.stats()["shed_queue_full"] == 2 and guard.stats()["queue_depth"] == 0
+
+def test_deadline_rate_limit_and_breaker_shed():
+    upstream = Upstream()
+    guard = GuardedCompsProvider(upstream, concurrency=1, deadline_seconds=0.05)
+    results = {}
+    upstream.gate.clear()
+    holder = _start(guard, "holder", 0, results)
+    while guard.stats()["in_flight"] != 1:
+        time.sleep(0.005)
+    with pytest.raises(ProviderUnavailable, match="deadline"):
+        guard.get_recent_sold_comps(_ident("late"))
+    upstream.gate.set()
+    holder.join(5)
+
+    limited = GuardedCompsProvider(Upstream(), rate=1, burst=1, deadline_seconds=0.1)
+    limited.get_recent_sold_comps(_ident("a"))
+    with pytest.raises(ProviderUnavailable, match="rate_limited"):
+        limited.get_recent_sold_comps(_ident("b"))
+
+    upstream.fail = True
+    guard = GuardedCompsProvider(upstream, breaker=CircuitBreaker(failure_threshold=2, reset_seconds=60))
+    for _ in range(2):
+        with pytest.raises(ProviderUnavailable, match="error"):
+            guard.get_recent_sold_comps(_ident("x"))
+    calls = len(upstream.calls)
+    with pytest.raises(ProviderUnavailable, match="circuit_open"):
+        guard.get_recent_sold_comps(_ident("x"))
+    assert len(upstream.calls) == calls
+    assert guard.stats()["circuit_open"] == 1 and guard.stats()["shed_circuit_open"] == 1
+
+def test_cache_falls_back_to_expired_comps_marked_degraded():
+    now = {"t": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+    upstream = Upstream()
+    cache = CachedCompsProvider(GuardedCompsProvider(upstream), ttl_seconds=60, max_stale_seconds=60, clock=lambda: now["t"])
+    fresh = cache.lookup(_ident("k"))
+    upstream.fail = True
+    now["t"] += timedelta(days=2)
+    served = cache.lookup(_ident("k"))
+    assert served.degraded and served.stats == fresh.stats and served.fetched_at == fresh.fetched_at
+    assert cache.stats()["degraded_served"] == 1
+    with pytest.raises(ProviderUnavailable):
+        cache.lookup(_ident("never-seen"))
+
+def test_api_degraded_decision_and_503(monkeypatch):
+    client = TestClient(app)
+    item = {"query": "Guarded card", "listed_price": 30, "metrics": {"centering": 9, "corners": 9, "edges": 9, "surface": 9}}
+    routes._comps_cache.invalidate()
+    good = client.post("/api/decision", json=item).json()
+    assert good["degraded"] is False
+
+    upstream = Upstream()
+    upstream.fail = True
+    monkeypatch.setattr(routes._comps_upstream, "provider", upstream)
+    monkeypatch.setattr(routes._comps_upstream, "breaker", CircuitBreaker(failure_threshold=1000))
+    later = datetime.now(timezone.utc) + timedelta(days=30)
+    monkeypatch.setattr(routes._comps_cache, "_clock", lambda: later)
+
+    degraded = client.post("/api/decision", json=item).json()
+    assert degraded["degraded"] is True and degraded["explanation"][-1].startswith("Comps provider unavailable")
+    assert {k: v for k, v in degraded.items() if k not in ("degraded", "explanation")} == \
+        {k: v for k, v in good.items() if k not in ("degraded", "explanation")}
+    assert client.post("/api/decision/batch", json={"items": [item]}).json()["results"] == [degraded]
+    sweep = {"query": item["query"], "metrics": item["metrics"], "listed_prices": [30]}
+    assert client.post("/api/sweep", json=sweep).json()["degraded"] is True
+
+    identity = client.post("/api/identify", json={"query": "Never fetched card"}).json()
+    resp = client.post("/api/comps", json={"identity": identity})
+    assert resp.status_code == 503 and resp.headers["Retry-After"] == "1" and resp.json()["reason"].startswith("error")
+    assert "cardking_comps_upstream_errors" in client.get("/metrics").text
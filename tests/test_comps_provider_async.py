@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from app.engine.schemas import CardIdentity
+from app.services.comps_provider_async import FanOutProvider, SingleFlightProvider, SyncProviderAdapter
+from app.services.comps_provider_fake import FakeAsyncCompsProvider
+from app.services.comps_provider_stub import StubCompsProvider
+
+IDENT = CardIdentity(card_key="abc123", display_name="Charizard")
+
+def test_adapter_matches_sync_stub():
+    sync_stats = StubCompsProvider().get_recent_sold_comps(IDENT)[1]
+    for inline in (False, True):
+        _, stats = asyncio.run(SyncProviderAdapter(StubCompsProvider(), inline=inline).get_recent_sold_comps(IDENT))
+        assert stats == sync_stats
+
+def test_single_flight_coalesces_concurrent_requests():
+    fake = FakeAsyncCompsProvider(delay_seconds=0.05)
+    sf = SingleFlightProvider(fake)
+
+    async def run():
+        return await asyncio.gather(*(sf.get_recent_sold_comps(IDENT) for _ in range(50)))
+
+    results = asyncio.run(run())
+    assert fake.calls == 1
+    assert sf.stats() == {"calls": 1, "coalesced": 49, "inflight": 0}
+    assert all(r is results[0] for r in results)
+
+def test_single_flight_propagates_errors_to_all_waiters():
+    sf = SingleFlightProvider(FakeAsyncCompsProvider(delay_seconds=0.01, fail=True))
+
+    async def run():
+        return await asyncio.gather(*(sf.get_recent_sold_comps(IDENT) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
+
+def test_fan_out_merges_and_skips_slow_providers():
+    a = FakeAsyncCompsProvider(title_prefix="a:")
+    b = FakeAsyncCompsProvider(title_prefix="b:")
+    slow = FakeAsyncCompsProvider(delay_seconds=1.0, title_prefix="slow:")
+    broken = FakeAsyncCompsProvider(fail=True)
+    fan = FanOutProvider([a, b, slow, broken], timeouts=[0.5, 0.5, 0.05, 0.5])
+    comps_list, stats = asyncio.run(fan.get_recent_sold_comps(IDENT))
+    assert len(comps_list) == 20
+    assert stats.comps_count == 20
+    assert fan.timeouts_hit == [0, 0, 1, 0]
+    assert fan.failures == [0, 0, 0, 1]
+
+def test_fan_out_raises_when_every_provider_fails():
+    fan = FanOutProvider([FakeAsyncCompsProvider(fail=True)])
+    with pytest.raises(LookupError):
+        asyncio.run(fan.get_recent_sold_comps(IDENT))
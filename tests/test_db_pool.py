@@ -0,0 +1,86 @@
+import sqlite3
+import threading
+
+import pytest
+
+from app.data import db
+
+def test_schema_and_migrations_applied_once(tmp_path):
+    path = str(tmp_path / "pool.sqlite3")
+    pool = db.ConnectionPool(path, size=2)
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db.MIGRATIONS)
+        cols = {row[1] for row in conn.execute("PRAGMA table_info(decision_log)")}
+    assert "fee_version" in cols
+    pool.close()
+
+def test_migrates_baseline_schema(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE decision_log (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at_utc TEXT NOT NULL,"
+        " request_json TEXT NOT NULL, response_json TEXT NOT NULL)"
+    )
+    conn.commit()
+    conn.close()
+    db.init_db(path)
+    conn = sqlite3.connect(path)
+    cols = {row[1] for row in conn.execute("PRAGMA table_info(decision_log)")}
+    conn.close()
+    assert "fee_version" in cols
+
+def test_failed_migration_rolls_back_with_its_version(tmp_path, monkeypatch):
+    path = str(tmp_path / "crash.sqlite3")
+
+    def crashing(conn):
+        conn.execute("CREATE TABLE half_done (x INTEGER)")
+        raise RuntimeError("crash")
+
+    monkeypatch.setattr(db, "MIGRATIONS", db.MIGRATIONS[:2] + [crashing])
+    with pytest.raises(RuntimeError):
+        db.init_db(path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 2
+    assert conn.execute("SELECT name FROM sqlite_master WHERE name = 'half_done'").fetchone() is None
+    conn.close()
+
+    monkeypatch.setattr(db, "MIGRATIONS", db.MIGRATIONS[:2] + [lambda conn: conn.execute("CREATE TABLE half_done (x INTEGER)")])
+    db.init_db(path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 3
+    conn.close()
+
+_ROW = ("t", "k", "BUY", 50, "Low", 100, "v1", "{}", "{}", None)
+
+def test_commit_and_rollback(tmp_path):
+    pool = db.ConnectionPool(str(tmp_path / "tx.sqlite3"), size=1)
+    with pool.connection() as conn:
+        conn.execute(db.SQL_INSERT_DECISION_LOG, _ROW)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.execute(db.SQL_INSERT_DECISION_LOG, _ROW)
+            raise RuntimeError("boom")
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM decision_log").fetchone()[0] == 1
+    pool.close()
+
+def test_pool_bounds_connections_and_records_waits(tmp_path):
+    pool = db.ConnectionPool(str(tmp_path / "wait.sqlite3"), size=2)
+    barrier = threading.Barrier(6)
+
+    def worker():
+        barrier.wait()
+        for _ in range(20):
+            with pool.connection() as conn:
+                conn.execute("SELECT 1").fetchone()
+
+    threads = [threading.Thread(target=worker) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    stats = pool.stats()
+    assert stats["open"] <= 2
+    assert stats["in_use"] == 0
+    assert stats["checkouts"] == 120
+    pool.close()
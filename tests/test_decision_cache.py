@@ -0,0 +1,76 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.engine.fees import FeeSchedule
+from app.engine.schemas import ConditionMetrics, DecisionResponse
+from app.main import app
+from app.services.decision_cache import DecisionCache, quantize_metrics
+
+@pytest.fixture()
+def client(tmp_db):
+    routes._decision_cache.clear()
+    return TestClient(app)
+
+def _payload(centering=9.0, listed=None):
+    return {"query": "Cache Me Holo", "listed_price": listed,
+            "metrics": {"centering": centering, "corners": 9.5, "edges": 9.0, "surface": 9.5}}
+
+def test_cached_response_is_byte_identical(client):
+    first = client.post("/api/decision", json=_payload())
+    hits = routes._decision_cache.stats()["hits"]
+    second = client.post("/api/decision", json=_payload())
+    assert routes._decision_cache.stats()["hits"] == hits + 1
+    assert first.content == second.content
+
+    # and identical to what FastAPI renders for the same model via response_model
+    ref = FastAPI()
+
+    @ref.get("/r", response_model=DecisionResponse)
+    def r():
+        return DecisionResponse(**json.loads(first.content))
+
+    assert TestClient(ref).get("/r").content == first.content
+
+def test_slider_round_trip_hits_cache(client):
+    a = client.post("/api/decision", json=_payload(centering=9.0)).content
+    client.post("/api/decision", json=_payload(centering=8.4))
+    hits = routes._decision_cache.stats()["hits"]
+    assert client.post("/api/decision", json=_payload(centering=9.0)).content == a
+    assert routes._decision_cache.stats()["hits"] == hits + 1
+
+def test_off_grid_metrics_are_not_cached(client):
+    before = routes._decision_cache.stats()["uncacheable"]
+    client.post("/api/decision", json=_payload(centering=9.05))
+    assert routes._decision_cache.stats()["uncacheable"] == before + 1
+
+def test_quantize_metrics():
+    assert quantize_metrics(ConditionMetrics(centering=9.3, corners=10, edges=0.1, surface=7)) == (93, 100, 1, 70, False)
+    assert quantize_metrics(ConditionMetrics(centering=9.33, corners=10, edges=0, surface=7)) is None
+
+def test_invalidation_on_comps_refresh_and_fee_change():
+    cache = DecisionCache()
+    m = ConditionMetrics(centering=9, corners=9, edges=9, surface=9)
+    k1 = cache.key("card", m, None, "snap1", "fees1")
+    cache.put(k1, b"x")
+    assert cache.get(k1) == b"x"
+    cache.invalidate_card("card")
+    assert cache.get(k1) is None
+
+    cache.put(k1, b"x")
+    k2 = cache.key("other", m, None, "snap1", "fees2")
+    cache.put(k2, b"y")
+    assert cache.get(k1) is None  # new fee version flushed the old entries
+    assert cache.get(k2) == b"y"
+
+def test_lru_bound():
+    cache = DecisionCache(max_entries=2)
+    m = ConditionMetrics(centering=9, corners=9, edges=9, surface=9)
+    keys = [cache.key(f"c{i}", m, None, "s", "f") for i in range(3)]
+    for k in keys:
+        cache.put(k, b"z")
+    assert cache.get(keys[0]) is None
+    assert cache.stats()["evictions"] == 1
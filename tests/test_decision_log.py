@@ -0,0 +1,70 @@
+import csv
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.data import db, decision_log
+from app.data.log_writer import DecisionLogWriter, LogRecord, get_log_writer
+from app.main import app
+
+@pytest.fixture()
+def client(tmp_db):
+    return TestClient(app)
+
+def _item(query, listed=None):
+    return {"query": query, "listed_price": listed, "metrics": {"centering": 9.0, "corners": 9.5, "edges": 9.0, "surface": 9.5}}
+
+def _post_many(client, n):
+    items = [_item(f"card {i % 7}", listed=10 + i) for i in range(n)]
+    assert client.post("/api/decision/batch", json={"items": items}).status_code == 200
+    get_log_writer().flush()
+
+def test_typed_columns_and_compressed_payloads(client):
+    resp = client.post("/api/decision", json=_item("Charizard base set", listed=50)).json()
+    again = client.post("/api/decision", json=_item("Charizard base set", listed=50)).json()  # cache hit
+    assert again == resp
+    get_log_writer().flush()
+    rows = list(decision_log.iter_log(include_payloads=True))
+    assert len(rows) == 2
+    for row in rows:
+        assert row["decision"] == resp["decision"]
+        assert row["confidence"] == resp["confidence"]
+        assert row["risk"] == resp["risk"]
+        assert row["expected_net"] == resp["roi"]["expected_net"]
+        assert len(row["card_key"]) == 16
+        assert json.loads(row["response_json"])["decision"] == resp["decision"]
+    with db.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM decision_log WHERE response_json IS NULL AND payload_z IS NOT NULL").fetchone()[0] == 2
+
+def test_rollups_maintained_per_batch(client):
+    _post_many(client, 30)
+    rollups = client.get("/api/decision_log/rollups").json()
+    assert sum(r["count"] for r in rollups) == 30
+    with db.connection() as conn:
+        by_decision = dict(conn.execute("SELECT decision, COUNT(*) FROM decision_log GROUP BY decision").fetchall())
+    assert {r["decision"]: r["count"] for r in rollups} == by_decision
+
+def test_export_streams_all_pages(client):
+    _post_many(client, 25)
+    r = client.get("/api/decision_log/export", params={"format": "ndjson", "page_size": 4})
+    lines = [json.loads(x) for x in r.text.splitlines()]
+    assert [x["id"] for x in lines] == sorted(x["id"] for x in lines)
+    assert len(lines) == 25
+    r = client.get("/api/decision_log/export", params={"format": "csv", "page_size": 7})
+    rows = list(csv.DictReader(io.StringIO(r.text)))
+    assert len(rows) == 25
+    assert rows[0]["decision"] == lines[0]["decision"]
+
+def test_prune_keeps_rollups(tmp_db):
+    w = DecisionLogWriter(payloads="none")
+    body = json.dumps({"decision": "PASS", "confidence": 40, "risk": "High", "roi": {"expected_net": "-1.50"}})
+    w.submit_many(LogRecord(f"2020-01-0{d}T00:00:00+00:00", "{}", body, "v1", card_key="k") for d in (1, 2, 3))
+    w.submit(LogRecord("2999-01-01T00:00:00+00:00", "{}", body, "v1", card_key="k"))
+    w.close()
+    assert decision_log.prune("2020-01-03", batch_size=1) == 2
+    assert [r["created_at_utc"][:4] for r in decision_log.iter_log()] == ["2020", "2999"]
+    rollups = decision_log.rollups(fee_version="v1")
+    assert sum(r["count"] for r in rollups) == 4
+    assert rollups[0]["total_expected_net"] == "-1.50"
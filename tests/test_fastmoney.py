@@ -0,0 +1,75 @@
+import math
+from decimal import Decimal, ROUND_HALF_UP
+from random import Random
+
+import pytest
+
+from app.engine.decision import DecisionInput, decide, decide_fixed, decide_many
+from app.engine.fastmoney import div_half_up, fixed_fees, roi_summary_cents, to_cents
+from app.engine.fees import FeeSchedule
+from app.engine.grading import grade_probabilities
+from app.engine.roi import roi_summary
+from tests.test_engine_decision import FEES
+
+SCHEDULE = FeeSchedule.from_dict(FEES)
+
+def _same(a, b):
+    assert (a.decision, a.confidence, a.risk, a.explanation, a.breakeven_grade) == \
+        (b.decision, b.confidence, b.risk, b.explanation, b.breakeven_grade)
+    assert str(a.expected_net) == str(b.expected_net)
+    assert math.isclose(a.roi_pct, b.roi_pct, rel_tol=1e-12, abs_tol=1e-9)
+
+def _cents(rng, lo, hi):
+    return Decimal(rng.randint(lo, hi)).scaleb(-2)
+
+def _random_case(rng):
+    p25 = _cents(rng, 100, 100_000)
+    median = p25 + _cents(rng, 0, 40_000)
+    p75 = median + _cents(rng, 0, 40_000)
+    if rng.random() < 0.5:
+        probs = grade_probabilities(*(rng.randint(0, 100) / 10 for _ in range(4)), rng.random() < 0.2)
+    else:
+        w = [rng.random() for _ in range(5)]
+        probs = dict(zip(("PSA10", "PSA9", "PSA8", "PSA7", "LT7"), (x / sum(w) for x in w)))
+    listed = _cents(rng, 50, 150_000) if rng.random() < 0.7 else None
+    return p25, median, p75, rng.randint(0, 15), probs, listed
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fixed_path_matches_decimal_path(seed):
+    rng = Random(seed)
+    for _ in range(2000):
+        p25, median, p75, n, probs, listed = _random_case(rng)
+        _same(
+            decide(p25, median, p75, n, probs, SCHEDULE, listed_price=listed),
+            decide_fixed(p25, median, p75, n, probs, SCHEDULE, listed_price=listed),
+        )
+
+def test_half_cent_ties_round_like_q2():
+    for n in range(-2000, 2001):
+        expected = (Decimal(n) / 1000).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        assert div_half_up(n, 10) == to_cents(expected)
+
+def test_exact_ties():
+    ff = fixed_fees(SCHEDULE)
+    # all mass on one grade with exact products lands on half-cent ties
+    for median in ("46.25", "75.81", "100.00", "43.53", "43.52"):
+        for grade in ("PSA10", "PSA9", "LT7"):
+            probs = {g: (1.0 if g == grade else 0.0) for g in ("PSA10", "PSA9", "PSA8", "PSA7", "LT7")}
+            exact, _, breakeven = roi_summary(Decimal(median), probs, fees=SCHEDULE)
+            cents, _, _, be = roi_summary_cents(to_cents(Decimal(median)), probs, ff)
+            assert cents == to_cents(exact)
+            assert be == breakeven
+
+def test_decide_many_modes_agree_and_fall_back():
+    rng = Random(7)
+    inputs = []
+    for _ in range(200):
+        p25, median, p75, n, probs, listed = _random_case(rng)
+        inputs.append(DecisionInput(p25, median, p75, n, probs, listed))
+    for a, b in zip(decide_many(inputs, SCHEDULE), decide_many(inputs, SCHEDULE, mode="fixed")):
+        _same(a, b)
+
+    odd = FeeSchedule.from_dict({**FEES, "platform": {"platform_fee_pct": 0.13255}})
+    assert decide_many(inputs[:5], odd, mode="fixed") == decide_many(inputs[:5], odd)
+    with pytest.raises(ValueError):
+        decide_many(inputs, SCHEDULE, mode="float")
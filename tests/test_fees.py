@@ -0,0 +1,81 @@
+import json
+import os
+from decimal import Decimal
+
+import pytest
+
+from app.engine.decision import decide
+from app.engine.fees import FeeSchedule, FeeScheduleLoader
+from app.engine.roi import roi_summary
+from tests.test_engine_decision import FEES
+
+def test_schedule_matches_dict_path():
+    schedule = FeeSchedule.from_dict(FEES)
+    probs = {"PSA10":0.25,"PSA9":0.5,"PSA8":0.15,"PSA7":0.07,"LT7":0.03}
+    for listed in [None, Decimal("60"), Decimal("120")]:
+        a = decide(Decimal("90"), Decimal("110"), Decimal("130"), 10, probs, FEES, listed_price=listed)
+        b = decide(Decimal("90"), Decimal("110"), Decimal("130"), 10, probs, schedule, listed_price=listed)
+        assert a == b
+
+    legacy = roi_summary(
+        market_median=Decimal("100"),
+        probs=probs,
+        grade_multipliers=FEES["grade_multipliers"],
+        grading_fee=Decimal("19.0"),
+        shipping_insurance=Decimal("18.0"),
+        platform_fee_pct=Decimal("0.1325"),
+        risk_discount_pct=Decimal("0.05"),
+    )
+    assert roi_summary(Decimal("100"), probs, fees=schedule) == legacy
+
+def test_version_is_content_hash():
+    assert FeeSchedule.from_dict(FEES).version == FeeSchedule.from_dict(json.loads(json.dumps(FEES))).version
+    changed = json.loads(json.dumps(FEES))
+    changed["grading"]["grading_fee"] = 25.0
+    assert FeeSchedule.from_dict(changed).version != FeeSchedule.from_dict(FEES).version
+
+def test_version_is_hashed_only_when_used():
+    schedule = FeeSchedule.from_dict(FEES)
+    assert "version" not in schedule.__dict__  # the dict path through decide() never hashes
+    assert schedule.version == FeeSchedule.from_dict(FEES).version
+    assert FeeSchedule.from_dict(FEES, version="v7").version == "v7"
+
+def test_loader_reloads_only_on_change(tmp_path):
+    path = tmp_path / "fees.json"
+    path.write_text(json.dumps(FEES))
+    loader = FeeScheduleLoader(str(path), check_interval_seconds=0)
+    first = loader.get()
+    assert loader.get() is first
+
+    # touched but identical content keeps the same compiled object
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert loader.get() is first
+
+    changed = json.loads(json.dumps(FEES))
+    changed["grading"]["grading_fee"] = 25.0
+    path.write_text(json.dumps(changed))
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000))
+    second = loader.get()
+    assert second.version != first.version
+    assert second.grading_fee == Decimal("25.0")
+
+def test_loader_keeps_last_good_schedule(tmp_path):
+    path = tmp_path / "fees.json"
+    path.write_text(json.dumps(FEES))
+    loader = FeeScheduleLoader(str(path), check_interval_seconds=0)
+    good = loader.get()
+
+    path.write_text(json.dumps(FEES)[:40])  # half-written
+    assert loader.get() is good
+    path.unlink()  # mid atomic replace
+    assert loader.get() is good
+    assert loader.reload_errors == 2
+
+    changed = json.loads(json.dumps(FEES))
+    changed["grading"]["grading_fee"] = 25.0
+    path.write_text(json.dumps(changed))
+    assert loader.get().grading_fee == Decimal("25.0")
+
+    with pytest.raises(FileNotFoundError):
+        FeeScheduleLoader(str(tmp_path / "missing.json")).get()
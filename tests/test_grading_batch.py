@@ -0,0 +1,36 @@
+from random import Random
+
+import numpy as np
+
+from app.engine.fees import GRADE_ORDER
+from app.engine.grading import grade_probabilities
+from app.engine.grading_batch import TOLERANCE, GradeTable, grade_probabilities_batch, grade_table
+
+def _random_rows(n, on_grid):
+    rng = Random(42)
+    rows = []
+    for _ in range(n):
+        vals = [rng.randint(0, 100) / 10 if on_grid else rng.uniform(0, 10) for _ in range(4)]
+        rows.append(vals + [rng.random() < 0.3])
+    return rows
+
+def _scalar(rows):
+    return np.array([[grade_probabilities(*r)[g] for g in GRADE_ORDER] for r in rows])
+
+def _cols(rows):
+    arr = np.array(rows, dtype=object)
+    return [arr[:, i].astype(float) for i in range(4)] + [arr[:, 4].astype(bool)]
+
+def test_batch_matches_scalar():
+    rows = _random_rows(2000, on_grid=False) + [[10, 10, 10, 10, False], [0, 0, 0, 0, True]]
+    got = grade_probabilities_batch(*_cols(rows))
+    assert got.shape == (len(rows), 5)
+    assert np.abs(got - _scalar(rows)).max() < TOLERANCE
+
+def test_table_matches_scalar_on_grid_and_falls_back_off_grid():
+    rows = _random_rows(2000, on_grid=True) + _random_rows(50, on_grid=False)
+    got = grade_table().lookup(*_cols(rows))
+    assert np.abs(got - _scalar(rows)).max() < TOLERANCE
+
+def test_table_shape():
+    assert GradeTable().table.shape == (2, 401, 101, 5)
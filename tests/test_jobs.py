@@ -0,0 +1,138 @@
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.engine.schemas import DecisionRequest
+from app.main import app
+from app.services.comps_guard import ProviderUnavailable
+from app.services.jobs import JobManager
+
+def _item(query, listed=None, c=9.0):
+    return {"query": query, "listed_price": listed, "metrics": {"centering": c, "corners": 9.5, "edges": 9.0, "surface": 9.5}}
+
+ITEMS = [_item(f"card {i % 7}", listed=None if i % 3 else 10 + i, c=5 + i % 5) for i in range(23)]
+
+pytestmark = pytest.mark.usefixtures("tmp_db")
+
+def _wait(manager, job_id, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        status = manager.status(job_id)
+        if status.status in ("done", "failed", "cancelled") or time.monotonic() > deadline:
+            return status
+        time.sleep(0.02)
+
+def _results(manager, job_id):
+    return {idx: json.loads(body) for idx, _, body in manager.iter_results(job_id, page_size=5)}
+
+def _manager(workers=0, chunk_size=4, resolve=None):
+    return JobManager(resolve or routes._resolve_market, routes._load_fees, workers=workers, chunk_size=chunk_size)
+
+def test_api_job_matches_batch_endpoint(monkeypatch):
+    monkeypatch.setattr(routes, "job_manager", _manager())
+    client = TestClient(app)
+    submitted = client.post("/api/jobs", json={"items": ITEMS})
+    assert submitted.status_code == 202
+    job_id = submitted.json()["id"]
+    assert _wait(routes.job_manager, job_id).status == "done"
+
+    status = client.get(f"/api/jobs/{job_id}").json()
+    assert (status["total"], status["done"], status["fee_version"]) == (23, 23, routes._load_fees().version)
+    lines = [json.loads(line) for line in client.get(f"/api/jobs/{job_id}/results").text.splitlines()]
+    batch = client.post("/api/decision/batch", json={"items": ITEMS}).json()["results"]
+    assert [line["result"] for line in lines] == batch
+    assert [line["index"] for line in lines] == list(range(23))
+    assert lines[0]["card_key"] == routes._resolve_market("card 0")[0]
+
+    tail = client.get(f"/api/jobs/{job_id}/results", params={"after": 20, "follow": True}).text.splitlines()
+    assert [json.loads(line)["index"] for line in tail] == [21, 22]
+    assert client.get("/api/jobs/nope").status_code == 404
+    assert client.post("/api/jobs/nope/cancel").status_code == 404
+    routes.job_manager.close()
+
+def test_process_pool_results_match_inline():
+    items = [DecisionRequest.model_validate(i) for i in ITEMS]
+    inline, pool = _manager(), _manager(workers=2, chunk_size=3)
+    try:
+        a, b = inline.submit(items).id, pool.submit(items).id
+        assert _wait(inline, a).status == _wait(pool, b).status == "done"
+        assert _results(inline, a) == _results(pool, b)
+    finally:
+        inline.close()
+        pool.close()
+
+def test_interrupted_job_resumes_after_restart():
+    items = [DecisionRequest.model_validate(i) for i in ITEMS]
+    calls = []
+    first = None
+
+    def stop_midway(query):
+        calls.append(query)
+        if len(calls) == 5:
+            first._stopping.set()  # as if the server shut down mid-job
+        return routes._resolve_market(query)
+
+    first = _manager(resolve=stop_midway)
+    job_id = first.submit(items).id
+    assert first._stopping.wait(10)
+    first.close()
+    partial = first.status(job_id)
+    assert partial.status == "running" and 0 < partial.done < len(items)
+
+    second = _manager()
+    second.start()
+    assert _wait(second, job_id).status == "done"
+    second.close()
+    assert second.status(job_id).done == len(items)
+
+    reference = _manager()
+    ref_id = reference.submit(items).id
+    _wait(reference, ref_id)
+    reference.close()
+    assert _results(second, job_id) == _results(reference, ref_id)
+
+def test_cancel_queued_and_running_jobs():
+    items = [DecisionRequest.model_validate(i) for i in ITEMS]
+    release = threading.Event()
+
+    def blocking(query):
+        release.wait(10)
+        return routes._resolve_market(query)
+
+    manager = _manager(resolve=blocking, chunk_size=1)
+    running = manager.submit(items).id
+    queued = manager.submit(items).id
+    assert manager.cancel(queued).status == "cancelled"
+    assert manager.cancel(running).status == "cancelled"
+    release.set()
+    manager.close()
+    assert manager.status(running).status == "cancelled"
+    assert manager.status(running).done <= 1
+    assert _results(manager, queued) == {}
+
+def test_shed_items_fail_alone_and_stale_ones_are_degraded():
+    items = [DecisionRequest.model_validate(i) for i in ITEMS]
+
+    def guarded(query):
+        if query == "card 1":
+            raise ProviderUnavailable("test", "queue_full")
+        card_key, stats, _ = routes._resolve_market(query)
+        return card_key, stats, query == "card 2"
+
+    manager = _manager(resolve=guarded)
+    job_id = manager.submit(items).id
+    status = _wait(manager, job_id)
+    manager.close()
+    assert (status.status, status.done) == ("done", len(items))
+
+    results = _results(manager, job_id)
+    for i, item in enumerate(items):
+        if item.query == "card 1":
+            assert results[i] == {"error": "comps unavailable: comps provider test unavailable: queue_full"}
+        else:
+            assert results[i]["degraded"] == (item.query == "card 2")
+            assert ("Comps provider unavailable" in results[i]["explanation"][-1]) == (item.query == "card 2")
@@ -0,0 +1,93 @@
+import asyncio
+from collections import Counter
+
+import httpx
+import pytest
+
+from app.api import routes
+from app.engine.schemas import CardIdentity
+from app.main import app
+from app.services.comps_guard import GuardedCompsProvider, ProviderUnavailable
+from app.services.comps_provider_fake import FakeCompsProvider
+from benchmarks.loadgen import Recorder, Workload, parse_mix, percentiles, run_load
+
+IDENT = CardIdentity(card_key="0123456789abcdef", display_name="Charizard")
+
+def test_mix_and_percentiles():
+    assert parse_mix("identify=1,decision=3") == {"identify": 1.0, "decision": 3.0}
+    with pytest.raises(ValueError):
+        parse_mix("checkout=1")
+    with pytest.raises(ValueError):
+        parse_mix("comps=0")
+    p = percentiles([i / 1000 for i in range(1, 101)])
+    assert (p["p50_ms"], p["p95_ms"], p["p99_ms"]) == (51.0, 96.0, 100.0)
+
+def test_workload_is_seeded_and_zipf_skewed():
+    a = Workload(parse_mix("identify=1,comps=1,decision=2"), cards=1000, zipf=1.1, seed=4)
+    b = Workload(parse_mix("identify=1,comps=1,decision=2"), cards=1000, zipf=1.1, seed=4)
+    assert [a.next() for _ in range(200)] == [b.next() for _ in range(200)]
+
+    cards = Counter(a.pick_card() for _ in range(20_000))
+    assert cards[0] > cards[1] > cards[9] > 0
+    assert sum(cards[i] for i in range(10)) / 20_000 > 0.35  # the top 1% of cards take a large share
+    endpoints = Counter(a.pick_endpoint() for _ in range(20_000))
+    assert endpoints["decision"] / 20_000 == pytest.approx(0.5, abs=0.02)
+
+def test_recorder_intervals_and_summary():
+    t = [0.0]
+    rec = Recorder(clock=lambda: t[0])
+    for i in range(10):
+        rec.record("decision", 0.01 * (i + 1), 200 if i else 503)
+    rec.record("comps", 0.5, None)
+    t[0] = 2.0
+    row = rec.interval()
+    assert row["rps"] == 5.5 and row["errors"] == 2
+    assert rec.interval()["rps"] == 0
+    s = rec.summary()
+    assert s["total"]["requests"] == 11 and s["endpoints"]["decision"]["errors"] == 1
+    assert s["statuses"] == {"200": 9, "503": 1, "transport_error": 1}
+
+def _fails(provider):
+    try:
+        provider.get_recent_sold_comps(IDENT)
+        return False
+    except RuntimeError:
+        return True
+
+def test_fake_provider_injects_seeded_latency_and_errors():
+    flaky = FakeCompsProvider(latency_seconds=0.0, error_rate=0.25, seed=9)
+    outcomes = [not _fails(flaky) for _ in range(400)]
+    assert outcomes.count(False) == flaky.errors and 70 < flaky.errors < 130
+    again = FakeCompsProvider(latency_seconds=0.0, error_rate=0.25, seed=9)
+    assert [not _fails(again) for _ in range(400)] == outcomes
+
+    guarded = GuardedCompsProvider(FakeCompsProvider(latency_seconds=0.0, error_rate=1.0))
+    with pytest.raises(ProviderUnavailable):
+        guarded.get_recent_sold_comps(IDENT)
+
+def test_fake_provider_selected_by_env(monkeypatch):
+    monkeypatch.setenv("CARDKING_COMPS_PROVIDER", "fake")
+    monkeypatch.setenv("CARDKING_FAKE_LATENCY_MS", "120")
+    monkeypatch.setenv("CARDKING_FAKE_ERROR_RATE", "0.1")
+    provider = routes._comps_provider()
+    assert isinstance(provider, FakeCompsProvider)
+    assert (provider.latency_seconds, provider.error_rate) == (0.12, 0.1)
+
+def test_run_load_against_the_app(tmp_db):
+    workload = Workload(parse_mix("identify=1,comps=1,decision=2"), cards=50, seed=1)
+    rows = []
+
+    async def go():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await run_load(client, workload, duration=0.6, concurrency=4, interval=0.2, report=rows.append)
+
+    summary = asyncio.run(go())
+    assert summary["total"]["requests"] > 0 and summary["total"]["errors"] == 0
+    assert set(summary["endpoints"]) <= {"identify", "comps", "decision"}
+    assert rows and all(r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"] for r in rows)
+
+    async def open_loop():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await run_load(client, workload, duration=0.5, concurrency=4, rate=40, interval=1.0)
+
+    assert 5 < asyncio.run(open_loop())["total"]["requests"] < 60
@@ -0,0 +1,162 @@
+import json
+import threading
+import time
+
+import pytest
+
+from app.data import db
+from app.data.log_writer import DecisionLogWriter, LogRecord
+from app.engine.schemas import CardIdentifyRequest
+
+pytestmark = pytest.mark.usefixtures("tmp_db")
+
+def _rec(i):
+    return LogRecord(f"t{i}", CardIdentifyRequest(query=f"q{i}"), CardIdentifyRequest(query="r"), "v1")
+
+def _count():
+    with db.connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM decision_log").fetchone()[0]
+
+def test_group_commit_batches_rows():
+    w = DecisionLogWriter(batch_size=50, flush_interval_ms=20)
+    w.submit_many(_rec(i) for i in range(120))
+    w.flush()
+    s = w.stats()
+    assert s["written"] == 120
+    assert s["batches"] < 120
+    assert _count() == 120
+    w.close()
+
+def test_close_flushes_pending_rows():
+    w = DecisionLogWriter(batch_size=1000, flush_interval_ms=10000)
+    w.submit_many(_rec(i) for i in range(10))
+    w.close()
+    assert _count() == 10
+
+class _SlowWriter(DecisionLogWriter):
+    def __init__(self, gate, **kw):
+        super().__init__(**kw)
+        self.gate = gate
+
+    def _write(self, rows):
+        self.gate.wait()
+        super()._write(rows)
+
+def test_drop_policy_counts_overflow():
+    gate = threading.Event()
+    w = _SlowWriter(gate, batch_size=1, max_queue=2, full_policy="drop")
+    queued = w.submit_many(_rec(i) for i in range(10))
+    gate.set()
+    w.close()
+    s = w.stats()
+    assert s["dropped"] == 10 - queued
+    assert s["dropped"] > 0
+    assert _count() == queued
+
+def test_spill_policy_replays_on_start(tmp_path):
+    spill = str(tmp_path / "spill.ndjson")
+    gate = threading.Event()
+    w = _SlowWriter(gate, batch_size=1, max_queue=2, full_policy="spill", spill_path=spill)
+    queued = w.submit_many(_rec(i) for i in range(10))
+    gate.set()
+    w.close()
+    assert w.stats()["spilled"] == 10 - queued
+    assert _count() == queued
+
+    again = DecisionLogWriter(full_policy="spill", spill_path=spill)
+    again.start()
+    again.close()
+    assert _count() == 10
+
+class _FailingWriter(DecisionLogWriter):
+    def __init__(self, failures, **kw):
+        super().__init__(retry_backoff_ms=1, **kw)
+        self.failures = failures
+
+    def _write(self, rows):
+        if self.failures > 0:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        super()._write(rows)
+
+def test_failed_batch_is_retried():
+    w = _FailingWriter(2, batch_size=100, flush_interval_ms=10000)
+    w.submit_many(_rec(i) for i in range(10))
+    w.close()
+    s = w.stats()
+    assert (s["written"], s["write_retries"], s["write_errors"]) == (10, 2, 0)
+    assert _count() == 10
+
+@pytest.mark.parametrize("payloads", ["full", "compressed"])
+def test_failed_batch_is_spilled_and_replayed(tmp_path, payloads):
+    spill = str(tmp_path / "spill.ndjson")
+    w = _FailingWriter(3, batch_size=100, flush_interval_ms=10000, spill_path=spill, payloads=payloads)
+    w.submit_many(_rec(i) for i in range(10))
+    w.close()
+    s = w.stats()
+    assert (s["written"], s["spilled"], s["write_errors"]) == (0, 10, 0)
+    assert _count() == 0
+
+    again = DecisionLogWriter(spill_path=spill)
+    again.start()
+    again.close()
+    assert _count() == 10
+
+def test_failed_batch_without_spill_path_is_counted():
+    w = _FailingWriter(3, batch_size=100, flush_interval_ms=10000)
+    w.submit_many(_rec(i) for i in range(10))
+    w.close()
+    assert w.stats()["write_errors"] == 10
+
+def test_submit_during_close_does_not_start_a_second_thread():
+    gate = threading.Event()
+    w = _SlowWriter(gate, batch_size=1)
+    w.submit(_rec(0))
+    thread = w._thread
+    closer = threading.Thread(target=w.close, daemon=True)
+    closer.start()
+    deadline = time.monotonic() + 5
+    while w._queue.qsize() == 0 and time.monotonic() < deadline:  # until the stop sentinel is queued
+        time.sleep(0.001)
+    w.submit(_rec(1))
+    started = w._thread
+    gate.set()
+    closer.join(5)
+    assert started is thread
+    assert not closer.is_alive()
+    assert w._thread is None
+    w.close()
+
+def test_torn_spill_line_is_set_aside(tmp_path):
+    spill = tmp_path / "spill.ndjson"
+    good = json.dumps(list(_rec(1).to_row()))
+    spill.write_text(good + "\n" + good[:30])  # crashed mid-append
+    w = DecisionLogWriter(spill_path=str(spill))
+    w.start()
+    w.close()
+    assert _count() == 1
+    assert not spill.exists()
+    assert (tmp_path / "spill.ndjson.bad").read_text() == good[:30] + "\n"
+    assert w.stats()["spill_bad_lines"] == 1
+
+def test_spill_replay_failure_keeps_the_file(tmp_path):
+    spill = tmp_path / "spill.ndjson"
+    spill.write_text(json.dumps(list(_rec(1).to_row())) + "\n")
+    w = _FailingWriter(1, spill_path=str(spill))
+    w.start()  # must not raise
+    w.close()
+    assert spill.exists() and w.stats()["spill_replay_errors"] == 1
+
+    again = DecisionLogWriter(spill_path=str(spill))
+    again.start()
+    again.close()
+    assert _count() == 1 and not spill.exists()
+
+def test_unwritable_spill_file_never_fails_the_producer(tmp_path):
+    gate = threading.Event()
+    spill = str(tmp_path / "missing-dir" / "spill.ndjson")
+    w = _SlowWriter(gate, batch_size=1, max_queue=1, full_policy="spill", spill_path=spill)
+    queued = w.submit_many(_rec(i) for i in range(5))
+    gate.set()
+    w.close()
+    assert w.stats()["dropped"] == 5 - queued > 0
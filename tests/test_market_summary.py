@@ -0,0 +1,72 @@
+from decimal import Decimal
+from random import Random
+
+from app.engine.market import (
+    comps_confidence,
+    median,
+    percentile,
+    quantize_money,
+    spread_ratio,
+    summarize,
+    trimmed_mean,
+)
+from app.engine.sketch import KllSketch, summarize_sketch
+
+def test_summary_matches_individual_functions():
+    rng = Random(7)
+    for n in [1, 2, 3, 4, 10, 11, 57]:
+        vals = [Decimal(str(round(rng.uniform(1, 500), 2))) for _ in range(n)]
+        s = summarize(vals)
+        p25 = quantize_money(percentile(vals, 25))
+        med = quantize_money(median(vals))
+        p75 = quantize_money(percentile(vals, 75))
+        assert (s.p25, s.median, s.p75) == (p25, med, p75)
+        assert s.trimmed_mean == quantize_money(trimmed_mean(vals))
+        assert s.spread_ratio == spread_ratio(p25, p75, med)
+        assert s.confidence == comps_confidence(n, s.spread_ratio)
+        assert s.count == n
+
+def _exact_rank(sorted_vals, x):
+    lo, hi = 0, len(sorted_vals)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if sorted_vals[mid] <= x:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo / len(sorted_vals)
+
+def test_sketch_rank_error_within_bound():
+    rng = Random(11)
+    vals = [rng.lognormvariate(4, 0.5) for _ in range(50000)]
+    sk = KllSketch(k=200)
+    sk.update_many(vals)
+    assert sk.retained() < 2000
+    ordered = sorted(vals)
+    for q in [0.1, 0.25, 0.5, 0.75, 0.9]:
+        assert abs(_exact_rank(ordered, sk.quantile(q)) - q) < 0.02
+
+def test_sketch_merge_across_shards():
+    rng = Random(3)
+    vals = [rng.uniform(10, 100) for _ in range(40000)]
+    shards = [KllSketch(k=200, seed=i) for i in range(4)]
+    for i, v in enumerate(vals):
+        shards[i % 4].update(v)
+    merged = KllSketch(k=200)
+    for sh in shards:
+        merged.merge(KllSketch.from_dict(sh.to_dict()))
+    assert merged.n == len(vals)
+    ordered = sorted(vals)
+    for q in [0.25, 0.5, 0.75]:
+        assert abs(_exact_rank(ordered, merged.quantile(q)) - q) < 0.02
+
+def test_sketch_summary_close_to_exact():
+    rng = Random(5)
+    vals = [round(rng.uniform(50, 150), 2) for _ in range(20000)]
+    sk = KllSketch()
+    sk.update_many(vals)
+    approx = summarize_sketch(sk)
+    exact = summarize(Decimal(str(v)) for v in vals)
+    assert abs(approx.median - exact.median) < Decimal("3")
+    assert abs(approx.trimmed_mean - exact.trimmed_mean) < Decimal("3")
+    assert approx.count == exact.count
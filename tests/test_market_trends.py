@@ -0,0 +1,141 @@
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from random import Random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.data import sold_comps
+from app.engine.schemas import DecisionRequest, SoldComp
+from app.engine.skiplist import IndexableSkiplist
+from app.engine.trend import RollingWindows
+from app.main import app
+from app.services.jobs import JobManager
+from app.services.market_trends import TrendTracker
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+pytestmark = pytest.mark.usefixtures("tmp_db")
+
+def _weighted_median(pairs):
+    pairs = sorted(pairs)
+    half, acc = sum(w for _, _, w in pairs) / 2, 0.0
+    for value, _, w in pairs:
+        acc += w
+        if acc >= half:
+            return value
+    return pairs[-1][0]
+
+def test_skiplist_matches_sorted_list():
+    rng = Random(5)
+    sl, ref = IndexableSkiplist(), []
+    for step in range(6000):
+        if ref and rng.random() < 0.45:
+            value, key, _ = ref.pop(rng.randrange(len(ref)))
+            sl.remove(value, key)
+        else:
+            item = (rng.randint(1, 40), step, rng.random())
+            ref.append(item)
+            sl.insert(*item)
+        if step % 300 == 0 and ref:
+            s = sorted(ref)
+            assert [sl[i] for i in range(len(s))] == [v for v, _, _ in s]
+            assert [sl.sum_smallest(k) for k in range(len(s) + 1)] == [sum(v for v, _, _ in s[:k]) for k in range(len(s) + 1)]
+            assert sl.weighted_median() == _weighted_median(s)
+    with pytest.raises(KeyError):
+        sl.remove(10_000, 0)
+
+def _sales(rng, n, start, span_days):
+    return [
+        SoldComp(
+            sold_price=Decimal(rng.randint(100, 30000)).scaleb(-2),
+            sold_date_utc=(start + timedelta(days=rng.uniform(0, span_days))).isoformat(),
+            title="t",
+            listing_id=f"L{rng.random()}",
+        )
+        for _ in range(n)
+    ]
+
+def test_rolling_windows_match_table_window_stats_as_time_moves():
+    rng = Random(7)
+    rolling = RollingWindows((7, 30, 90), half_life_days=5)
+    now = NOW - timedelta(days=200)
+    for _ in range(60):
+        now += timedelta(days=rng.uniform(0, 6))
+        batch = _sales(rng, rng.randint(0, 25), now - timedelta(days=100), 101)  # late and slightly future sales too
+        sold_comps.append("k", batch, now)
+        for c in batch:
+            rolling.add(sold_comps.normalize_date(c.sold_date_utc), int(c.sold_price * 100))
+        rolling.advance(now)
+        for days in (7, 30, 90):
+            expected = sold_comps.window_stats("k", days, now)
+            got = rolling.summary(days)
+            assert (got is None) == (expected is None)
+            if got is not None:
+                assert (got.p25, got.median, got.p75, got.count, got.confidence) == (
+                    expected.p25, expected.median, expected.p75, expected.comps_count, expected.confidence)
+        cutoff, now_iso = (now - timedelta(days=90)).isoformat(), now.isoformat()
+        window = [c for c in sold_comps.recent("k", 90, now)]
+        if window:
+            pairs = [(int(c.sold_price * 100), i, 2 ** ((datetime.fromisoformat(c.sold_date_utc) - now).total_seconds() / (5 * 86400)))
+                     for i, c in enumerate(window)]
+            assert rolling.ew_median() == Decimal(_weighted_median(pairs)).scaleb(-2)
+        assert all(cutoff <= c.sold_date_utc <= now_iso for c in window)
+    with pytest.raises(ValueError):
+        rolling.advance(now - timedelta(seconds=1))
+
+def test_tracker_pulls_new_sales_incrementally():
+    rng = Random(9)
+    clock = {"now": NOW}
+    tracker = TrendTracker(half_life_days=7, clock=lambda: clock["now"])
+    sold_comps.append("k", _sales(rng, 40, NOW - timedelta(days=120), 120), NOW)
+    first = tracker.trend("k")
+    assert first.windows["90"] == sold_comps.window_stats("k", 90, NOW)
+
+    recent = [c.model_copy(update={"sold_price": Decimal("999.00")}) for c in _sales(rng, 30, NOW - timedelta(days=2), 2)]
+    sold_comps.append("k", recent, NOW)
+    assert tracker.trend("k") == first  # not notified yet
+    tracker.notify("k")
+    clock["now"] = NOW + timedelta(days=1)
+    later = tracker.trend("k")
+    for days in ("7", "30", "90"):
+        assert later.windows[days] == sold_comps.window_stats("k", float(days), clock["now"])
+    assert later.ew_median > first.ew_median and later.momentum > 0
+    assert tracker.window_stats("k", 7) == later.windows["7"]
+
+    clock["now"] = NOW  # back in time: reloaded from the table
+    assert tracker.trend("k").windows["30"] == sold_comps.window_stats("k", 30, NOW)
+    with pytest.raises(KeyError):
+        tracker.window_stats("k", 14)
+
+def test_recency_weighted_decisions():
+    routes._comps_cache.invalidate()  # fetch again, so the sales history lands in this test's database
+    client = TestClient(app)
+    item = {"query": "Charizard base set", "listed_price": 30, "metrics": {"centering": 9, "corners": 9, "edges": 9, "surface": 9}}
+    plain = client.post("/api/decision", json=item).json()
+    card_key = client.post("/api/identify", json={"query": item["query"]}).json()["card_key"]
+    trend = client.get(f"/api/comps/{card_key}/trend").json()
+    assert set(trend["windows"]) == {"7", "30", "90"} and trend["ew_median"] is not None
+
+    weighted = client.post("/api/decision", json={**item, "recency_weighted": True}).json()
+    assert weighted["market_value"]["median"] == trend["ew_median"]
+    assert plain["market_value"]["median"] == routes._comps_cache.lookup(routes.identify(routes.CardIdentifyRequest(query=item["query"]))).stats.model_dump(mode="json")["median"]
+    assert client.post("/api/decision", json={**item, "recency_weighted": True}).json() == weighted
+
+    batch = client.post("/api/decision/batch", json={"items": [item, {**item, "recency_weighted": True}]}).json()
+    assert batch["results"] == [plain, weighted]
+    windows = client.get(f"/api/comps/{card_key}/windows", params={"days": [7, 14]}).json()
+    assert windows["7"] == trend["windows"]["7"] and "14" in windows
+
+    manager = JobManager(routes._resolve_market, routes._load_fees, workers=0, recency=routes._recency_weighted)
+    try:
+        job = manager.submit([DecisionRequest(**item), DecisionRequest(**item, recency_weighted=True)])
+        deadline = time.monotonic() + 30
+        while manager.status(job.id).status != "done" and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert [json.loads(body) for _, _, body in manager.iter_results(job.id)] == [plain, weighted]
+    finally:
+        manager.close()
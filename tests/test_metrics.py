@@ -0,0 +1,80 @@
+import asyncio
+import re
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.main import RequestMetricsMiddleware, app
+from app.services.metrics import REGISTRY, REQUESTS_TOTAL, Registry, stage, STAGE_SECONDS
+
+def test_histogram_and_counter_render_prometheus_text():
+    reg = Registry()
+    h = reg.histogram("x_seconds", "x", labels=("stage",), buckets=(0.1, 1.0))
+    c = reg.counter("x_total", "x", labels=("path",))
+    h.observe(0.05, "a")
+    h.observe(0.5, "a")
+    h.observe(5.0, "a")
+    c.inc("/p")
+    reg.gauges("x_pool", "Pool", lambda: {"size": 4, "name": "ignored", "checkouts": 9}, counters=("checkouts",))
+    text = reg.render()
+    assert 'x_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'x_seconds_bucket{stage="a",le="1"} 2' in text
+    assert 'x_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'x_seconds_count{stage="a"} 3' in text
+    assert 'x_total{path="/p"} 1' in text
+    assert "x_pool_size 4" in text
+    assert "# HELP x_pool_size Pool: size\n# TYPE x_pool_size gauge" in text
+    assert "# HELP x_pool_checkouts_total Pool: checkouts\n# TYPE x_pool_checkouts_total counter\nx_pool_checkouts_total 9" in text
+    assert "x_pool_name" not in text
+
+def test_stage_records_time():
+    before = STAGE_SECONDS.count("unit_test_stage")
+    with stage("unit_test_stage"):
+        pass
+    assert STAGE_SECONDS.count("unit_test_stage") == before + 1
+
+def test_metrics_endpoint_reports_pipeline_stages(tmp_db):
+    client = TestClient(app)
+    payload = {"query": "metrics card", "metrics": {"centering": 9, "corners": 9, "edges": 9, "surface": 9}}
+    assert client.post("/api/decision", json=payload).status_code == 200
+    text = client.get("/metrics").text
+    for name in ["identify", "comps", "grading", "decide", "response_build", "log_enqueue"]:
+        assert f'cardking_stage_seconds_count{{stage="{name}"}}' in text
+    assert 'cardking_requests_total{path="/api/decision",method="POST",status="200"}' in text
+    assert "cardking_comps_cache_misses" in text
+
+def test_streaming_responses_are_timed_to_the_last_chunk():
+    streamer = FastAPI()
+    streamer.add_middleware(RequestMetricsMiddleware)
+
+    @streamer.get("/stream/{n}")
+    def stream(n: int):
+        async def chunks():
+            for _ in range(n):
+                await asyncio.sleep(0.05)
+                yield b"x"
+        return StreamingResponse(chunks(), status_code=207)
+
+    assert TestClient(streamer).get("/stream/4").content == b"xxxx"
+    total = re.search(r'cardking_request_seconds_sum\{path="/stream/\{n\}"\} (\S+)', REGISTRY.render())
+    assert float(total.group(1)) >= 0.2
+    assert REQUESTS_TOTAL.value("/stream/{n}", "GET", "207") == 1
+
+def test_profiler_endpoints_are_off_unless_configured(monkeypatch):
+    import app.main as main
+    from app.services.metrics import PROFILER
+
+    monkeypatch.setattr(PROFILER, "interval", PROFILER.interval)
+    monkeypatch.setattr(PROFILER, "slow_seconds", PROFILER.slow_seconds)
+    client = TestClient(app)
+    assert client.post("/metrics/profiler", params={"enabled": True}).status_code == 404
+    assert client.get("/metrics/profiler/captures").status_code == 404
+    assert not PROFILER.enabled
+
+    monkeypatch.setattr(main, "PROFILER_ENDPOINTS", True)
+    assert client.post("/metrics/profiler", params={"enabled": False, "interval_ms": 0.01}).status_code == 422
+    assert client.post("/metrics/profiler", params={"enabled": False, "slow_ms": 0}).status_code == 422
+    status = client.post("/metrics/profiler", params={"enabled": False, "interval_ms": 20, "slow_ms": 500}).json()
+    assert (status["interval_ms"], status["slow_ms"]) == (20, 500)
+    assert client.get("/metrics/profiler/captures").status_code == 200
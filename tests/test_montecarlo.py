@@ -0,0 +1,97 @@
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.engine.fees import GRADE_ORDER, FeeSchedule
+from app.engine.montecarlo import price_sigma, simulate_roi
+from app.engine.roi import roi_summary
+from app.main import app
+from tests.test_engine_decision import FEES
+
+SCHEDULE = FeeSchedule.from_dict(FEES)
+PROBS = {"PSA10": 0.15, "PSA9": 0.35, "PSA8": 0.30, "PSA7": 0.12, "LT7": 0.08}
+ROW = [PROBS[g] for g in GRADE_ORDER]
+METRICS = {"centering": 9.0, "corners": 9.5, "edges": 9.0, "surface": 9.5, "issue_flag": False}
+
+@pytest.fixture
+def client(tmp_db):
+    routes._comps_cache.invalidate()
+    return TestClient(app)
+
+def _nets(median):
+    keep = 1 - SCHEDULE.platform_fee_pct - SCHEDULE.risk_discount_pct
+    cost = SCHEDULE.grading_fee + SCHEDULE.shipping_insurance
+    return [float(median * m * keep - cost) for m in SCHEDULE.multiplier_vector]
+
+def test_without_spread_matches_roi_summary():
+    median = Decimal("60")
+    (d,), _ = simulate_roi([60.0], [60.0], [60.0], [ROW], SCHEDULE, samples=200_000, seed=3)
+    expected, _, _ = roi_summary(median, PROBS, fees=SCHEDULE)
+    nets = _nets(median)
+
+    assert d.mean_net == pytest.approx(float(expected), abs=0.25)
+    assert d.p_loss == pytest.approx(sum(p for p, n in zip(ROW, nets) if n < 0), abs=0.005)
+    for q in (d.p10_net, d.p90_net):
+        assert min(abs(q - n) for n in nets) < 1e-3  # only the five grade outcomes are possible
+    assert d.var_95 == pytest.approx(max(0.0, -min(nets)), abs=1e-3)
+
+def test_spread_is_a_lognormal_around_the_median():
+    sigma = price_sigma(80.0, 125.0)
+    z = np.random.default_rng(0).standard_normal(200_000) * sigma
+    assert np.percentile(100 * np.exp(z), [25, 75]) == pytest.approx([80.0, 125.0], rel=0.01)
+    assert price_sigma(100.0, 100.0) == 0.0
+
+def test_seeded_streams_are_independent_of_chunking():
+    medians = [40.0, 120.0, 75.0, 300.0, 15.0]
+    p25s = [m * 0.8 for m in medians]
+    p75s = [m * 1.25 for m in medians]
+    probs = np.tile(ROW, (5, 1))
+    whole, total = simulate_roi(medians, p25s, p75s, probs, SCHEDULE, samples=5001, seed=7)
+    chunked, total_chunked = simulate_roi(medians, p25s, p75s, probs, SCHEDULE, samples=5001, seed=7, chunk_elements=6000)
+    assert whole == chunked
+    assert total == total_chunked
+
+    (alone,), _ = simulate_roi(medians[3:4], p25s[3:4], p75s[3:4], probs[3:4], SCHEDULE, samples=5001, seed=7, streams=[3])
+    assert alone == whole[3]
+    reseeded, _ = simulate_roi(medians, p25s, p75s, probs, SCHEDULE, samples=5001, seed=8)
+    assert reseeded != whole
+
+    assert total.mean_net == pytest.approx(sum(d.mean_net for d in whole), rel=1e-6)
+    # independent cards diversify: the batch's spread is narrower than the sum of the cards'
+    assert total.p90_net - total.p10_net < sum(d.p90_net - d.p10_net for d in whole)
+    with pytest.raises(ValueError):
+        simulate_roi(medians, p25s, p75s, probs, SCHEDULE, streams=[0])
+
+def test_decision_distribution_is_opt_in_and_matches_batch(client):
+    plain = client.post("/api/decision", json={"query": "charizard base holo", "metrics": METRICS}).json()
+    assert plain["roi_distribution"] is None
+
+    item = {"query": "charizard base holo", "metrics": METRICS, "roi_samples": 2000, "roi_seed": 11}
+    single = client.post("/api/decision", json=item).json()
+    dist = single["roi_distribution"]
+    assert dist["samples"] == 2000 and dist["seed"] == 11
+    assert 0 <= dist["p_loss"] <= 1 and dist["p10_net"] <= dist["p90_net"]
+    assert client.post("/api/decision", json=item).json() == single  # served from the decision cache
+
+    batch = client.post("/api/decision/batch", json={"items": [item, {**item, "query": "pikachu promo"}]}).json()
+    assert batch["results"][0] == single
+    assert batch["results"][1]["roi_distribution"]["samples"] == 2000
+
+def test_grading_submission(client):
+    items = [
+        {"id": "a", "query": "charizard base holo", "metrics": METRICS},
+        {"id": "b", "query": "blastoise base holo", "metrics": {**METRICS, "surface": 7.0}},
+    ]
+    body = client.post("/api/grading/submission", json={"items": items, "samples": 3000, "seed": 5}).json()
+    assert [c["id"] for c in body["cards"]] == ["a", "b"]
+    assert Decimal(body["expected_net"]) == sum(Decimal(c["expected_net"]) for c in body["cards"])
+    total = body["total"]
+    assert total["mean_net"] == pytest.approx(sum(c["distribution"]["mean_net"] for c in body["cards"]), abs=0.02)
+    assert total["p10_net"] <= total["p90_net"] and total["value_at_risk_95"] >= 0
+    assert client.post("/api/grading/submission", json={"items": items, "samples": 3000, "seed": 5}).json() == body
+
+    too_many = {"items": items * 501, "samples": 100_000}
+    assert client.post("/api/grading/submission", json=too_many).status_code == 422
@@ -0,0 +1,126 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.data import db
+from app.engine.fees import FeeSchedule
+from app.main import app
+from app.services.portfolio_import import PortfolioEvaluator, parse_csv, parse_ndjson
+from tests.test_engine_decision import FEES
+
+CSV = """id,query,centering,corners,edges,surface,issue_flag,purchase_price
+a1,Charizard base set,9,9.5,9,9.5,,12.50
+a2,LeBron topps rookie,7.5,8,8,8,no,
+a3,Pikachu promo,6,6,6,6,yes,3
+a4,Broken row,eleven,9,9,9,,
+a5,Charizard base set,8,8,8,8,0,40
+"""
+
+@pytest.fixture()
+def client(tmp_db):
+    return TestClient(app)
+
+def _post(client, body, **params):
+    r = client.post("/api/portfolio/p1/import", content=body, params=params, headers={"content-type": "text/csv"})
+    assert r.status_code == 200
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    return {line["row"]: line for line in lines[:-1]}, lines[-1]["summary"]
+
+def test_import_streams_results_and_reuses_unchanged_rows(client):
+    rows, summary = _post(client, CSV)
+    assert summary == {"rows": 5, "recomputed": 4, "unchanged": 0, "errors": 1, "removed": 0}
+    assert "error" in rows["a4"]
+    assert rows["a1"]["purchase_price"] == "12.50" and rows["a2"]["purchase_price"] is None
+    single = client.post("/api/decision", json={"query": "Charizard base set", "metrics": {
+        "centering": 9, "corners": 9.5, "edges": 9, "surface": 9.5}}).json()
+    assert rows["a1"]["result"] == single
+
+    again, summary = _post(client, CSV)
+    assert summary["recomputed"] == 0 and summary["unchanged"] == 4
+    assert all(not r.get("changed", False) for r in again.values())
+    assert {k: r.get("result") for k, r in again.items()} == {k: r.get("result") for k, r in rows.items()}
+
+    edited, summary = _post(client, CSV.replace("a3,Pikachu promo,6,6,6,6", "a3,Pikachu promo,9,9,9,9"))
+    assert summary["recomputed"] == 1 and edited["a3"]["changed"] is True
+
+    stored = [json.loads(line) for line in client.post("/api/portfolio/p1/evaluate").text.splitlines()]
+    assert stored[-1]["summary"]["recomputed"] == 0 and len(stored) == 5
+
+def test_ndjson_upload_with_replace(client):
+    _post(client, CSV)
+    body = "\n".join([
+        json.dumps({"id": "a1", "query": "Charizard base set", "metrics": {"centering": 9, "corners": 9.5, "edges": 9, "surface": 9.5}, "purchase_price": "15"}),
+        "not json",
+        "",
+    ])
+    r = client.post("/api/portfolio/p1/import", content=body, params={"replace": True},
+                    headers={"content-type": "application/x-ndjson"})
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert lines[0]["changed"] is False and lines[0]["purchase_price"] == "15"
+    assert lines[1]["row"] == "2" and "invalid JSON" in lines[1]["error"]
+    assert lines[-1]["summary"]["removed"] == 3
+    stored = client.post("/api/portfolio/p1/evaluate").text.splitlines()
+    assert json.loads(stored[0])["purchase_price"] == "15.00" and len(stored) == 2
+
+def test_replace_keeps_rows_that_failed_to_resolve(client):
+    down = {"query": None}
+
+    def resolve(q):
+        if q == down["query"]:
+            raise RuntimeError("comps provider unavailable")
+        return routes._resolve_snapshot(q)
+
+    evaluator = PortfolioEvaluator(resolve, routes._load_fees)
+    upload = lambda: list(evaluator.run("p4", parse_csv(CSV.splitlines(keepends=True)), replace=True))
+    upload()
+    down["query"] = "LeBron topps rookie"
+    summary = json.loads(upload()[-1].splitlines()[-1])["summary"]
+    assert summary["errors"] == 2 and summary["removed"] == 0
+    assert len(client.post("/api/portfolio/p4/evaluate").text.splitlines()) == 5
+
+def test_fee_and_comps_changes_invalidate(client):
+    snapshot = {"v": "s1"}
+    fees = {"f": routes._load_fees()}
+    evaluator = PortfolioEvaluator(
+        lambda q: (routes._resolve_market(q)[0], routes._resolve_market(q)[1], snapshot["v"]),
+        lambda: fees["f"],
+        batch_size=2,
+    )
+
+    def run():
+        lines = [json.loads(line) for chunk in evaluator.run("p2", parse_csv(CSV.splitlines(keepends=True))) for line in chunk.splitlines()]
+        return lines[-1]["summary"]["recomputed"]
+
+    assert run() == 4 and run() == 0
+    snapshot["v"] = "s2"
+    assert run() == 4
+    fees["f"] = FeeSchedule.from_dict({**FEES, "platform": {"platform_fee_pct": 0.2}})
+    assert run() == 4 and run() == 0
+
+def test_refetching_identical_comps_keeps_rows_unchanged(client):
+    evaluator = PortfolioEvaluator(routes._resolve_snapshot, routes._load_fees)
+    upload = lambda: json.loads(list(evaluator.run("p5", parse_csv(CSV.splitlines(keepends=True))))[-1].splitlines()[-1])["summary"]
+    assert upload()["recomputed"] == 4
+
+    # every cached entry is past its staleness limit, so the next lookups go back to the provider
+    with db.connection() as conn:
+        conn.execute("UPDATE comps_cache SET fetched_at_utc = '2000-01-01T00:00:00+00:00'")
+    routes._comps_cache.invalidate()
+    misses = routes._comps_cache.stats()["misses"]
+    assert upload()["recomputed"] == 0
+    assert routes._comps_cache.stats()["misses"] > misses
+
+def test_input_is_consumed_lazily(client):
+    consumed = []
+
+    def rows():
+        for i, row in enumerate(parse_ndjson(json.dumps({"query": f"card {i}", "centering": 9, "corners": 9, "edges": 9, "surface": 9}) for i in range(10))):
+            consumed.append(i)
+            yield row
+
+    out = PortfolioEvaluator(routes._resolve_snapshot, routes._load_fees, batch_size=3).run("p3", rows())
+    first = next(out)
+    assert len(first.splitlines()) == 3 and len(consumed) == 3
+    assert json.loads(list(out)[-1])["summary"]["rows"] == 10
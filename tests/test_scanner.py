@@ -0,0 +1,116 @@
+import io
+import json
+from decimal import Decimal
+from random import Random
+
+import pytest
+
+from app.api import routes
+from app.engine.decision import decide
+from app.engine.fees import FeeSchedule
+from app.engine.schemas import MarketStats
+from app.services import scanner as scanner_mod
+from app.services.evaluation import grade_probs_for
+from app.services.scanner import DEFAULT_METRICS, Scanner, ThresholdTable, max_buy_cents, read_csv, read_ndjson
+from tests.test_engine_decision import FEES
+
+SCHEDULE = FeeSchedule.from_dict(FEES)
+CARDS = ["Charizard base set", "LeBron topps rookie", "Pikachu promo", "Mewtwo holo"]
+
+pytestmark = pytest.mark.usefixtures("tmp_db")
+
+def test_threshold_is_exactly_the_buy_boundary():
+    rng = Random(3)
+    probs = grade_probs_for(DEFAULT_METRICS)
+    for _ in range(3000):
+        p25 = Decimal(rng.randint(100, 200_000)).scaleb(-2)
+        count = rng.randint(0, 12)
+        limit = max_buy_cents(p25, count, SCHEDULE)
+        for cents in ([limit, limit + 1] if limit is not None else [1, rng.randint(1, 10**6)]):
+            res = decide(p25, p25 * 2, p25 * 3, count, probs, SCHEDULE, listed_price=Decimal(cents).scaleb(-2))
+            assert (res.decision == "BUY") == (limit is not None and cents <= limit)
+
+def _listings():
+    table = {q: routes._resolve_market(q)[0] for q in CARDS}
+    rows = []
+    for i, q in enumerate(CARDS * 3):
+        p25 = routes._resolve_market(q)[1].p25
+        price = (Decimal(p25) * Decimal("0.5" if i % 2 else "1.1")).quantize(Decimal("0.01"))
+        rows.append({"listing_id": f"l{i}", "title": q, "price": str(price)} if i % 3 else
+                    {"listing_id": f"l{i}", "card_key": table[q], "price": str(price)})
+    rows.append({"listing_id": "x", "title": "some other card", "price": "1.00"})
+    rows.append({"listing_id": "bad", "title": CARDS[0], "price": "0.001"})
+    return rows
+
+def _expected_buys(rows):
+    buys = set()
+    for r in rows:
+        q = r.get("title") or next(c for c in CARDS if routes._resolve_market(c)[0] == r["card_key"])
+        if q not in CARDS or r["price"] == "0.001":
+            continue
+        m = DEFAULT_METRICS.model_dump()
+        body = routes.decision(routes.DecisionRequest(query=q, listed_price=r["price"], metrics=m)).body
+        if json.loads(body)["decision"] == "BUY":
+            buys.add(r["listing_id"])
+    return buys
+
+def test_scanner_matches_full_decide():
+    table = ThresholdTable(routes._resolve_snapshot, routes._load_fees)
+    table.watch(CARDS)
+    scanner = Scanner(table, routes._load_fees, key_for=routes._card_key_for)
+    rows = _listings()
+    hits = list(scanner.scan(read_ndjson(json.dumps(r) for r in rows)))
+    assert {h["listing_id"] for h in hits} == _expected_buys(rows) != set()
+    assert all(h["decision"]["decision"] == "BUY" for h in hits)
+    assert scanner.counters["scanned"] == len(rows) - 1
+    assert scanner.counters["matched"] == len(CARDS) * 3
+    assert scanner.counters["candidates"] >= scanner.counters["buys"] == len(hits)
+
+    csv_feed = io.StringIO("listing_id,title,price\n" + "".join(f"{r['listing_id']},{r.get('title', '')},{r['price']}\n" for r in rows if "title" in r))
+    assert {h["listing_id"] for h in Scanner(table, routes._load_fees, key_for=routes._card_key_for).scan(read_csv(csv_feed))} \
+        == {h["listing_id"] for h in hits if "title" in next(r for r in rows if r["listing_id"] == h["listing_id"])}
+
+def test_table_persists_and_refreshes_on_fee_and_comps_changes():
+    fees = {"f": SCHEDULE}
+    calls = []
+
+    def resolve(q):
+        calls.append(q)
+        return routes._resolve_snapshot(q)
+
+    table = ThresholdTable(resolve, lambda: fees["f"])
+    watched = {t.card_key: t for t in table.watch(CARDS)}
+    reloaded = ThresholdTable(resolve, lambda: fees["f"])
+    reloaded.load()
+    assert {t.card_key: t for t in reloaded.all()} == watched
+
+    assert table.refresh() == 0
+    fees["f"] = FeeSchedule.from_dict({**FEES, "decision_thresholds": {**FEES["decision_thresholds"], "buy_undervalue_margin": 0.5}})
+    calls.clear()
+    assert table.refresh() == len(CARDS) and calls == []
+    for key, t in watched.items():
+        assert table.get(key).max_buy_cents == max_buy_cents(Decimal(t.p25_cents).scaleb(-2), t.comps_count, fees["f"])
+
+    key = next(iter(watched))
+    table.mark_dirty(key)
+    table.mark_dirty("not-watched")
+    assert table.refresh() == 1 and len(calls) == 1
+    assert table.unwatch(key) and table.get(key) is None and not table.unwatch(key)
+
+def test_api_and_cli(monkeypatch, tmp_path):
+    monkeypatch.setattr(routes, "buy_thresholds", ThresholdTable(routes._resolve_snapshot, routes._load_fees))
+    from fastapi.testclient import TestClient
+    from app.main import app
+    client = TestClient(app)
+    out = client.post("/api/scanner/watch", json={"queries": CARDS[:2]}).json()
+    assert [t["query"] for t in out] == CARDS[:2] and all(t["max_buy_price"] for t in out)
+    assert len(client.get("/api/scanner/thresholds").json()) == 2
+
+    watch = tmp_path / "watch.txt"
+    watch.write_text("\n".join(CARDS) + "\n")
+    rows = _listings()
+    stdout = io.StringIO()
+    stdin = io.StringIO("\n".join(json.dumps(r) for r in rows))
+    assert scanner_mod.main(["--watch", str(watch)], stdin=stdin, stdout=stdout) == 0
+    assert {json.loads(line)["listing_id"] for line in stdout.getvalue().splitlines()} == _expected_buys(rows)
+    assert client.delete(f"/api/scanner/thresholds/{out[0]['card_key']}").json() == {"removed": True}
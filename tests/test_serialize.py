@@ -0,0 +1,55 @@
+import json
+from decimal import Decimal
+from random import Random
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+
+from app.data.log_writer import LogRecord
+from app.engine.decision import decide
+from app.engine.fees import FeeSchedule
+from app.engine.schemas import CardIdentity, CompsResponse, ConditionMetrics, DecisionRequest, DecisionResponse
+from app.main import app
+from app.services.comps_cache import CachedCompsProvider
+from app.services.comps_provider_stub import StubCompsProvider
+from app.services.evaluation import decision_response, grade_probs_for, log_summary, response_body
+from tests.test_engine_decision import FEES
+
+pytestmark = pytest.mark.usefixtures("tmp_db")
+
+def test_trusted_response_serializes_like_a_validated_one():
+    rng = Random(11)
+    fees = FeeSchedule.from_dict(FEES)
+    provider = StubCompsProvider()
+    for i in range(300):
+        _, stats = provider.get_recent_sold_comps(CardIdentity(card_key=f"card-{i}", display_name="x"))
+        probs = grade_probs_for(ConditionMetrics(**{k: rng.choice([6, 7.5, 9, 9.5, 10]) for k in ("centering", "corners", "edges", "surface")}))
+        listed = Decimal(rng.randint(100, 20000)).scaleb(-2) if i % 3 else None
+        res = decide(stats.p25, stats.median, stats.p75, stats.comps_count, probs, fees, listed_price=listed)
+        fast = decision_response(res, stats, probs)
+        validated = DecisionResponse.model_validate(fast.model_dump())
+        assert json.loads(response_body(fast)) == jsonable_encoder(validated)
+
+        req = DecisionRequest(query="q", listed_price=listed, metrics=ConditionMetrics(centering=9, corners=9, edges=9, surface=9))
+        body = response_body(fast)
+        assert LogRecord("t", req, body, summary=log_summary(res)).to_row() == LogRecord("t", req, body).to_row()
+
+def test_comps_json_is_reused_from_the_cache_row():
+    ident = CardIdentity(card_key="abc", display_name="Charizard — Base")
+    first = CachedCompsProvider(StubCompsProvider()).lookup(ident)
+    reread = CachedCompsProvider(StubCompsProvider()).lookup(ident)  # cold memory tier: read from SQLite
+    assert reread.comps_json == first.comps_json is not None
+    assert reread.stats == first.stats and reread.comps == first.comps
+    assert json.loads(first.stats_json) == jsonable_encoder(first.stats)
+
+def test_comps_and_batch_endpoints_match_their_response_models():
+    client = TestClient(app)
+    identity = client.post("/api/identify", json={"query": "Charizard base set"}).json()
+    out = client.post("/api/comps", json={"identity": identity}).json()
+    assert jsonable_encoder(CompsResponse.model_validate(out)) == out
+    assert out["identity"] == identity and out["stats"]["comps_count"] == len(out["comps"])
+
+    items = [{"query": f"card {i}", "metrics": {"centering": 9, "corners": 9, "edges": 9, "surface": 9}} for i in range(3)]
+    batch = client.post("/api/decision/batch", json={"items": items}).json()
+    assert batch["results"] == [client.post("/api/decision", json=item).json() for item in items]
@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from random import Random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.data import sold_comps
+from app.engine.schemas import CardIdentity, SoldComp
+from app.services.comps_cache import CachedCompsProvider
+from app.services.comps_guard import GuardedCompsProvider
+from app.services.comps_provider_base import build_market_stats
+from app.services.comps_provider_stub import StubCompsProvider
+
+NOW = datetime(2024, 6, 1, tzinfo=timezone.utc)
+
+pytestmark = pytest.mark.usefixtures("tmp_db")
+
+def _comps(n, seed=0, listing=True):
+    rng = Random(seed)
+    return [
+        SoldComp(
+            sold_price=Decimal(str(round(rng.uniform(1, 300), 2))),
+            sold_date_utc=(NOW - timedelta(days=rng.uniform(0.5, 120))).isoformat(),
+            title=f"comp {i}",
+            listing_id=f"L{seed}-{i}" if listing else None,
+        )
+        for i in range(n)
+    ]
+
+@pytest.mark.parametrize("n", [1, 2, 3, 4, 7, 10, 33, 200])
+def test_window_stats_match_in_memory_summary(n):
+    comps = _comps(n, seed=n)
+    sold_comps.append("k", comps, NOW)
+    for days in (7, 30, 90, None):
+        cutoff = "" if days is None else (NOW - timedelta(days=days)).isoformat()
+        in_window = [c for c in comps if c.sold_date_utc >= cutoff]
+        got = sold_comps.window_stats("k", days, now=NOW)
+        if not in_window:
+            assert got is None
+        else:
+            assert got == build_market_stats(in_window)
+
+def test_append_deduplicates_by_listing_identity():
+    with_ids = _comps(20, seed=1)
+    without_ids = _comps(5, seed=2, listing=False)
+    assert sold_comps.append("k", with_ids + without_ids, NOW) == 25
+    assert sold_comps.append("k", with_ids[:10] + without_ids + _comps(3, seed=3), NOW) == 3
+    assert sold_comps.window_stats("k", now=NOW).comps_count == 28
+    assert sold_comps.last_sync("k")[1] == max(sold_comps.normalize_date(c.sold_date_utc) for c in with_ids + without_ids + _comps(3, seed=3))
+
+class IncrementalProvider(StubCompsProvider):
+    def __init__(self):
+        self.since_calls = []
+        self.batches = [_comps(10, seed=10), _comps(4, seed=11)]
+
+    def get_recent_sold_comps(self, identity):
+        comps = self.batches[0]
+        return comps, build_market_stats(comps)
+
+    def get_sold_comps_since(self, identity, since):
+        self.since_calls.append(since)
+        return self.batches[1]
+
+def test_incremental_refresh_reads_back_history():
+    provider = IncrementalProvider()
+    clock = lambda: NOW
+    cache = CachedCompsProvider(provider, ttl_seconds=0, max_stale_seconds=0, history_days=365, clock=clock)
+    ident = CardIdentity(card_key="k", display_name="k")
+    first = cache._fetch(ident)
+    assert first.stats.comps_count == 10
+    second = cache._fetch(ident)
+    assert len(provider.since_calls) == 1
+    assert second.stats == build_market_stats(provider.batches[0] + provider.batches[1])
+
+def test_guard_keeps_incremental_providers_incremental():
+    assert not StubCompsProvider().incremental
+    guarded = GuardedCompsProvider(IncrementalProvider())
+    assert guarded.incremental and not GuardedCompsProvider(StubCompsProvider()).incremental
+    ident = CardIdentity(card_key="k", display_name="k")
+    assert guarded.get_sold_comps_since(ident, "2024-01-01") == guarded.provider.batches[1]
+    assert guarded.stats()["calls"] == 1
+
+def test_windows_endpoint():
+    from app.main import app
+    client = TestClient(app)
+    ident = client.post("/api/identify", json={"query": "Charizard base"}).json()
+    client.post("/api/comps", json={"identity": ident})
+    r = client.get(f"/api/comps/{ident['card_key']}/windows", params=[("days", 7), ("days", 90)])
+    assert r.status_code == 200
+    body = r.json()
+    assert set(body) == {"7", "90"}
+    assert body["90"]["comps_count"] == 10
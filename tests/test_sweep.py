@@ -0,0 +1,57 @@
+from decimal import Decimal
+
+from app.engine.decision import decide
+from app.engine.fees import FeeSchedule
+from app.engine.sweep import DECISIONS, sweep
+from tests.test_engine_decision import FEES
+
+SCHEDULE = FeeSchedule.from_dict(FEES)
+STRONG = {"PSA10":0.45,"PSA9":0.40,"PSA8":0.10,"PSA7":0.03,"LT7":0.02}
+MARKET = (Decimal("90"), Decimal("110"), Decimal("120"), 10)
+
+def _with_fee(grading_fee):
+    fees = {**FEES, "grading": {**FEES["grading"], "grading_fee": float(grading_fee)}}
+    return FeeSchedule.from_dict(fees)
+
+def test_grid_matches_decide_per_point():
+    listed = [None, Decimal("50"), Decimal("76.50"), Decimal("100")]
+    grading = [Decimal("10"), Decimal("19"), Decimal("60"), Decimal("150")]
+    res = sweep(*MARKET, STRONG, SCHEDULE, listed_prices=listed, grading_fees=grading)
+    assert res.decisions.shape == (4, 4, 1, 1)
+    for i, lp in enumerate(listed):
+        for j, gf in enumerate(grading):
+            r = decide(*MARKET, STRONG, _with_fee(gf), listed_price=lp)
+            assert DECISIONS[res.decisions[i, j, 0, 0]] == r.decision
+            assert abs(Decimal(str(res.expected_net[j, 0, 0])) - r.expected_net) <= Decimal("0.01")
+
+def test_thresholds_flip_decisions():
+    t = sweep(*MARKET, STRONG, SCHEDULE).thresholds
+    p25, med, p75, n = MARKET
+
+    assert decide(p25, med, p75, n, STRONG, SCHEDULE, listed_price=t.max_buy_price).decision == "BUY"
+    assert decide(p25, med, p75, n, STRONG, SCHEDULE, listed_price=t.max_buy_price + Decimal("0.01")).decision != "BUY"
+
+    assert decide(p25, t.min_median_for_grade, p75, n, STRONG, SCHEDULE).decision == "GRADE"
+    assert decide(p25, t.min_median_for_grade - Decimal("0.01"), p75, n, STRONG, SCHEDULE).decision != "GRADE"
+
+    assert decide(*MARKET, STRONG, _with_fee(t.max_grading_fee_for_grade)).decision == "GRADE"
+    assert decide(*MARKET, STRONG, _with_fee(t.max_grading_fee_for_grade + Decimal("0.01"))).decision != "GRADE"
+
+    assert abs(decide(*MARKET, STRONG, _with_fee(t.breakeven_grading_fee)).expected_net) <= Decimal("0.01")
+
+def test_thin_comps_have_no_buy_or_grade_threshold():
+    t = sweep(MARKET[0], MARKET[1], MARKET[2], 2, STRONG, SCHEDULE).thresholds
+    assert t.max_buy_price is None
+    assert t.min_median_for_grade is None
+
+def test_grade_thresholds_are_tight_to_the_cent():
+    for median in ("61.37", "110", "245.55", "999.99"):
+        p25, med, p75 = Decimal(median) * Decimal("0.85"), Decimal(median), Decimal(median) * Decimal("1.1")
+        t = sweep(p25, med, p75, 10, STRONG, SCHEDULE).thresholds
+        lo = t.min_median_for_grade
+        assert decide(p25, lo, p75, 10, STRONG, SCHEDULE).decision == "GRADE"
+        assert decide(p25, lo - Decimal("0.01"), p75, 10, STRONG, SCHEDULE).decision != "GRADE"
+        hi = t.max_grading_fee_for_grade
+        if hi >= 0:
+            assert decide(p25, med, p75, 10, STRONG, _with_fee(hi)).decision == "GRADE"
+            assert decide(p25, med, p75, 10, STRONG, _with_fee(hi + Decimal("0.01"))).decision != "GRADE"